@@ -1,31 +1,35 @@
 import cv2
 import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from skimage import feature
 from skimage.color import rgb2hsv
-from typing import List, Tuple
+from typing import List, Tuple, Union
 import os
 import signal
+import pickle
 import sys
 import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm  # Import tqdm
+from image_context import ImageContext, as_context
 # pip install ultralytics  # For YOLOv8
 
 
-def dominant_color_kmeans(image: np.ndarray, k: int = 3) -> List[Tuple[int, int, int]]:
+def dominant_color_kmeans(image: Union[np.ndarray, ImageContext], k: int = 3) -> List[Tuple[int, int, int]]:
     """
     Finds the dominant colors in an image using K-means clustering.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
         k: The number of dominant colors to find.
 
     Returns:
         A list of tuples representing the dominant colors in RGB format.
     """
     # Reshape the image to be a list of pixels
-    pixels = image.reshape((-1, 3))
+    pixels = as_context(image).bgr.reshape((-1, 3))
 
     # Use K-means clustering to find the dominant colors
     kmeans = KMeans(n_clusters=k, n_init=10, random_state=0)  # Explicitly set n_init and random_state
@@ -37,18 +41,70 @@ def dominant_color_kmeans(image: np.ndarray, k: int = 3) -> List[Tuple[int, int,
     return [tuple(color) for color in dominant_colors]
 
 
-def color_temperature(image: np.ndarray) -> str:
+def dominant_color_fast(image: Union[np.ndarray, ImageContext], k: int = 3, method: str = "minibatch",
+                        sample_size: int = 4096, random_state: int = 0) -> List[Tuple[int, int, int]]:
+    """
+    Finds the dominant colors in an image with a cheaper estimator than dominant_color_kmeans.
+
+    See benchmarks/dominant_color_accuracy.py for how far the colors are from
+    the exact method and how much faster they are.
+
+    Args:
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
+        k: The number of dominant colors to find.
+        method: "minibatch" runs MiniBatchKMeans on a random sample of sample_size pixels;
+            "histogram" quantizes all pixels to a 16x16x16 color histogram and clusters
+            the mean colors of the non-empty bins, weighted by their pixel counts.
+        sample_size: Number of pixels sampled by the "minibatch" method.
+        random_state: Seed for the pixel sample and the clusterer.
+
+    Returns:
+        A list of tuples representing the dominant colors in RGB format.
+    """
+    # Reshape the image to be a list of pixels
+    pixels = as_context(image).bgr.reshape((-1, 3))
+
+    if method == "minibatch":
+        # A random sample keeps the color distribution, unlike resizing, which blends colors
+        if len(pixels) > sample_size:
+            rng = np.random.default_rng(random_state)
+            pixels = pixels[rng.choice(len(pixels), sample_size, replace=False)]
+        kmeans = MiniBatchKMeans(n_clusters=k, n_init=10, batch_size=1024, random_state=random_state)
+        kmeans.fit(pixels.astype(np.float32))
+    elif method == "histogram":
+        # Quantize every channel to 4 bits; each non-empty bin is represented by its mean color
+        quantized = (pixels >> 4).astype(np.int64)
+        bins = (quantized[:, 0] * 16 + quantized[:, 1]) * 16 + quantized[:, 2]
+        counts = np.bincount(bins, minlength=4096)
+        occupied = np.flatnonzero(counts)
+        bin_colors = np.stack([np.bincount(bins, weights=pixels[:, c], minlength=4096)[occupied]
+                               for c in range(3)], axis=1) / counts[occupied, None]
+        kmeans = KMeans(n_clusters=min(k, len(occupied)), n_init=10, random_state=random_state)
+        kmeans.fit(bin_colors, sample_weight=counts[occupied])
+    else:
+        raise ValueError(f"Invalid method '{method}'. Choose from 'minibatch' or 'histogram'")
+
+    # Get the cluster centers (dominant colors)
+    dominant_colors = kmeans.cluster_centers_.astype(int)
+    # Images with fewer colors than k repeat the last color
+    dominant_colors = np.concatenate([dominant_colors,
+                                      np.repeat(dominant_colors[-1:], k - len(dominant_colors), axis=0)])
+
+    return [tuple(color) for color in dominant_colors]
+
+
+def color_temperature(image: Union[np.ndarray, ImageContext]) -> str:
     """
     Determines if the image has a cool or warm color temperature.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         "Cool" if the image has a cool color temperature, "Warm" otherwise.
     """
     # Calculate the average color of the image
-    average_color = np.mean(image, axis=(0, 1)).astype(int)
+    average_color = np.mean(as_context(image).bgr, axis=(0, 1)).astype(int)
 
     # Compare the blue/green values to the red/yellow values
     if average_color[0] > average_color[2]:  # Blue > Red
@@ -57,18 +113,18 @@ def color_temperature(image: np.ndarray) -> str:
         return "Warm"
 
 
-def color_brightness(image: np.ndarray) -> str:
+def color_brightness(image: Union[np.ndarray, ImageContext]) -> str:
     """
     Determines if the image has bright or soft colors.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         "Bright" if the image has bright colors, "Soft" otherwise.
     """
     # Convert the image to HSV color space
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hsv_image = as_context(image).hsv
 
     # Calculate the average saturation and value
     average_saturation = np.mean(hsv_image[:, :, 1])
@@ -82,19 +138,19 @@ def color_brightness(image: np.ndarray) -> str:
         return "Soft"
 
 
-def overall_lightness(image: np.ndarray) -> str:
+def overall_lightness(image: Union[np.ndarray, ImageContext]) -> str:
     """
     Determines if the image has light, dark, or medium tones.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         "Light" if the image has light tones, "Dark" if the image has dark
         tones, "Medium" otherwise.
     """
     # Calculate the average lightness of the image
-    average_lightness = np.mean(image)
+    average_lightness = np.mean(as_context(image).bgr)
 
     # Determine if the image has light, dark, or medium tones based on the
     # average lightness
@@ -106,21 +162,23 @@ def overall_lightness(image: np.ndarray) -> str:
         return "Medium"
 
 
-def color_histograms(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+def color_histograms(image: Union[np.ndarray, ImageContext]) -> Tuple[np.ndarray, np.ndarray]:
     """
     Extracts color histograms for RGB and HSV color spaces.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         A tuple containing the RGB and HSV histograms.
     """
+    context = as_context(image)
+
     # Extract RGB histogram
-    rgb_hist = [cv2.calcHist([image], [i], None, [256], [0, 256]) for i in range(3)]
+    rgb_hist = [cv2.calcHist([context.bgr], [i], None, [256], [0, 256]) for i in range(3)]
 
     # Convert the image to HSV color space
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    hsv_image = context.hsv
 
     # Extract HSV histogram
     hsv_hist = [cv2.calcHist([hsv_image], [i], None, [256], [0, 256]) for i in range(3)]
@@ -128,18 +186,18 @@ def color_histograms(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     return tuple(rgb_hist), tuple(hsv_hist)
 
 
-def edge_detection(image: np.ndarray) -> np.ndarray:
+def edge_detection(image: Union[np.ndarray, ImageContext]) -> np.ndarray:
     """
     Detects edges in the image using the Canny edge detection algorithm.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         A numpy array representing the edge map.
     """
     # Convert the image to grayscale
-    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray_image = as_context(image).gray
 
     # Apply Canny edge detection
     edges = cv2.Canny(gray_image, 100, 200)
@@ -147,12 +205,12 @@ def edge_detection(image: np.ndarray) -> np.ndarray:
     return edges
 
 
-def texture_analysis(image: np.ndarray, num_points: int = 24, radius: int = 3) -> np.ndarray:
+def texture_analysis(image: Union[np.ndarray, ImageContext], num_points: int = 24, radius: int = 3) -> np.ndarray:
     """
     Performs texture analysis using Local Binary Patterns (LBP).
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
         num_points: The number of points to sample around each pixel.
         radius: The radius of the circle around each pixel.
 
@@ -160,7 +218,7 @@ def texture_analysis(image: np.ndarray, num_points: int = 24, radius: int = 3) -
         A numpy array representing the LBP histogram.
     """
     # Convert the image to grayscale
-    gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray_image = as_context(image).gray
 
     # Calculate LBP
     lbp = feature.local_binary_pattern(gray_image, num_points, radius, method="uniform")
@@ -175,33 +233,33 @@ def texture_analysis(image: np.ndarray, num_points: int = 24, radius: int = 3) -
     return hist
 
 
-def resize_to_single_pixel(image: np.ndarray) -> Tuple[int, int, int]:
+def resize_to_single_pixel(image: Union[np.ndarray, ImageContext]) -> Tuple[int, int, int]:
     """
     Resizes the image to a single pixel and returns the color.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         A tuple representing the color of the single pixel in RGB format.
     """
-    resized_image = cv2.resize(image, (1, 1), interpolation=cv2.INTER_AREA)
+    resized_image = as_context(image).resized((1, 1), interpolation=cv2.INTER_AREA).bgr
     return tuple(resized_image[0, 0])
 
 
-def luminosity_weighted_average(image: np.ndarray) -> Tuple[int, int, int]:
+def luminosity_weighted_average(image: Union[np.ndarray, ImageContext]) -> Tuple[int, int, int]:
     """
     Calculates the luminosity-weighted average color of the image.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
 
     Returns:
         A tuple representing the luminosity-weighted average color in RGB
         format.
     """
     # Convert the image to float
-    image = image.astype(float)
+    image = as_context(image).bgr.astype(float)
 
     # Calculate the luminosity weights
     weights = np.array([0.299, 0.587, 0.114])
@@ -213,12 +271,12 @@ def luminosity_weighted_average(image: np.ndarray) -> Tuple[int, int, int]:
     return tuple(np.repeat(weighted_average, 3).astype(int))
 
 
-def find_most_vibrant_color(image: np.ndarray, brightness_threshold: float = 0.5) -> Tuple[int, int, int]:
+def find_most_vibrant_color(image: Union[np.ndarray, ImageContext], brightness_threshold: float = 0.5) -> Tuple[int, int, int]:
     """
     Finds the most vibrant color in the image.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
         brightness_threshold: The minimum brightness threshold for a pixel to be
             considered.
 
@@ -226,31 +284,20 @@ def find_most_vibrant_color(image: np.ndarray, brightness_threshold: float = 0.5
         A tuple representing the most vibrant color in RGB format.
     """
     # Convert the image to HSV color space
-    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-
-    # Get the height and width of the image
-    height, width = hsv_image.shape[:2]
-
-    # Create a list to store the vibrant colors
-    vibrant_colors = []
+    hsv_image = as_context(image).hsv
 
-    # Iterate over the pixels in the image
-    for y in range(height):
-        for x in range(width):
-            # Get the HSV values for the pixel
-            hue, saturation, value = hsv_image[y, x]
-
-            # Check if the pixel meets the brightness threshold
-            if value / 255.0 > brightness_threshold:
-                # Add the pixel to the list of vibrant colors
-                vibrant_colors.append((hue, saturation, value))
+    # Only pixels above the brightness threshold are considered
+    bright = hsv_image[..., 2] / 255.0 > brightness_threshold
 
     # Check if there are any vibrant colors
-    if not vibrant_colors:
+    if not bright.any():
         return (0, 0, 0)  # Return black if there are no vibrant colors
 
-    # Find the most saturated color
-    most_vibrant_color = max(vibrant_colors, key=lambda color: color[1])
+    # Find the most saturated color; argmax returns the first maximum in row-major
+    # order, the same pixel the original per-pixel loop picked on ties
+    saturation = np.where(bright, hsv_image[..., 1].astype(np.int16), -1)
+    y, x = np.unravel_index(np.argmax(saturation), saturation.shape)
+    most_vibrant_color = hsv_image[y, x]
 
     # Convert the most vibrant color back to RGB
     most_vibrant_color_hsv = np.uint8([[most_vibrant_color]])
@@ -259,56 +306,124 @@ def find_most_vibrant_color(image: np.ndarray, brightness_threshold: float = 0.5
     return tuple(most_vibrant_color_rgb.astype(int))
 
 
-def object_detection(image: np.ndarray) -> List[str]:
+# Object detection weights; the detector is loaded once per process and kept in DETECTORS
+YOLO_MODEL = "yolov11n.pt"
+DETECTORS = {}
+DETECTOR_LOAD_SECONDS = {}
+
+
+def load_detector(model_path: str = YOLO_MODEL):
     """
-    Performs object detection using a pre-trained YOLOv8 model.
+    Loads a pretrained YOLO detector once per process.
 
     Args:
-        image: A numpy array representing the image (H, W, C).
+        model_path: The YOLO weights to load.
 
     Returns:
-        A list of strings representing the detected objects.
+        The cached detector, or None if ultralytics is not installed.
     """
-    try:
-        from ultralytics import YOLO  # Import YOLO here to avoid import errors if not installed
-    except ImportError:
-        print(
-            "Error: ultralytics is not installed. Please install it using: pip install ultralytics"
-        )
-        return []
+    if model_path not in DETECTORS:
+        try:
+            from ultralytics import YOLO  # Import YOLO here to avoid import errors if not installed
+        except ImportError:
+            print(
+                "Error: ultralytics is not installed. Please install it using: pip install ultralytics"
+            )
+            return None
 
-    # Load a pretrained YOLOv11n model
-    model = YOLO("yolov11n.pt")  # You can change this to a different model if needed
+        start_time = time.perf_counter()
+        DETECTORS[model_path] = YOLO(model_path)
+        DETECTOR_LOAD_SECONDS[model_path] = time.perf_counter() - start_time
+    return DETECTORS[model_path]
 
-    # Run inference on the image
-    results = model(image)
 
-    # Extract the detected objects
+def _detected_class_names(model, result) -> List[str]:
+    """Returns the class name of every box in one detection result."""
     detected_objects = []
-    for result in results:
-        boxes = result.boxes  # Boxes object for bounding box outputs
-        for box in boxes:
-            class_id = int(box.cls[0])
-            class_name = model.names[class_id]
-            detected_objects.append(class_name)
+    boxes = result.boxes  # Boxes object for bounding box outputs
+    for box in boxes:
+        class_id = int(box.cls[0])
+        detected_objects.append(model.names[class_id])
+    return detected_objects
+
 
+def object_detection(image: Union[np.ndarray, ImageContext], imgsz: int = 640, model=None) -> List[str]:
+    """
+    Performs object detection using a pre-trained YOLO model.
+
+    Args:
+        image: A numpy array representing the image (H, W, C), or its ImageContext.
+        imgsz: Inference image size.
+        model: Detector to use. If None, the cached detector from load_detector is used.
+
+    Returns:
+        A list of strings representing the detected objects.
+    """
+    return object_detection_batch([image], batch_size=1, imgsz=imgsz, model=model)[0]
+
+
+def object_detection_batch(images: List[Union[np.ndarray, ImageContext]], batch_size: int = 16,
+                           imgsz: int = 640, model=None) -> List[List[str]]:
+    """
+    Performs object detection on many images, sending batch_size images to the model per call.
+
+    Args:
+        images: Numpy arrays representing the images (H, W, C), or their ImageContexts.
+        batch_size: Number of images per model call.
+        imgsz: Inference image size.
+        model: Detector to use. If None, the cached detector from load_detector is used.
+
+    Returns:
+        A list with the detected objects of every image.
+    """
+    model = model if model is not None else load_detector()
+    if model is None:
+        return [[] for _ in images]
+
+    detected_objects = []
+    for start in range(0, len(images), batch_size):
+        batch = [as_context(image).bgr for image in images[start:start + batch_size]]
+        results = model(batch, imgsz=imgsz, verbose=False)
+        detected_objects.extend(_detected_class_names(model, result) for result in results)
     return detected_objects
 
 
-def extract_image_features(image_path: str, enabled_features: List[str]) -> dict:
+# Feature names that fill the dominant_colors column, from exact to fastest
+DOMINANT_COLOR_FEATURES = ["dominant_color_kmeans", "dominant_color_fast", "dominant_color_histogram"]
+
+
+def extract_image_features(image_path: Union[str, ImageContext], enabled_features: List[str],
+                           timings: dict = None) -> dict:
     """
     Extracts image features from the given image path.
 
+    The image is decoded once into an ImageContext that all feature functions
+    share, so each color conversion happens at most once per image.
+
     Args:
-        image_path: The path to the image file.
+        image_path: The path to the image file, or the ImageContext of an already decoded image.
         enabled_features: A list of strings representing the features to extract.
+        timings: If given, the seconds spent decoding and in each feature are added to it.
 
     Returns:
         A dictionary containing the extracted image features.
     """
+    timings = {} if timings is None else timings
+
+    def timed(name, function, *args, **kwargs):
+        """Runs a feature function and adds its duration to timings[name]."""
+        start_time = time.perf_counter()
+        result = function(*args, **kwargs)
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start_time
+        return result
+
     try:
-        image = cv2.imread(image_path)
-        if image is None:
+        try:
+            if isinstance(image_path, ImageContext):
+                image = image_path
+            else:
+                image = timed("decode", ImageContext.from_path, image_path)
+        except ValueError:
             print(f"Error: Could not read the image at {image_path}")
             return None
 
@@ -316,35 +431,43 @@ def extract_image_features(image_path: str, enabled_features: List[str]) -> dict
 
         # Color-Based Features
         if "dominant_color_kmeans" in enabled_features:
-            features["dominant_colors"] = dominant_color_kmeans(image)
+            features["dominant_colors"] = timed("dominant_color_kmeans", dominant_color_kmeans, image)
+        elif "dominant_color_fast" in enabled_features:
+            features["dominant_colors"] = timed("dominant_color_fast", dominant_color_fast, image)
+        elif "dominant_color_histogram" in enabled_features:
+            features["dominant_colors"] = timed("dominant_color_histogram", dominant_color_fast, image,
+                                                method="histogram")
         if "color_temperature" in enabled_features:
-            features["color_temperature"] = color_temperature(image)
+            features["color_temperature"] = timed("color_temperature", color_temperature, image)
         if "color_brightness" in enabled_features:
-            features["color_brightness"] = color_brightness(image)
+            features["color_brightness"] = timed("color_brightness", color_brightness, image)
         if "overall_lightness" in enabled_features:
-            features["overall_lightness"] = overall_lightness(image)
+            features["overall_lightness"] = timed("overall_lightness", overall_lightness, image)
         if "color_histograms" in enabled_features:
-            rgb_hist, hsv_hist = color_histograms(image)
+            rgb_hist, hsv_hist = timed("color_histograms", color_histograms, image)
             features["rgb_histogram_shapes"] = [h.shape for h in rgb_hist]
             features["hsv_histogram_shapes"] = [h.shape for h in hsv_hist]
         if "resize_to_single_pixel" in enabled_features:
-            features["single_pixel_color"] = resize_to_single_pixel(image)
+            features["single_pixel_color"] = timed("resize_to_single_pixel", resize_to_single_pixel, image)
         if "luminosity_weighted_average" in enabled_features:
-            features["weighted_average_color"] = luminosity_weighted_average(image)
+            features["weighted_average_color"] = timed("luminosity_weighted_average",
+                                                       luminosity_weighted_average, image)
         if "find_most_vibrant_color" in enabled_features:
-            features["most_vibrant_color"] = find_most_vibrant_color(image)
+            features["most_vibrant_color"] = timed("find_most_vibrant_color", find_most_vibrant_color, image)
 
         # Structure and Content-Based Features
         if "edge_detection" in enabled_features:
-            edges = edge_detection(image)
+            edges = timed("edge_detection", edge_detection, image)
             features["edge_map_shape"] = edges.shape
         if "texture_analysis" in enabled_features:
-            lbp_hist = texture_analysis(image)
+            lbp_hist = timed("texture_analysis", texture_analysis, image)
             features["lbp_histogram_shape"] = lbp_hist.shape
 
         # Object Detection
         if "object_detection" in enabled_features:
-            features["detected_objects"] = object_detection(image)
+            # Only the first image of a process pays for loading the detector
+            timed("object_detection_model_load", load_detector)
+            features["detected_objects"] = timed("object_detection", object_detection, image)
 
         return features
     except Exception as e:
@@ -352,6 +475,123 @@ def extract_image_features(image_path: str, enabled_features: List[str]) -> dict
         return None
 
 
+def print_feature_timings(timings: dict, num_images: int = None):
+    """
+    Prints the total time spent decoding and in each feature, slowest first.
+
+    Model load times are one-off costs and are listed without a per-image latency.
+    """
+    if not timings:
+        return
+    total = sum(timings.values())
+    print("\n===== FEATURE TIMINGS =====")
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+        line = f"{name:<28} {seconds:10.2f}s {100 * seconds / total:6.1f}%"
+        if num_images and not name.endswith("_model_load"):
+            line += f" {1000 * seconds / num_images:10.2f} ms/image"
+        print(line)
+    print("===========================\n")
+
+
+# Features that also get one column per color channel, mapped to their feature column
+COLOR_COMPONENT_FEATURES = {
+    "resize_to_single_pixel": "single_pixel_color",
+    "luminosity_weighted_average": "weighted_average_color",
+    "find_most_vibrant_color": "most_vibrant_color",
+}
+
+
+def _extract_rows(task: tuple) -> List[tuple]:
+    """
+    Pool task: extracts the features of a chunk of covers.
+
+    Object detection runs once for the whole chunk, as a single batched model call.
+
+    Args:
+        task: (list of (row position, image path), enabled features, detection image size)
+
+    Returns:
+        A list of (row position, features or None, per-feature timings) tuples.
+    """
+    rows, enabled_features, detection_imgsz = task
+    per_image_features = [name for name in enabled_features if name != "object_detection"]
+
+    results = []
+    detection_rows = []
+    for position, image_path in rows:
+        timings = {}
+        features = None
+        if isinstance(image_path, str) and image_path and os.path.exists(image_path):
+            start_time = time.perf_counter()
+            try:
+                image = ImageContext.from_path(image_path)
+            except ValueError:
+                image = None
+                print(f"Error: Could not read the image at {image_path}")
+            timings["decode"] = time.perf_counter() - start_time
+            if image is not None:
+                features = extract_image_features(image, per_image_features, timings)
+                if features is not None:
+                    detection_rows.append((features, timings, image))
+        results.append((position, features, timings))
+
+    if "object_detection" in enabled_features and detection_rows:
+        first_timings = detection_rows[0][1]
+        start_time = time.perf_counter()
+        load_detector()
+        first_timings["object_detection_model_load"] = time.perf_counter() - start_time
+
+        # One model call for the chunk; its latency is shared evenly between the images
+        start_time = time.perf_counter()
+        detections = object_detection_batch([image for _, _, image in detection_rows],
+                                            batch_size=len(detection_rows), imgsz=detection_imgsz)
+        latency = (time.perf_counter() - start_time) / len(detection_rows)
+        for (features, timings, _), detected_objects in zip(detection_rows, detections):
+            features["detected_objects"] = detected_objects
+            timings["object_detection"] = latency
+
+    return results
+
+
+def feature_checkpoint_path(output_csv_path: str) -> str:
+    """Returns the checkpoint file used while writing output_csv_path."""
+    return f"{os.path.splitext(output_csv_path)[0]}.checkpoint.pkl"
+
+
+def append_feature_checkpoint(checkpoint_path: str, results: List[tuple]):
+    """
+    Appends a batch of (row position, features) results to a checkpoint file.
+
+    Each batch is one pickle record, so a checkpoint costs only the size of the new rows.
+    """
+    with open(checkpoint_path, "ab") as f:
+        pickle.dump(results, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_feature_checkpoint(checkpoint_path: str) -> dict:
+    """
+    Reads every batch in a checkpoint file.
+
+    Returns:
+        A dictionary of row position -> features (None where extraction failed).
+    """
+    results = {}
+    if not os.path.exists(checkpoint_path):
+        return results
+    with open(checkpoint_path, "rb") as f:
+        while True:
+            try:
+                results.update(pickle.load(f))
+            except EOFError:
+                break
+            except (pickle.UnpicklingError, ValueError, TypeError):
+                print(f"Ignoring a truncated record at the end of {checkpoint_path}")
+                break
+    return results
+
+
 def save_dataframe(df: pd.DataFrame, output_csv_path: str, index: bool = False):
     """Saves the DataFrame to a CSV file."""
     try:
@@ -361,8 +601,18 @@ def save_dataframe(df: pd.DataFrame, output_csv_path: str, index: bool = False):
         print(f"Error saving DataFrame to {output_csv_path}: {e}")
 
 
-def main(spotify_data_path: str, output_csv_path: str, image_dir: str, enabled_features: List[str]):
-    """Main function to process the Spotify data and extract image features."""
+def main(spotify_data_path: str, output_csv_path: str, image_dir: str, enabled_features: List[str],
+         download_workers: int = 16, requests_per_second: float = None, workers: int = 1,
+         checkpoint_interval: int = 100, detection_batch_size: int = 16, detection_imgsz: int = 640):
+    """
+    Main function to process the Spotify data and extract image features.
+
+    With workers > 1 the covers are processed by a process pool. Results are
+    collected into preallocated columns and appended to a checkpoint file every
+    checkpoint_interval rows; the output CSV is written once at the end. Rows are
+    processed in chunks of detection_batch_size so object detection can run
+    one batched model call per chunk.
+    """
     # Load the Spotify data from CSV
     try:
         spotify_df = pd.read_csv(spotify_data_path)
@@ -379,50 +629,23 @@ def main(spotify_data_path: str, output_csv_path: str, image_dir: str, enabled_f
         os.makedirs(image_dir)
         print(f"Created directory {image_dir}")
 
-    # Function to download images (replace with your actual download function)
-    def download_image(image_url: str, image_path: str) -> bool:
-        """Downloads an image from the given URL to the specified path."""
-        try:
-            import requests
-            response = requests.get(image_url, stream=True)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            with open(image_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            return True
-        except Exception as e:
-            print(f"Error downloading image from {image_url}: {e}")
-            return False
-
-    # Add a new column to store the image file paths
-    spotify_df["image_path"] = ""
-
-    # Download album cover images and store their paths
+    # Download album cover images concurrently; the outcome of every download goes to a manifest
+    from album_downloader import cover_jobs, cover_path, download_covers
+    manifest_path = os.path.join(image_dir, "manifest.jsonl")
     print("Downloading album cover images...")
-    for index, row in tqdm(spotify_df.iterrows(), total=len(spotify_df), desc="Downloading Images"):
-        image_url = row["img"]
-        if not isinstance(image_url, str):
-            print(f"Skipping download for id {row['id']} due to invalid image URL: {image_url}")
-            continue
-
-        image_filename = f"album_cover_{row['id']}.jpg"
-        image_path = os.path.join(image_dir, image_filename)
-        spotify_df.at[index, "image_path"] = image_path
-
-        if not os.path.exists(image_path):
-            if not download_image(image_url, image_path):
-                spotify_df.at[index, "image_path"] = None  # Set to None if download fails
-        else:
-            print(f"Image already exists at {image_path}, skipping download.")
+    download_covers(cover_jobs(spotify_df, image_dir), manifest_path,
+                    max_workers=download_workers, requests_per_second=requests_per_second)
 
-    # Save the updated DataFrame with image paths to a new CSV file
-    image_paths_csv_path = "spotify_data_with_image_paths.csv"
-    spotify_df.to_csv(image_paths_csv_path, index=False)
-    print(f"Image paths saved to {image_paths_csv_path}")
+    # Store the paths of the images that are on disk; downloads are moved into place only once complete,
+    # and covers that were already present have no record from this run
+    spotify_df["image_path"] = [
+        path if os.path.exists(path) else None
+        for path in (cover_path(image_dir, song_id) for song_id in spotify_df["id"])
+    ]
 
     # Define feature columns based on enabled features
     feature_columns = []
-    if "dominant_color_kmeans" in enabled_features:
+    if any(name in enabled_features for name in DOMINANT_COLOR_FEATURES):
         feature_columns.append("dominant_colors")
     if "color_temperature" in enabled_features:
         feature_columns.append("color_temperature")
@@ -482,54 +705,79 @@ def main(spotify_data_path: str, output_csv_path: str, image_dir: str, enabled_f
         if column not in spotify_df.columns:
             spotify_df[column] = None  # Initialize the new columns
 
-    # Extract image features and add them to the DataFrame
-    print("Extracting image features...")
-    SAVE_INTERVAL = 10
-    for index, row in tqdm(spotify_df.iloc[start_index:].iterrows(), total=len(spotify_df) - start_index, desc="Extracting Features"):
-        image_path = row["image_path"]
-        if image_path and os.path.exists(image_path):
-            print(f"Processing image at {image_path}")
-            features = extract_image_features(image_path, enabled_features)
-            if features:
-                print(f"Features extracted: {features.keys()}")
-                for column in feature_columns:
-                    spotify_df.at[index, column] = features.get(column)
-
-                # Extract and assign the color values
-                if "resize_to_single_pixel" in enabled_features:
-                    single_pixel_color = features.get("single_pixel_color")
-                    if single_pixel_color:
-                        spotify_df.at[index, "single_pixel_color_r"] = single_pixel_color[0]
-                        spotify_df.at[index, "single_pixel_color_g"] = single_pixel_color[1]
-                        spotify_df.at[index, "single_pixel_color_b"] = single_pixel_color[2]
-
-                if "luminosity_weighted_average" in enabled_features:
-                    weighted_average_color = features.get("weighted_average_color")
-                    if weighted_average_color:
-                        spotify_df.at[index, "weighted_average_color_r"] = weighted_average_color[0]
-                        spotify_df.at[index, "weighted_average_color_g"] = weighted_average_color[1]
-                        spotify_df.at[index, "weighted_average_color_b"] = weighted_average_color[2]
-
-                if "find_most_vibrant_color" in enabled_features:
-                    most_vibrant_color = features.get("most_vibrant_color")
-                    if most_vibrant_color:
-                        spotify_df.at[index, "most_vibrant_color_r"] = most_vibrant_color[0]
-                        spotify_df.at[index, "most_vibrant_color_g"] = most_vibrant_color[1]
-                        spotify_df.at[index, "most_vibrant_color_b"] = most_vibrant_color[2]
-            else:
-                print(f"No features extracted for image at {image_path}")
+    # Extract image features into preallocated columns, restoring rows checkpointed by an interrupted run
+    checkpoint_path = feature_checkpoint_path(output_csv_path)
+    checkpointed = load_feature_checkpoint(checkpoint_path)
+    if checkpointed:
+        print(f"Restored {len(checkpointed)} rows from checkpoint {checkpoint_path}")
+
+    color_features = [column for name, column in COLOR_COMPONENT_FEATURES.items() if name in enabled_features]
+    columns = {column: spotify_df[column].to_numpy(dtype=object, copy=True) for column in feature_columns}
+    components = {
+        f"{column}_{channel}": pd.to_numeric(spotify_df[f"{column}_{channel}"], errors="coerce").to_numpy(dtype=float, copy=True)
+        for column in color_features for channel in "rgb"
+    }
+
+    def store(position: int, features: dict):
+        """Writes the features of one row into the preallocated columns."""
+        if not features:
+            return
+        for column in feature_columns:
+            columns[column][position] = features.get(column)
+        for column in color_features:
+            color = features.get(column)
+            if color:
+                for channel, value in zip("rgb", color):
+                    components[f"{column}_{channel}"][position] = value
+
+    for position, features in checkpointed.items():
+        store(position, features)
+
+    image_paths = spotify_df["image_path"].tolist()
+    rows = [(position, image_paths[position])
+            for position in range(start_index, len(spotify_df)) if position not in checkpointed]
+    # Rows are sent to the workers in chunks of one object detection batch
+    tasks = [(rows[start:start + detection_batch_size], enabled_features, detection_imgsz)
+             for start in range(0, len(rows), detection_batch_size)]
+
+    print(f"Extracting image features with {workers} worker(s)...")
+    feature_timings = {}
+    pending_results = []
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is not None:
+            results = executor.map(_extract_rows, tasks)
         else:
-            print(f"Skipping feature extraction for index {index} due to missing image.")
-
-        # Save progress every SAVE_INTERVAL iterations
-        if (index - start_index + 1) % SAVE_INTERVAL == 0:
-            save_dataframe(spotify_df, output_csv_path)
-            print(f"Progress saved up to index {index}")
+            results = map(_extract_rows, tasks)
+
+        for position, features, timings in tqdm((result for chunk in results for result in chunk),
+                                                total=len(rows), desc="Extracting Features"):
+            if features is None:
+                tqdm.write(f"No features extracted for index {position}")
+            store(position, features)
+            for name, seconds in timings.items():
+                feature_timings[name] = feature_timings.get(name, 0.0) + seconds
+
+            # Append only the new rows to the checkpoint
+            pending_results.append((position, features))
+            if len(pending_results) >= checkpoint_interval:
+                append_feature_checkpoint(checkpoint_path, pending_results)
+                pending_results = []
+    finally:
+        if pending_results:
+            append_feature_checkpoint(checkpoint_path, pending_results)
+        if executor is not None:
+            executor.shutdown()
+
+    for column, values in {**columns, **components}.items():
+        spotify_df[column] = values
 
     # Save the final DataFrame to a new CSV file
     save_dataframe(spotify_df, output_csv_path)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
     print(f"Image features added and saved to {output_csv_path}")
-
+    print_feature_timings(feature_timings, num_images=len(rows))
 
 
 if __name__ == "__main__":
@@ -553,9 +801,19 @@ if __name__ == "__main__":
             "texture_analysis",
             "object_detection",
         ],
-        help="List of image features to extract. Choose from: dominant_color_kmeans, color_temperature, color_brightness, overall_lightness, color_histograms, resize_to_single_pixel, luminosity_weighted_average, find_most_vibrant_color, edge_detection, texture_analysis, object_detection",
+        help="List of image features to extract. Choose from: dominant_color_kmeans, dominant_color_fast (MiniBatchKMeans on a pixel sample), dominant_color_histogram (k-means over a color histogram), color_temperature, color_brightness, overall_lightness, color_histograms, resize_to_single_pixel, luminosity_weighted_average, find_most_vibrant_color, edge_detection, texture_analysis, object_detection",
     )
 
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes extracting image features.")
+    parser.add_argument("--checkpoint_interval", type=int, default=100, help="Append results to the checkpoint file every N images.")
+    parser.add_argument("--detection_batch_size", type=int, default=16, help="Number of images per object detection call.")
+    parser.add_argument("--detection_imgsz", type=int, default=640, help="Object detection inference image size.")
+    parser.add_argument("--download_workers", type=int, default=16, help="Number of concurrent image downloads.")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum download requests per second per host (default: no limit).")
+
     args = parser.parse_args()
 
-    main(args.spotify_data_path, args.output_csv_path, args.image_dir, args.features)
\ No newline at end of file
+    main(args.spotify_data_path, args.output_csv_path, args.image_dir, args.features,
+         download_workers=args.download_workers, requests_per_second=args.rate,
+         workers=args.workers, checkpoint_interval=args.checkpoint_interval,
+         detection_batch_size=args.detection_batch_size, detection_imgsz=args.detection_imgsz)
\ No newline at end of file
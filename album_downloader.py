@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import argparse
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+# Job outcomes; downloads and failures are recorded in the manifest, existing files only counted
+STATUS_DOWNLOADED = "downloaded"
+STATUS_EXISTS = "exists"
+STATUS_FAILED = "failed"
+
+# HTTP statuses that are worth retrying
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+def cover_path(image_dir: str, song_id: str) -> str:
+    """Returns the path an album cover is stored at."""
+    return os.path.join(image_dir, f"album_cover_{song_id}.jpg")
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host.
+
+    Every host gets its own slot; a request waits until at least
+    1 / requests_per_second has passed since the previous request to that host.
+    """
+
+    def __init__(self, requests_per_second: Optional[float]):
+        """
+        Args:
+            requests_per_second: Maximum request rate per host, or None for no limit.
+        """
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Blocks until a request to the host of url may be sent."""
+        if not self.interval:
+            return
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def create_session(max_connections: int) -> requests.Session:
+    """Creates an HTTP session whose connection pool is shared by all download threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _write_atomically(response: requests.Response, image_path: str) -> int:
+    """Streams a response to a temporary file next to image_path and moves it into place."""
+    directory = os.path.dirname(image_path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".download-", suffix=".part")
+    num_bytes = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+                num_bytes += len(chunk)
+        os.replace(tmp_path, image_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return num_bytes
+
+
+def download_cover(session: requests.Session, url: str, image_path: str, rate_limiter: HostRateLimiter,
+                   retries: int = 3, backoff: float = 0.5, timeout: float = 10.0) -> dict:
+    """
+    Downloads one image, retrying connection errors, timeouts and retryable HTTP statuses.
+
+    Errors while reading the body (a connection dropped or timed out mid-transfer)
+    are retried like connection errors; errors writing the file are recorded.
+
+    Args:
+        session: Shared HTTP session.
+        url: Image URL.
+        image_path: Where the image is stored.
+        rate_limiter: Per-host rate limiter.
+        retries: Number of retries after the first attempt.
+        backoff: Delay before the first retry in seconds; doubled after every retry.
+        timeout: Connect and read timeout in seconds.
+
+    Returns:
+        dict: Manifest record with the path, url, status, attempts, bytes and error.
+    """
+    record = {"path": image_path, "url": url, "status": STATUS_FAILED, "attempts": 0, "bytes": 0, "error": None}
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        rate_limiter.wait(url)
+        record["attempts"] = attempt + 1
+        try:
+            with session.get(url, stream=True, timeout=timeout) as response:
+                if response.status_code in RETRY_STATUS_CODES:
+                    record["error"] = f"HTTP {response.status_code}"
+                    continue
+                response.raise_for_status()
+                record["bytes"] = _write_atomically(response, image_path)
+            record["status"] = STATUS_DOWNLOADED
+            record["error"] = None
+            return record
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        except requests.RequestException as e:
+            # Other HTTP errors (e.g. 404) will not go away by retrying
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+        except OSError as e:
+            # The image could not be written (e.g. disk full); fail this job, not the run
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+    return record
+
+
+def load_manifest(manifest_path: str) -> Dict[str, dict]:
+    """
+    Reads a download manifest.
+
+    Args:
+        manifest_path: Path to the JSON-lines manifest.
+
+    Returns:
+        dict: Image path -> latest manifest record.
+    """
+    records = {}
+    if not os.path.exists(manifest_path):
+        return records
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break  # Torn last line from an interrupted run
+            records[record["path"]] = record
+    return records
+
+
+def download_covers(jobs: List[Tuple[str, str]], manifest_path: str, max_workers: int = 16,
+                    requests_per_second: Optional[float] = None, retries: int = 3, backoff: float = 0.5,
+                    timeout: float = 10.0, session: Optional[requests.Session] = None) -> dict:
+    """
+    Downloads album covers concurrently and appends the outcome of every download to a manifest.
+
+    Files that already exist are counted as "exists" without a request; the
+    manifest already holds their record from the run that downloaded them. Downloads
+    go to a temporary file that is moved into place once complete, so an
+    interrupted run never leaves a truncated image behind.
+
+    Args:
+        jobs: (url, image path) pairs.
+        manifest_path: JSON-lines manifest of path -> status, appended to.
+        max_workers: Number of concurrent downloads.
+        requests_per_second: Maximum request rate per host, or None for no limit.
+        retries: Number of retries per image.
+        backoff: Delay before the first retry in seconds; doubled after every retry.
+        timeout: Connect and read timeout in seconds.
+        session: HTTP session to use. If None, a pooled session is created.
+
+    Returns:
+        dict: Counts per status, downloaded bytes, seconds and images per second.
+    """
+    session = session or create_session(max_workers)
+    rate_limiter = HostRateLimiter(requests_per_second)
+    stats = {STATUS_DOWNLOADED: 0, STATUS_EXISTS: 0, STATUS_FAILED: 0, "bytes": 0}
+    start_time = time.perf_counter()
+
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir:
+        os.makedirs(manifest_dir, exist_ok=True)
+    with open(manifest_path, "a") as manifest, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            tqdm(total=len(jobs), desc="Downloading Images") as pbar:
+
+        def write_record(record):
+            stats[record["status"]] += 1
+            stats["bytes"] += record["bytes"]
+            manifest.write(json.dumps(record) + "\n")
+            pbar.update(1)
+
+        futures = []
+        for url, image_path in jobs:
+            if os.path.exists(image_path):
+                stats[STATUS_EXISTS] += 1
+                pbar.update(1)
+            else:
+                futures.append(executor.submit(download_cover, session, url, image_path, rate_limiter,
+                                               retries, backoff, timeout))
+
+        for future in as_completed(futures):
+            record = future.result()
+            if record["status"] == STATUS_FAILED:
+                tqdm.write(f"Error downloading image from {record['url']}: {record['error']}")
+            write_record(record)
+
+    stats["seconds"] = time.perf_counter() - start_time
+    stats["images_per_second"] = stats[STATUS_DOWNLOADED] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+    print(f"Downloaded {stats[STATUS_DOWNLOADED]} images ({stats['bytes'] / 2**20:.1f} MiB) in "
+          f"{stats['seconds']:.1f}s ({stats['images_per_second']:.1f} images/sec), "
+          f"{stats[STATUS_EXISTS]} already present, {stats[STATUS_FAILED]} failed")
+    print(f"Manifest written to {manifest_path}")
+    return stats
+
+
+def cover_jobs(spotify_df: pd.DataFrame, image_dir: str) -> List[Tuple[str, str]]:
+    """
+    Builds the download jobs for a Spotify DataFrame with 'id' and 'img' columns.
+
+    Rows without a valid image URL are skipped.
+
+    Returns:
+        list: (url, image path) pairs.
+    """
+    valid = spotify_df["img"].map(lambda url: isinstance(url, str))
+    skipped = int((~valid).sum())
+    if skipped:
+        print(f"Skipping {skipped} rows without a valid image URL")
+    return [(url, cover_path(image_dir, song_id))
+            for url, song_id in zip(spotify_df.loc[valid, "img"], spotify_df.loc[valid, "id"])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download Spotify album covers concurrently.")
+    parser.add_argument("--spotify_data_path", type=str, default="spotify_data.csv", help="Path to the Spotify data CSV file.")
+    parser.add_argument("--image_dir", type=str, default="album_covers", help="Directory the album covers are saved to.")
+    parser.add_argument("--manifest", type=str, default=None, help="Path to the download manifest (default: <image_dir>/manifest.jsonl).")
+    parser.add_argument("--workers", type=int, default=16, help="Number of concurrent downloads.")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second per host (default: no limit).")
+    parser.add_argument("--retries", type=int, default=3, help="Number of retries per image.")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Connect and read timeout in seconds.")
+
+    args = parser.parse_args()
+
+    os.makedirs(args.image_dir, exist_ok=True)
+    download_covers(cover_jobs(pd.read_csv(args.spotify_data_path), args.image_dir),
+                    args.manifest or os.path.join(args.image_dir, "manifest.jsonl"),
+                    max_workers=args.workers, requests_per_second=args.rate,
+                    retries=args.retries, timeout=args.timeout)
@@ -1,7 +1,5 @@
 import pandas as pd
-import annoy
 import numpy as np
-import pickle
 from sklearn.preprocessing import StandardScaler
 import os
 
@@ -15,70 +13,49 @@ df = df_uncleaned[~df_uncleaned['preview'].isin([None, 'no', '']) & ~df_uncleane
 df.reset_index(drop=True, inplace=True)
 print(f"Cleaned DataFrame size: {df.shape}")
 
-# Load the deep learning features from pickle file
-print("Loading deep learning features from pickle file...")
+# Load the deep learning features from the memory-mapped feature store
+from recommender.feature_store import FeatureStore, convert_pickle_to_feature_store
+
+print("Loading deep learning features from feature store...")
 pickle_path = "spotify_data_both_efficientnet_v2_features.pkl"  # Update this path to your pickle file
+store_path = "spotify_data_both_efficientnet_v2_features.features"
 
-if os.path.exists(pickle_path):
-    with open(pickle_path, 'rb') as f:
-        features_dict = pickle.load(f)
-    print(f"Loaded features for {len(features_dict)} songs")
-else:
-    print(f"Warning: Pickle file {pickle_path} not found. Proceeding without deep learning features.")
-    features_dict = {}
+# Convert the pickle once; later runs open the store directly
+if not os.path.exists(store_path) and os.path.exists(pickle_path):
+    convert_pickle_to_feature_store(pickle_path, store_path)
 
-# Create a mapping from DataFrame index to original index
-df_index_to_original = {i: idx for i, idx in enumerate(df.index)}
-original_to_df_index = {idx: i for i, idx in df_index_to_original.items()}
+if os.path.exists(store_path):
+    feature_store = FeatureStore.open(store_path)
+    print(f"Loaded features for {len(feature_store)} songs")
+else:
+    print(f"Warning: Feature store {store_path} not found. Proceeding without deep learning features.")
+    feature_store = None
 
 # Filter to only include songs that have deep learning features
-if features_dict:
-    # Convert original indices in features_dict to new DataFrame indices
-    valid_indices = [original_to_df_index.get(idx) for idx in features_dict.keys() 
-                     if idx in original_to_df_index]
-    valid_indices = [idx for idx in valid_indices if idx is not None]
-    
-    # Filter DataFrame to only include rows with features
-    df = df.iloc[valid_indices].reset_index(drop=True)
+if feature_store is not None:
+    # Feature store row ids are DataFrame indices, look them up before resetting the index
+    df = df[feature_store.positions(df.index.to_numpy()) >= 0]
+    original_indices = df.index.to_numpy()
+    df = df.reset_index(drop=True)
     print(f"DataFrame filtered to songs with deep features. New shape: {df.shape}")
     
-    # Create a new mapping after filtering
-    df_index_to_original = {i: idx for i, idx in enumerate(df.index)}
-    original_to_df_index = {idx: i for i, idx in df_index_to_original.items()}
-    
-    # Extract deep learning features in the same order as DataFrame
-    deep_features = []
-    for i in range(len(df)):
-        original_idx = df_index_to_original[i]
-        if original_idx in features_dict:
-            deep_features.append(features_dict[original_idx])
-        else:
-            # This shouldn't happen after filtering, but just in case
-            print(f"Warning: Missing features for index {i} (original index {original_idx})")
-            # Use zeros as placeholder
-            sample_feature = next(iter(features_dict.values()))
-            deep_features.append(np.zeros_like(sample_feature))
-    
-    deep_features = np.array(deep_features)
+    # Extract deep learning features in the same order as DataFrame; only these rows are read
+    deep_features = feature_store.get(original_indices)
     print(f"Deep learning features shape: {deep_features.shape}")
 else:
     deep_features = None
     print("No deep learning features available.")
 
-# Extract non-image features (e.g., danceability, energy, etc.)
-audio_features = ['danceability', 'energy', 'loudness', 'speechiness', 'acousticness', 
-                 'instrumentalness', 'liveness', 'valence', 'tempo']
-non_image_features = df[audio_features].values
+# Extract non-image features (e.g., danceability, energy, etc.) and basic image features
+# as views into one float32 matrix; NaN/inf values are replaced with the column mean
+from recommender.features import AUDIO_COLUMNS, BASIC_IMAGE_COLUMNS, assemble_features
+
+audio_features = AUDIO_COLUMNS
+_, feature_blocks = assemble_features(df, {'audio': AUDIO_COLUMNS, 'basic_image': BASIC_IMAGE_COLUMNS})
+non_image_features = feature_blocks['audio']
 print(f"Non-image features shape: {non_image_features.shape}")
 
-# Extract basic image features
-basic_image_features = np.array([
-    np.concatenate([
-        np.array([df['single_pixel_color_r'][i], df['single_pixel_color_g'][i], df['single_pixel_color_b'][i]]),
-        np.array([df['weighted_average_color_r'][i], df['weighted_average_color_g'][i], df['weighted_average_color_b'][i]]),
-        np.array([df['most_vibrant_color_r'][i], df['most_vibrant_color_g'][i], df['most_vibrant_color_b'][i]])
-    ]) for i in range(len(df))
-])
+basic_image_features = feature_blocks['basic_image']
 print(f"Basic image features shape: {basic_image_features.shape}")
 
 # Standardize the features
@@ -128,57 +105,25 @@ if deep_features_scaled is not None:
 
 # Build Annoy indices for each feature set
 print("Building Annoy indices...")
+from recommender.build import build_annoy_indexes
 
-# Model 1: Audio features
-index_audio = annoy.AnnoyIndex(features_audio.shape[1], 'euclidean')
-for i, feature in enumerate(features_audio):
-    index_audio.add_item(i, feature)
-index_audio.build(10)  # Number of trees
-index_audio.save('audio_features.ann')
-print("Audio features index built and saved.")
-
-# Model 2: Basic image features
-index_basic_image = annoy.AnnoyIndex(features_basic_image.shape[1], 'euclidean')
-for i, feature in enumerate(features_basic_image):
-    index_basic_image.add_item(i, feature)
-index_basic_image.build(10)
-index_basic_image.save('basic_image_features.ann')
-print("Basic image features index built and saved.")
-
-# Model 3: Audio + Basic image features
-index_audio_basic_image = annoy.AnnoyIndex(features_audio_basic_image.shape[1], 'euclidean')
-for i, feature in enumerate(features_audio_basic_image):
-    index_audio_basic_image.add_item(i, feature)
-index_audio_basic_image.build(10)
-index_audio_basic_image.save('audio_basic_image_features.ann')
-print("Audio + Basic image features index built and saved.")
-
-# Model 4: Deep learning features (if available)
+feature_sets = {
+    'audio': features_audio,  # Model 1: Audio features
+    'basic_image': features_basic_image,  # Model 2: Basic image features
+    'audio_basic_image': features_audio_basic_image,  # Model 3: Audio + Basic image features
+}
 if deep_features_scaled is not None:
-    index_deep = annoy.AnnoyIndex(features_deep.shape[1], 'euclidean')
-    for i, feature in enumerate(features_deep):
-        index_deep.add_item(i, feature)
-    index_deep.build(10)
-    index_deep.save('deep_features.ann')
-    print("Deep features index built and saved.")
+    feature_sets['deep'] = features_deep  # Model 4: Deep learning features
+    feature_sets['audio_deep'] = features_audio_deep  # Model 5: Audio + Deep features
+    feature_sets['all'] = features_all  # Model 6: All features combined
 
-# Model 5: Audio + Deep features (if available)
-if deep_features_scaled is not None:
-    index_audio_deep = annoy.AnnoyIndex(features_audio_deep.shape[1], 'euclidean')
-    for i, feature in enumerate(features_audio_deep):
-        index_audio_deep.add_item(i, feature)
-    index_audio_deep.build(10)
-    index_audio_deep.save('audio_deep_features.ann')
-    print("Audio + Deep features index built and saved.")
+annoy_indexes = build_annoy_indexes(feature_sets, n_trees=10)
 
-# Model 6: All features combined (if deep features available)
-if deep_features_scaled is not None:
-    index_all = annoy.AnnoyIndex(features_all.shape[1], 'euclidean')
-    for i, feature in enumerate(features_all):
-        index_all.add_item(i, feature)
-    index_all.build(10)
-    index_all.save('all_features.ann')
-    print("All features combined index built and saved.")
+# Track id -> row position lookup, stored next to the indices
+from recommender import SongIdIndex, SONG_ID_INDEX_FILE
+song_id_index = SongIdIndex(df['id'])
+song_id_index.save(SONG_ID_INDEX_FILE)
+print("Track id index built and saved.")
 
 # Function to get song recommendations
 def get_recommendations(song_id, num_recommendations=10):
@@ -193,11 +138,11 @@ def get_recommendations(song_id, num_recommendations=10):
         dict: Dictionary with recommendations from different models
     """
     # Find the song in the DataFrame
-    if song_id not in df['id'].values:
+    song_index = song_id_index.resolve(song_id)
+    if song_index is None:
         print(f"Song ID {song_id} not found in the dataset.")
         return None
     
-    song_index = df[df['id'] == song_id].index[0]
     song_data = df.iloc[song_index]
     
     print("\n===== QUERY SONG =====")
@@ -208,46 +153,11 @@ def get_recommendations(song_id, num_recommendations=10):
     print("======================\n")
     
     recommendations = {}
-    
-    # Model 1: Audio features
-    index_audio.load('audio_features.ann')
-    closest_indices_audio = index_audio.get_nns_by_item(song_index, num_recommendations + 1)
-    # Remove the query song itself (first result)
-    closest_indices_audio = [idx for idx in closest_indices_audio if idx != song_index][:num_recommendations]
-    recommendations['audio'] = df.iloc[closest_indices_audio]
-    
-    # Model 2: Basic image features
-    index_basic_image.load('basic_image_features.ann')
-    closest_indices_basic_image = index_basic_image.get_nns_by_item(song_index, num_recommendations + 1)
-    closest_indices_basic_image = [idx for idx in closest_indices_basic_image if idx != song_index][:num_recommendations]
-    recommendations['basic_image'] = df.iloc[closest_indices_basic_image]
-    
-    # Model 3: Audio + Basic image features
-    index_audio_basic_image.load('audio_basic_image_features.ann')
-    closest_indices_audio_basic_image = index_audio_basic_image.get_nns_by_item(song_index, num_recommendations + 1)
-    closest_indices_audio_basic_image = [idx for idx in closest_indices_audio_basic_image if idx != song_index][:num_recommendations]
-    recommendations['audio_basic_image'] = df.iloc[closest_indices_audio_basic_image]
-    
-    # Model 4: Deep learning features (if available)
-    if deep_features_scaled is not None:
-        index_deep.load('deep_features.ann')
-        closest_indices_deep = index_deep.get_nns_by_item(song_index, num_recommendations + 1)
-        closest_indices_deep = [idx for idx in closest_indices_deep if idx != song_index][:num_recommendations]
-        recommendations['deep'] = df.iloc[closest_indices_deep]
-    
-    # Model 5: Audio + Deep features (if available)
-    if deep_features_scaled is not None:
-        index_audio_deep.load('audio_deep_features.ann')
-        closest_indices_audio_deep = index_audio_deep.get_nns_by_item(song_index, num_recommendations + 1)
-        closest_indices_audio_deep = [idx for idx in closest_indices_audio_deep if idx != song_index][:num_recommendations]
-        recommendations['audio_deep'] = df.iloc[closest_indices_audio_deep]
-    
-    # Model 6: All features combined (if deep features available)
-    if deep_features_scaled is not None:
-        index_all.load('all_features.ann')
-        closest_indices_all = index_all.get_nns_by_item(song_index, num_recommendations + 1)
-        closest_indices_all = [idx for idx in closest_indices_all if idx != song_index][:num_recommendations]
-        recommendations['all'] = df.iloc[closest_indices_all]
+    for model_name, index in annoy_indexes.items():
+        closest_indices = index.get_nns_by_item(song_index, num_recommendations + 1)
+        # Remove the query song itself (first result)
+        closest_indices = [idx for idx in closest_indices if idx != song_index][:num_recommendations]
+        recommendations[model_name] = df.iloc[closest_indices]
     
     return recommendations
 
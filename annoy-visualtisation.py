@@ -1,11 +1,12 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from annoy import AnnoyIndex
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
 import random
 
+from recommender.features import AUDIO_COLUMNS, BASIC_IMAGE_COLUMNS, assemble_features
+
 # Load the data (assuming the CSV is in the current directory)
 df_uncleaned = pd.read_csv("spotify_data_with_image_features.csv")
 print("DataFrame loaded successfully.")
@@ -15,17 +16,11 @@ df = df_uncleaned[~df_uncleaned['preview'].isin([None, 'no', '']) & ~df_uncleane
 df.reset_index(drop=True, inplace=True)
 print(f"Cleaned DataFrame size: {df.shape}")
 
-# Extract features
-non_image_features = df[['danceability', 'energy', 'loudness', 'speechiness', 'acousticness', 
-                         'instrumentalness', 'liveness', 'valence']].values
-
-image_features = np.array([
-    np.concatenate([
-        np.array([df['single_pixel_color_r'][i], df['single_pixel_color_g'][i], df['single_pixel_color_b'][i]]),
-        np.array([df['weighted_average_color_r'][i], df['weighted_average_color_g'][i], df['weighted_average_color_b'][i]]),
-        np.array([df['most_vibrant_color_r'][i], df['most_vibrant_color_g'][i], df['most_vibrant_color_b'][i]])
-    ]) for i in range(len(df))
-])
+# Extract features as views into one float32 matrix (tempo is not used here)
+non_image_columns = [column for column in AUDIO_COLUMNS if column != 'tempo']
+_, feature_blocks = assemble_features(df, {'non_image': non_image_columns, 'image': BASIC_IMAGE_COLUMNS})
+non_image_features = feature_blocks['non_image']
+image_features = feature_blocks['image']
 
 # Standardize features
 scaler = StandardScaler()
@@ -50,16 +45,9 @@ pca = PCA(n_components=2)
 features_2d = pca.fit_transform(features)
 print(f"Explained variance ratio: {pca.explained_variance_ratio_}")
 
-# Cluster the data using Annoy
-f = features.shape[1]  # Number of dimensions
-t = AnnoyIndex(f, 'euclidean')  # Using Euclidean distance
-
-# Add items to the index
-for i in range(len(features)):
-    t.add_item(i, features[i])
-
-# Build the index
-t.build(10)  # 10 trees
+# Cluster the data using Annoy (Euclidean distance, 10 trees built on all cores)
+from recommender.build import build_annoy_index
+t = build_annoy_index(features, n_trees=10)
 
 # Function to assign colors to clusters
 def get_clusters(index, data, n_clusters=20, points_per_cluster=50):
@@ -0,0 +1,29 @@
+import os
+import cv2
+import numpy as np
+
+# Sample covers shipped with the repository, relative to the project root
+SAMPLE_COVERS = [
+    'album_cover.jpg',
+    'marketing.png',
+    os.path.join('frontend', 'src', 'app', 'icon.png'),
+    os.path.join('frontend', 'public', 'og.png'),
+]
+
+
+def legacy_find_most_vibrant_color(image, brightness_threshold=0.5):
+    """The original per-pixel implementation, kept as the reference."""
+    hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    height, width = hsv_image.shape[:2]
+    vibrant_colors = []
+    for y in range(height):
+        for x in range(width):
+            hue, saturation, value = hsv_image[y, x]
+            if value / 255.0 > brightness_threshold:
+                vibrant_colors.append((hue, saturation, value))
+    if not vibrant_colors:
+        return (0, 0, 0)
+    most_vibrant_color = max(vibrant_colors, key=lambda color: color[1])
+    most_vibrant_color_hsv = np.uint8([[most_vibrant_color]])
+    most_vibrant_color_rgb = cv2.cvtColor(most_vibrant_color_hsv, cv2.COLOR_HSV2BGR)[0][0]
+    return tuple(most_vibrant_color_rgb.astype(int))
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Add the project root to the Python path so the module also runs as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from addBasicImagefeatures import dominant_color_kmeans, dominant_color_fast
+from benchmarks._reference import SAMPLE_COVERS
+
+# Fast methods compared against dominant_color_kmeans, keyed by their --features name
+FAST_METHODS = {
+    'dominant_color_fast': lambda image, k: dominant_color_fast(image, k, method='minibatch'),
+    'dominant_color_histogram': lambda image, k: dominant_color_fast(image, k, method='histogram'),
+}
+
+
+def matched_centroid_distance(colors, reference_colors):
+    """
+    Mean RGB distance between two sets of colors after matching them one to one.
+
+    Args:
+        colors (list): Colors found by a fast method.
+        reference_colors (list): Colors found by the exact method.
+
+    Returns:
+        float: Mean Euclidean distance of the matched pairs (0-441).
+    """
+    colors = np.asarray(colors, dtype=np.float64)
+    reference_colors = np.asarray(reference_colors, dtype=np.float64)
+    distances = np.linalg.norm(colors[:, None, :] - reference_colors[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(distances)
+    return distances[rows, cols].mean()
+
+
+def timed(function, *args):
+    """Returns the result of function(*args) and its duration in seconds."""
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def list_images(paths):
+    """Expands directories into the image files they contain."""
+    image_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            image_paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                      if name.lower().endswith(('.jpg', '.jpeg', '.png'))))
+        else:
+            image_paths.append(path)
+    return image_paths
+
+
+def main(paths, k):
+    exact_seconds = []
+    distances = {name: [] for name in FAST_METHODS}
+    seconds = {name: [] for name in FAST_METHODS}
+
+    for image_path in list_images(paths):
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Skipping {image_path}: could not read the image")
+            continue
+
+        reference_colors, elapsed = timed(dominant_color_kmeans, image, k)
+        exact_seconds.append(elapsed)
+        for name, method in FAST_METHODS.items():
+            colors, elapsed = timed(method, image, k)
+            seconds[name].append(elapsed)
+            distances[name].append(matched_centroid_distance(colors, reference_colors))
+
+    if not exact_seconds:
+        print("No images to evaluate")
+        return
+
+    print(f"Dominant colors (k={k}) on {len(exact_seconds)} images, "
+          f"distance = RGB distance of matched centroids to dominant_color_kmeans")
+    print(f"{'method':<26} {'mean dist':>10} {'max dist':>10} {'ms/image':>10} {'speed-up':>10}")
+    print(f"{'dominant_color_kmeans':<26} {0.0:10.2f} {0.0:10.2f} {np.mean(exact_seconds) * 1000:10.1f} {1.0:9.1f}x")
+    for name in FAST_METHODS:
+        print(f"{name:<26} {np.mean(distances[name]):10.2f} {np.max(distances[name]):10.2f} "
+              f"{np.mean(seconds[name]) * 1000:10.1f} {np.mean(exact_seconds) / np.mean(seconds[name]):9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the fast dominant color methods with dominant_color_kmeans')
+    parser.add_argument('images', nargs='*', default=[os.path.join(PROJECT_ROOT, path) for path in SAMPLE_COVERS],
+                        help='Images or directories of images (default: the sample covers in the repository)')
+    parser.add_argument('--k', type=int, default=3, help='Number of dominant colors (default: 3)')
+
+    args = parser.parse_args()
+    main(args.images, args.k)
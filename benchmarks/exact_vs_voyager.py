@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add the project root to the Python path so the module also runs as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from recommender.build import DEFAULT_EF_CONSTRUCTION, DEFAULT_M, build_voyager_index
+from recommender.evaluation import recall_at_k
+from recommender.exact import build_exact_index
+
+
+def timed(function, *args, **kwargs):
+    """Calls function once and returns (result, seconds)."""
+    start_time = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+def single_query_latency(index, queries, k):
+    """Median seconds per query when the queries are issued one at a time."""
+    latencies = []
+    for query in queries:
+        start_time = time.perf_counter()
+        index.query(query, k=k)
+        latencies.append(time.perf_counter() - start_time)
+    return float(np.median(latencies))
+
+
+def main(num_items, num_dimensions, num_queries, k, seed):
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(num_items, num_dimensions)).astype(np.float32)
+    queries = features[rng.choice(num_items, size=num_queries, replace=False)]
+
+    exact_index, exact_build = timed(build_exact_index, features)
+    (exact_ids, _), exact_batch = timed(exact_index.query, queries, k=k)
+    results = {'exact': (exact_build, exact_batch, single_query_latency(exact_index, queries[:200], k), 1.0)}
+
+    try:
+        voyager_index, voyager_build = timed(build_voyager_index, features, M=DEFAULT_M,
+                                             ef_construction=DEFAULT_EF_CONSTRUCTION)
+    except ImportError as e:
+        print(f"Skipping Voyager: {e}")
+    else:
+        (voyager_ids, _), voyager_batch = timed(voyager_index.query, queries, k=k)
+        results['voyager'] = (voyager_build, voyager_batch, single_query_latency(voyager_index, queries[:200], k),
+                              recall_at_k(voyager_ids, exact_ids, k))
+
+    print(f"{num_items:,} x {num_dimensions} vectors, {num_queries:,} queries, k={k}")
+    print(f"{'index':<10} {'build s':>9} {'batch QPS':>12} {'single ms':>10} {'recall@k':>9}")
+    for name, (build_seconds, batch_seconds, single_seconds, recall) in results.items():
+        print(f"{name:<10} {build_seconds:9.3f} {num_queries / batch_seconds:12,.0f} "
+              f"{single_seconds * 1000:10.3f} {recall:9.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare exact k-NN with Voyager on latency and recall')
+    parser.add_argument('--num-items', type=int, default=100000, help='Catalogue size (default: 100000)')
+    parser.add_argument('--num-dimensions', type=int, default=9, help='Vector length (default: 9, the audio space)')
+    parser.add_argument('--num-queries', type=int, default=2000, help='Number of query vectors (default: 2000)')
+    parser.add_argument('-k', type=int, default=10, help='Neighbours per query (default: 10)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    args = parser.parse_args()
+    main(args.num_items, args.num_dimensions, args.num_queries, args.k, args.seed)
@@ -0,0 +1,359 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+# Add the project root to the Python path so the module also runs as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from recommender.build import build_annoy_index, build_voyager_index
+from recommender.engine import MODEL_INDEX_FILES, _resident_set_size
+from recommender.evaluation import recall_at_k
+from recommender.exact import build_exact_index
+from recommender.features import AUDIO_COLUMNS, BASIC_IMAGE_COLUMNS, SPACE_BLOCKS, assemble_features
+
+# Build-time parameter grids; every build is queried with each of the query-time parameters
+VOYAGER_BUILD_GRID = {'M': [8, 12, 16, 32], 'ef_construction': [100, 200, 400]}
+VOYAGER_QUERY_EF = [10, 20, 50, 100, 200, 400]
+ANNOY_BUILD_GRID = {'n_trees': [5, 10, 25, 50, 100]}
+ANNOY_SEARCH_K = [-1, 1000, 5000, 20000, 100000]
+
+# Dimensions of the synthetic deep block (EfficientNet-V2 features)
+SYNTHETIC_DEEP_DIMENSIONS = 1280
+
+RESULTS_FILE = 'index_params.json'
+
+
+def _standardize(block):
+    """Standardizes the columns of a block; constant columns are only centred."""
+    block = np.asarray(block, dtype=np.float32)
+    scale = block.std(axis=0)
+    return (block - block.mean(axis=0)) / np.where(scale > 0, scale, 1)
+
+
+def _spaces_from_blocks(blocks, spaces=None):
+    """Concatenates standardized blocks into the index spaces whose blocks are all available."""
+    feature_sets = {}
+    for model_name in (spaces or list(MODEL_INDEX_FILES)):
+        if all(block in blocks for block in SPACE_BLOCKS[model_name]):
+            feature_sets[model_name] = np.ascontiguousarray(
+                np.hstack([blocks[block] for block in SPACE_BLOCKS[model_name]]), dtype=np.float32)
+    return feature_sets
+
+
+def load_feature_spaces(csv_path, store_path=None, num_items=None, spaces=None, seed=0):
+    """
+    Builds the index feature spaces the same way voyager.py does.
+
+    Args:
+        csv_path (str): CSV with the audio and basic image feature columns.
+        store_path (str): Optional feature store with the deep features, keyed by CSV row.
+        num_items (int): Optional random subsample of tracks.
+        spaces (list): Spaces to build. Defaults to every space in MODEL_INDEX_FILES.
+        seed (int): Seed of the subsample.
+
+    Returns:
+        dict: Model name -> standardized float32 feature matrix.
+    """
+    df = pd.read_csv(csv_path, low_memory=False)
+    deep_features = None
+    if store_path is not None:
+        from recommender.feature_store import FeatureStore
+
+        feature_store = FeatureStore.open(store_path)
+        df = df[feature_store.positions(df.index.to_numpy()) >= 0]
+        deep_features = feature_store.get(df.index.to_numpy())
+        df = df.reset_index(drop=True)
+    if num_items is not None and num_items < len(df):
+        rows = np.sort(np.random.default_rng(seed).choice(len(df), size=num_items, replace=False))
+        df = df.iloc[rows].reset_index(drop=True)
+        deep_features = deep_features[rows] if deep_features is not None else None
+
+    _, blocks = assemble_features(df, {'audio': AUDIO_COLUMNS, 'basic_image': BASIC_IMAGE_COLUMNS})
+    blocks = {name: _standardize(block) for name, block in blocks.items()}
+    if deep_features is not None:
+        blocks['deep'] = _standardize(np.nan_to_num(deep_features))
+    return _spaces_from_blocks(blocks, spaces)
+
+
+def synthetic_feature_spaces(num_items, deep_dimensions=SYNTHETIC_DEEP_DIMENSIONS, spaces=None, seed=0):
+    """Random clustered feature spaces with the dimensions of the real ones, for runs without data."""
+    rng = np.random.default_rng(seed)
+    blocks = {}
+    for name, num_dimensions in [('audio', len(AUDIO_COLUMNS)), ('basic_image', len(BASIC_IMAGE_COLUMNS)),
+                                 ('deep', deep_dimensions)]:
+        # Points around a few hundred centres, so neighbourhoods are not uniformly random
+        centres = rng.normal(size=(256, num_dimensions))
+        blocks[name] = _standardize(centres[rng.integers(0, 256, size=num_items)]
+                                    + 0.5 * rng.normal(size=(num_items, num_dimensions)))
+    return _spaces_from_blocks(blocks, spaces)
+
+
+def latency_summary(latencies):
+    """Percentiles in milliseconds and single-threaded throughput of per-query latencies."""
+    latencies = np.asarray(latencies)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'qps': float(len(latencies) / latencies.sum())}
+
+
+def query_voyager(index, queries, k, query_ef):
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start_time = time.perf_counter()
+        ids[i] = index.query(query, k=k, query_ef=query_ef)[0]
+        latencies[i] = time.perf_counter() - start_time
+    return ids, latencies
+
+
+def query_annoy(index, queries, k, search_k):
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries.tolist()):
+        start_time = time.perf_counter()
+        neighbours = index.get_nns_by_vector(query, k, search_k=search_k)
+        latencies[i] = time.perf_counter() - start_time
+        ids[i, :len(neighbours)] = neighbours
+    return ids, latencies
+
+
+def measure_build(backend, features, build_params, queries, exact_ids, k, index_dir):
+    """
+    Builds one index, saves it and sweeps its query-time parameter.
+
+    Args:
+        backend (str): 'voyager' or 'annoy'.
+        features (np.ndarray): Feature matrix of the space.
+        build_params (dict): Build parameters (M/ef_construction or n_trees).
+        queries (np.ndarray): Query vectors.
+        exact_ids (np.ndarray): Exact neighbour ids of the queries.
+        k (int): Neighbours per query.
+        index_dir (str): Directory the index is saved to, to measure its size.
+
+    Returns:
+        list: One result per query-time parameter value.
+    """
+    rss_before = _resident_set_size()
+    start_time = time.perf_counter()
+    if backend == 'voyager':
+        index = build_voyager_index(features, num_threads=1, **build_params)
+        path = os.path.join(index_dir, 'index.voy')
+        sweep = [('query_ef', query_ef, query_voyager) for query_ef in VOYAGER_QUERY_EF if query_ef >= k]
+    else:
+        index = build_annoy_index(features, n_jobs=1, **build_params)
+        path = os.path.join(index_dir, 'index.ann')
+        sweep = [('search_k', search_k, query_annoy) for search_k in ANNOY_SEARCH_K]
+    build_seconds = time.perf_counter() - start_time
+    index.save(path)
+    size_bytes = os.path.getsize(path)
+
+    results = []
+    for query_param, value, query in sweep:
+        ids, latencies = query(index, queries, k, value)
+        results.append({
+            'backend': backend,
+            **build_params,
+            query_param: value,
+            'recall': recall_at_k(ids, exact_ids, k),
+            **latency_summary(latencies),
+            'build_seconds': build_seconds,
+            'size_bytes': size_bytes,
+        })
+
+    # ru_maxrss is in KiB on Linux; run_isolated gives each build a fresh process
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    for result in results:
+        result['peak_rss_bytes'] = peak_rss
+        result['build_rss_bytes'] = max(peak_rss - rss_before, 0) if rss_before is not None else None
+    return results
+
+
+def _child(connection, function, args):
+    try:
+        connection.send((True, function(*args)))
+    except Exception as e:
+        connection.send((False, e))
+    finally:
+        connection.close()
+
+
+def run_isolated(function, *args):
+    """
+    Runs function in a forked process, so its peak RSS covers only what it allocates.
+
+    The arguments are inherited through fork rather than pickled. Without fork
+    the function runs in this process and the peak RSS includes earlier builds.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return function(*args)
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_child, args=(sender, function, args))
+    process.start()
+    sender.close()
+    success, result = receiver.recv()
+    process.join()
+    if not success:
+        raise result
+    return result
+
+
+def benchmark_space(model_name, features, backends, k, num_queries, seed=0):
+    """
+    Benchmarks every build configuration of every backend on one feature space.
+
+    The queries are catalogue rows, and their exact neighbours (the query
+    row itself included) are the ground truth for recall@k.
+
+    Returns:
+        list: Result dicts, each tagged with the space and its size.
+    """
+    rng = np.random.default_rng(seed)
+    queries = features[rng.choice(len(features), size=min(num_queries, len(features)), replace=False)]
+    exact_ids, _ = build_exact_index(features).query(queries, k=k)
+
+    grids = {'voyager': VOYAGER_BUILD_GRID, 'annoy': ANNOY_BUILD_GRID}
+    results = []
+    for backend in backends:
+        grid = grids[backend]
+        for values in itertools.product(*grid.values()):
+            build_params = dict(zip(grid, values))
+            index_dir = tempfile.mkdtemp()
+            try:
+                build_results = run_isolated(measure_build, backend, features, build_params,
+                                             queries, exact_ids, k, index_dir)
+            except ImportError as e:
+                print(f"Skipping {backend}: {e}")
+                break
+            finally:
+                shutil.rmtree(index_dir, ignore_errors=True)
+            for result in build_results:
+                result.update({'space': model_name, 'num_items': len(features),
+                               'num_dimensions': features.shape[1], 'k': k})
+                results.append(result)
+            best = max(build_results, key=lambda result: result['recall'])
+            print(f"{model_name:<18} {backend:<8} {build_params} built in {best['build_seconds']:.2f}s, "
+                  f"{best['size_bytes'] / 2**20:.1f} MiB, best recall@{k} {best['recall']:.4f}")
+    return results
+
+
+def _preference(result, target_recall):
+    """Sort key: configurations that reach the target recall by QPS, the others by recall."""
+    reaches_target = result['recall'] >= target_recall
+    return reaches_target, result['qps'] if reaches_target else result['recall']
+
+
+def choose_parameters(results, target_recall):
+    """
+    Picks the fastest configuration per space and backend that reaches the target recall.
+
+    Returns:
+        dict: Space -> backend -> result with the highest QPS among those with
+            recall >= target_recall, or the most accurate one if none reaches it.
+    """
+    chosen = {}
+    for result in results:
+        space = chosen.setdefault(result['space'], {})
+        current = space.get(result['backend'])
+        if current is None or _preference(result, target_recall) > _preference(current, target_recall):
+            space[result['backend']] = result
+    return chosen
+
+
+def plot_results(results, output_dir):
+    """
+    Saves a recall vs. QPS plot per space, with one curve per build configuration.
+
+    Returns:
+        list: Paths of the saved plots.
+    """
+    from matplotlib.figure import Figure
+
+    paths = []
+    for model_name in dict.fromkeys(result['space'] for result in results):
+        fig = Figure(figsize=(10, 6))
+        ax = fig.add_subplot(1, 1, 1)
+        space_results = [result for result in results if result['space'] == model_name]
+        curves = {}
+        for result in space_results:
+            if result['backend'] == 'voyager':
+                label = f"voyager M={result['M']} efc={result['ef_construction']}"
+            else:
+                label = f"annoy trees={result['n_trees']}"
+            curves.setdefault(label, []).append((result['recall'], result['qps']))
+        for label, points in curves.items():
+            recall, qps = zip(*sorted(points))
+            ax.plot(recall, qps, marker='o', label=label)
+        ax.set_yscale('log')
+        ax.set_xlabel(f"recall@{space_results[0]['k']}")
+        ax.set_ylabel('queries per second (single thread)')
+        ax.set_title(f"{model_name} ({space_results[0]['num_items']:,} x {space_results[0]['num_dimensions']})")
+        ax.grid(True, which='both', alpha=0.3)
+        ax.legend(fontsize='x-small', ncol=2)
+        fig.tight_layout()
+        path = os.path.join(output_dir, f"{model_name}_recall_qps.png")
+        fig.savefig(path)
+        paths.append(path)
+    return paths
+
+
+def main(args):
+    if args.csv:
+        feature_sets = load_feature_spaces(args.csv, args.feature_store, args.num_items, args.spaces, args.seed)
+    else:
+        feature_sets = synthetic_feature_spaces(args.num_items or 20000, args.deep_dimensions, args.spaces, args.seed)
+
+    results = []
+    for model_name, features in feature_sets.items():
+        results.extend(benchmark_space(model_name, features, args.backends, args.k, args.num_queries, args.seed))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    chosen = choose_parameters(results, args.target_recall)
+    with open(os.path.join(args.output_dir, RESULTS_FILE), 'w') as f:
+        json.dump({'target_recall': args.target_recall, 'results': results, 'chosen': chosen}, f, indent=4)
+    plot_paths = plot_results(results, args.output_dir)
+
+    print(f"\nFastest configuration with recall@{args.k} >= {args.target_recall}:")
+    print(f"{'space':<18} {'backend':<8} {'parameters':<44} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'QPS':>9} {'MiB':>8}")
+    for model_name, backends in chosen.items():
+        for backend, result in backends.items():
+            params = {key: result[key] for key in ('M', 'ef_construction', 'query_ef', 'n_trees', 'search_k')
+                      if key in result}
+            print(f"{model_name:<18} {backend:<8} {json.dumps(params):<44} {result['recall']:7.4f} "
+                  f"{result['p50_ms']:8.3f} {result['p99_ms']:8.3f} {result['qps']:9,.0f} "
+                  f"{result['size_bytes'] / 2**20:8.1f}")
+    print(f"\nResults saved to {os.path.join(args.output_dir, RESULTS_FILE)} with {len(plot_paths)} plots")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark recall and latency of Voyager and Annoy index parameters '
+                                                 'on every feature space')
+    parser.add_argument('--csv', default=None, help='CSV with the audio and basic image features '
+                                                    '(default: synthetic data with the same dimensions)')
+    parser.add_argument('--feature-store', default=None, help='Feature store with the deep features of the CSV rows')
+    parser.add_argument('--num-items', type=int, default=None, help='Number of tracks to sample '
+                                                                    '(default: all, or 20000 synthetic)')
+    parser.add_argument('--deep-dimensions', type=int, default=SYNTHETIC_DEEP_DIMENSIONS,
+                        help=f'Dimensions of the synthetic deep block (default: {SYNTHETIC_DEEP_DIMENSIONS})')
+    parser.add_argument('--spaces', nargs='+', default=None, choices=list(MODEL_INDEX_FILES),
+                        help='Spaces to benchmark (default: all available)')
+    parser.add_argument('--backends', nargs='+', default=['voyager', 'annoy'], choices=['voyager', 'annoy'],
+                        help='Index libraries to benchmark (default: both)')
+    parser.add_argument('-k', type=int, default=10, help='Neighbours per query (default: 10)')
+    parser.add_argument('--num-queries', type=int, default=1000, help='Number of queries (default: 1000)')
+    parser.add_argument('--target-recall', type=float, default=0.95,
+                        help='Recall the chosen parameters must reach (default: 0.95)')
+    parser.add_argument('--output-dir', default='index_params_benchmark', help='Directory for the JSON and plots')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    main(parser.parse_args())
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+
+# Add the project root to the Python path so the module also runs as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.index_params import SYNTHETIC_DEEP_DIMENSIONS, load_feature_spaces, synthetic_feature_spaces
+from recommender.build import build_voyager_index
+from recommender.evaluation import recall_at_k
+from recommender.exact import build_exact_index
+from recommender.features import SPACE_BLOCKS
+from recommender.reduction import fit_projection
+
+# Spaces that contain the deep block and are therefore reduced
+DEEP_SPACES = [model_name for model_name, blocks in SPACE_BLOCKS.items() if 'deep' in blocks]
+
+TARGET_VARIANCES = [0.8, 0.9, 0.95, 0.99]
+
+
+def voyager_file_bytes(features):
+    """Size of a saved Voyager index of the features, or None if voyager is not installed."""
+    try:
+        index = build_voyager_index(features)
+    except ImportError:
+        return None
+    with tempfile.TemporaryDirectory() as index_dir:
+        path = os.path.join(index_dir, 'index.voy')
+        index.save(path)
+        return os.path.getsize(path)
+
+
+def evaluate_space(full_features, reduced_features, query_rows, k, exact_ids):
+    """Recall@k of exact search in the reduced space against exact neighbours in the full space."""
+    index = build_exact_index(reduced_features)
+    start_time = time.perf_counter()
+    ids, _ = index.query(reduced_features[query_rows], k=k)
+    query_seconds = time.perf_counter() - start_time
+    return {
+        'num_dimensions': reduced_features.shape[1],
+        'recall': recall_at_k(ids, exact_ids, k),
+        'size_ratio': reduced_features.shape[1] / full_features.shape[1],
+        'exact_query_ms': query_seconds * 1000 / len(query_rows),
+    }
+
+
+def main(args):
+    if args.csv:
+        blocks = load_feature_spaces(args.csv, args.feature_store, args.num_items,
+                                     ['audio', 'basic_image', 'deep'], args.seed)
+    else:
+        blocks = synthetic_feature_spaces(args.num_items or 20000, args.deep_dimensions,
+                                          ['audio', 'basic_image', 'deep'], args.seed)
+    if 'deep' not in blocks:
+        raise ValueError("No deep features to reduce; pass --feature-store with --csv")
+
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(len(blocks['deep']), size=min(args.num_queries, len(blocks['deep'])), replace=False)
+
+    # Ground truth: exact neighbours of every deep space at full dimension
+    full_spaces = {model_name: np.hstack([blocks[block] for block in SPACE_BLOCKS[model_name]])
+                   for model_name in DEEP_SPACES}
+    baseline = {}
+    for model_name, features in full_spaces.items():
+        index = build_exact_index(features)
+        start_time = time.perf_counter()
+        exact_ids, _ = index.query(features[query_rows], k=args.k)
+        baseline[model_name] = {
+            'exact_ids': exact_ids,
+            'num_dimensions': features.shape[1],
+            'exact_query_ms': (time.perf_counter() - start_time) * 1000 / len(query_rows),
+            'voyager_bytes': voyager_file_bytes(features) if args.voyager else None,
+        }
+
+    results = []
+    configurations = [('pca', variance) for variance in args.target_variances]
+    configurations += [('random', variance) for variance in args.target_variances] if args.random else []
+    for method, target_variance in configurations:
+        components, center, report = fit_projection(blocks['deep'], target_variance=target_variance,
+                                                    method=method, seed=args.seed)
+        reduced_deep = ((blocks['deep'] - center) @ components.T).astype(np.float32)
+        reduced_blocks = {**blocks, 'deep': reduced_deep}
+        for model_name in DEEP_SPACES:
+            reduced = np.hstack([reduced_blocks[block] for block in SPACE_BLOCKS[model_name]])
+            result = {'space': model_name, 'target_variance': target_variance, **report,
+                      **evaluate_space(full_spaces[model_name], reduced, query_rows, args.k,
+                                       baseline[model_name]['exact_ids'])}
+            if args.voyager:
+                result['voyager_bytes'] = voyager_file_bytes(reduced)
+            results.append(result)
+
+    print(f"Recall@{args.k} of reduced-space exact search against full-dimension exact neighbours "
+          f"({len(blocks['deep']):,} tracks, {len(query_rows):,} queries)")
+    print(f"{'space':<12} {'method':<7} {'variance':>8} {'dims':>11} {'kept var':>9} {'recall':>7} "
+          f"{'size':>6} {'query ms':>15}")
+    for result in results:
+        full = baseline[result['space']]
+        kept = f"{result['explained_variance']:.1%}" if result['explained_variance'] is not None else '-'
+        print(f"{result['space']:<12} {result['method']:<7} {result['target_variance']:8.2f} "
+              f"{full['num_dimensions']:>5}->{result['num_dimensions']:<5} {kept:>9} {result['recall']:7.4f} "
+              f"{result['size_ratio']:6.1%} {full['exact_query_ms']:7.3f}->{result['exact_query_ms']:<7.3f}")
+
+    if args.output:
+        for stats in baseline.values():
+            del stats['exact_ids']
+        with open(args.output, 'w') as f:
+            json.dump({'k': args.k, 'baseline': baseline, 'results': results}, f, indent=4)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report the recall impact of indexing the deep features in a '
+                                                 'PCA- or randomly-projected space')
+    parser.add_argument('--csv', default=None, help='CSV with the audio and basic image features '
+                                                    '(default: synthetic data with the same dimensions)')
+    parser.add_argument('--feature-store', default=None, help='Feature store with the deep features of the CSV rows')
+    parser.add_argument('--num-items', type=int, default=None, help='Number of tracks to sample '
+                                                                    '(default: all, or 20000 synthetic)')
+    parser.add_argument('--deep-dimensions', type=int, default=SYNTHETIC_DEEP_DIMENSIONS,
+                        help=f'Dimensions of the synthetic deep block (default: {SYNTHETIC_DEEP_DIMENSIONS})')
+    parser.add_argument('--target-variances', type=float, nargs='+', default=TARGET_VARIANCES,
+                        help=f'Shares of the variance to keep (default: {TARGET_VARIANCES})')
+    parser.add_argument('--random', action='store_true', help='Also evaluate random projections of the same sizes')
+    parser.add_argument('--voyager', action='store_true', help='Also report the size of Voyager index files')
+    parser.add_argument('-k', type=int, default=10, help='Neighbours per query (default: 10)')
+    parser.add_argument('--num-queries', type=int, default=1000, help='Number of queries (default: 1000)')
+    parser.add_argument('--output', default=None, help='JSON file the report is written to')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    main(parser.parse_args())
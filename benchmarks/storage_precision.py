@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import numpy as np
+
+# Add the project root to the Python path so the module also runs as a script
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.index_params import (SYNTHETIC_DEEP_DIMENSIONS, latency_summary, load_feature_spaces, query_voyager,
+                                     run_isolated, synthetic_feature_spaces)
+from recommender.build import build_voyager_index
+from recommender.engine import MODEL_INDEX_FILES, _import_voyager, _resident_set_size
+from recommender.evaluation import recall_at_k
+from recommender.exact import build_exact_index
+from recommender.precision import STORAGE_BYTES, STORAGE_DATA_TYPES, calibrate_scale, clip_to_storage, quantize
+
+
+def measure_voyager(features, precision, queries, exact_ids, k, query_ef):
+    """Builds a Voyager index at one precision and returns its size, memory, latency and recall."""
+    rss_before = _resident_set_size()
+    start_time = time.perf_counter()
+    index = build_voyager_index(features, num_threads=1, precision=precision)
+    build_seconds = time.perf_counter() - start_time
+    rss_after = _resident_set_size()
+    with tempfile.TemporaryDirectory() as index_dir:
+        path = os.path.join(index_dir, 'index.voy')
+        index.save(path)
+        file_bytes = os.path.getsize(path)
+
+    ids, latencies = query_voyager(index, queries, k, query_ef)
+    return {
+        'voyager_recall': recall_at_k(ids, exact_ids, k),
+        'build_seconds': build_seconds,
+        'file_bytes': file_bytes,
+        'resident_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        # ru_maxrss is in KiB on Linux; run_isolated gives each build a fresh process
+        'peak_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        **latency_summary(latencies),
+    }
+
+
+def benchmark_space(model_name, features, precisions, k, num_queries, query_ef, use_voyager, seed=0):
+    """
+    Compares the storage precisions on one feature space.
+
+    Recall is measured against exact float32 neighbours twice: for exact search
+    over the quantized vectors, which isolates the precision loss, and for the
+    Voyager index itself when voyager is installed.
+
+    Returns:
+        list: One result dict per precision.
+    """
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(features), size=min(num_queries, len(features)), replace=False)
+    exact_ids, _ = build_exact_index(features).query(features[query_rows], k=k)
+
+    results = []
+    for precision in precisions:
+        scale = calibrate_scale(features, precision)
+        unclipped = features * np.float32(scale)
+        scaled = clip_to_storage(unclipped, precision)
+        stored = quantize(scaled, precision)
+        quantized_ids, _ = build_exact_index(stored).query(stored[query_rows], k=k)
+        result = {
+            'space': model_name,
+            'precision': precision,
+            'num_items': len(features),
+            'num_dimensions': features.shape[1],
+            'storage_scale': scale,
+            'clipped_share': float(np.mean(scaled != unclipped)),
+            'vector_bytes': len(features) * features.shape[1] * STORAGE_BYTES[precision],
+            'quantized_exact_recall': recall_at_k(quantized_ids, exact_ids, k),
+        }
+        if use_voyager:
+            result.update(run_isolated(measure_voyager, scaled, precision, scaled[query_rows], exact_ids, k,
+                                       query_ef))
+        results.append(result)
+    return results
+
+
+def main(args):
+    if args.csv:
+        feature_sets = load_feature_spaces(args.csv, args.feature_store, args.num_items, args.spaces, args.seed)
+    else:
+        feature_sets = synthetic_feature_spaces(args.num_items or 20000, args.deep_dimensions, args.spaces, args.seed)
+
+    use_voyager = not args.no_voyager
+    if use_voyager:
+        try:
+            _import_voyager()
+        except ImportError as e:
+            print(f"{e}; reporting exact search over quantized vectors only")
+            use_voyager = False
+
+    results = []
+    for model_name, features in feature_sets.items():
+        results.extend(benchmark_space(model_name, features, args.precisions, args.k, args.num_queries,
+                                       args.query_ef, use_voyager, args.seed))
+
+    print(f"\nStorage precision vs. exact float32 neighbours (recall@{args.k})")
+    header = f"{'space':<18} {'precision':<9} {'scale':>9} {'vectors MiB':>12} {'exact recall':>13}"
+    if use_voyager:
+        header += f" {'file MiB':>9} {'RSS MiB':>8} {'p50 ms':>7} {'p99 ms':>7} {'recall':>7}"
+    print(header)
+    for result in results:
+        line = (f"{result['space']:<18} {result['precision']:<9} {result['storage_scale']:9.3g} "
+                f"{result['vector_bytes'] / 2**20:12.1f} {result['quantized_exact_recall']:13.4f}")
+        if 'voyager_recall' in result:
+            resident = result['resident_bytes'] / 2**20 if result['resident_bytes'] is not None else float('nan')
+            line += (f" {result['file_bytes'] / 2**20:9.1f} {resident:8.1f} {result['p50_ms']:7.3f} "
+                     f"{result['p99_ms']:7.3f} {result['voyager_recall']:7.4f}")
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'k': args.k, 'query_ef': args.query_ef, 'results': results}, f, indent=4)
+        print(f"Report saved to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report memory, latency and recall of every Voyager storage '
+                                                 'precision on the feature spaces')
+    parser.add_argument('--csv', default=None, help='CSV with the audio and basic image features '
+                                                    '(default: synthetic data with the same dimensions)')
+    parser.add_argument('--feature-store', default=None, help='Feature store with the deep features of the CSV rows')
+    parser.add_argument('--num-items', type=int, default=None, help='Number of tracks to sample '
+                                                                    '(default: all, or 20000 synthetic)')
+    parser.add_argument('--deep-dimensions', type=int, default=SYNTHETIC_DEEP_DIMENSIONS,
+                        help=f'Dimensions of the synthetic deep block (default: {SYNTHETIC_DEEP_DIMENSIONS})')
+    parser.add_argument('--spaces', nargs='+', default=None, choices=list(MODEL_INDEX_FILES),
+                        help='Spaces to compare (default: all available)')
+    parser.add_argument('--precisions', nargs='+', default=list(STORAGE_DATA_TYPES), choices=list(STORAGE_DATA_TYPES),
+                        help='Storage precisions to compare (default: all)')
+    parser.add_argument('-k', type=int, default=10, help='Neighbours per query (default: 10)')
+    parser.add_argument('--num-queries', type=int, default=1000, help='Number of queries (default: 1000)')
+    parser.add_argument('--query-ef', type=int, default=100, help='Voyager query ef (default: 100)')
+    parser.add_argument('--no-voyager', action='store_true', help='Only evaluate exact search over quantized vectors')
+    parser.add_argument('--output', default=None, help='JSON file the report is written to')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    main(parser.parse_args())
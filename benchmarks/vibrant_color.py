@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+import argparse
+import cv2
+
+# Add the project root to the Python path so the module also runs as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from addBasicImagefeatures import find_most_vibrant_color
+from benchmarks._reference import legacy_find_most_vibrant_color
+
+
+def images_per_second(function, images, min_seconds=1.0):
+    """Runs function over the images until min_seconds have passed and returns the throughput."""
+    count = 0
+    start_time = time.perf_counter()
+    while True:
+        for image in images:
+            function(image)
+        count += len(images)
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= min_seconds:
+            return count / elapsed
+
+
+def main(image_path, size, num_images):
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f"Could not load image: {image_path}")
+    images = [cv2.resize(image, (size, size))] * num_images
+
+    legacy = images_per_second(legacy_find_most_vibrant_color, images)
+    vectorized = images_per_second(find_most_vibrant_color, images)
+
+    print(f"find_most_vibrant_color on {size}x{size} images ({image_path})")
+    print(f"{'per-pixel loop':<16} {legacy:10.2f} images/sec")
+    print(f"{'vectorized':<16} {vectorized:10.2f} images/sec")
+    print(f"{'speed-up':<16} {vectorized / legacy:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark find_most_vibrant_color before and after vectorization')
+    parser.add_argument('--image', default=os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'album_cover.jpg')),
+                        help='Cover image to benchmark on (default: album_cover.jpg)')
+    parser.add_argument('--size', type=int, default=640, help='Side length the image is resized to (default: 640)')
+    parser.add_argument('--num-images', type=int, default=3, help='Images per timing round (default: 3)')
+
+    args = parser.parse_args()
+    main(args.image, args.size, args.num_images)
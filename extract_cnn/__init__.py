@@ -1 +1,8 @@
-from .extract_cnn import *
\ No newline at end of file
+def __getattr__(name):
+    # The extraction module imports torch; loading it on first use keeps torch-free submodules
+    # such as extract_cnn.checkpoint importable without it
+    from . import extract_cnn
+    try:
+        return getattr(extract_cnn, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -0,0 +1,166 @@
+import os
+import json
+import numpy as np
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+
+def _fsync_directory(directory):
+    """Flushes a directory entry so newly created files survive a crash (no-op where unsupported)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class CheckpointLog:
+    """
+    Append-only checkpoint log for feature extraction.
+
+    Every batch is written as its own .npz shard and then recorded as one line
+    in a JSON-lines manifest, both fsynced, so a checkpoint only costs the size
+    of the new batch. A shard holds the indices that succeeded with their
+    features and the indices that failed. Replaying the manifest restores the
+    exact set of processed indices; later records win, so a retried index that
+    succeeds is no longer reported as failed.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory holding the shards and the manifest.
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        os.makedirs(directory, exist_ok=True)
+        self._truncate_torn_record()
+        # Shard numbers keep increasing across compactions so names are never reused
+        self._next_shard = 1 + max(
+            (int(os.path.splitext(record['shard'])[0].rsplit('_', 1)[1]) for record in self._read_manifest()),
+            default=-1)
+
+    def _truncate_torn_record(self):
+        """Drops a partially written last manifest line so new records are appended after valid ones."""
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'rb') as f:
+            content = f.read()
+        valid_length = content.rfind(b'\n') + 1
+        if valid_length < len(content):
+            with open(self.manifest_path, 'r+b') as f:
+                f.truncate(valid_length)
+                os.fsync(f.fileno())
+
+    def exists(self):
+        """True if at least one batch has been recorded."""
+        return len(self._read_manifest()) > 0
+
+    def _read_manifest(self):
+        """Returns the manifest records, ignoring a torn last line from an interrupted write."""
+        if not os.path.exists(self.manifest_path):
+            return []
+        records = []
+        with open(self.manifest_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return records
+
+    def _write_shard(self, shard_name, results):
+        """Writes one batch of (index, features) results to a shard and fsyncs it."""
+        succeeded = [(index, np.ravel(features)) for index, features in results if len(features) > 0]
+        failed = [index for index, features in results if len(features) == 0]
+
+        lengths = [len(features) for _, features in succeeded]
+        arrays = {
+            'indices': np.array([index for index, _ in succeeded], dtype=np.int64),
+            'offsets': np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            'values': np.concatenate([features for _, features in succeeded]) if succeeded else np.empty(0),
+            'failed': np.array(failed, dtype=np.int64),
+        }
+
+        shard_path = os.path.join(self.directory, shard_name)
+        with open(shard_path, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        return {'shard': shard_name, 'succeeded': len(succeeded), 'failed': len(failed)}
+
+    def append(self, results):
+        """
+        Records a batch of extraction results.
+
+        Args:
+            results (list): (index, features) tuples; empty features mark a failed index.
+
+        Returns:
+            dict: The manifest record of the batch.
+        """
+        record = self._write_shard(f"shard_{self._next_shard:06d}.npz", results)
+        _fsync_directory(self.directory)
+
+        # The shard is durable before the manifest references it
+        with open(self.manifest_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._next_shard += 1
+        return record
+
+    def replay(self):
+        """
+        Restores progress from the log.
+
+        Returns:
+            tuple: (features_dict {index: features}, set of failed indices)
+        """
+        features_dict = {}
+        failed = set()
+        for record in self._read_manifest():
+            with np.load(os.path.join(self.directory, record['shard'])) as shard:
+                indices, offsets, values = shard['indices'], shard['offsets'], shard['values']
+                for position, index in enumerate(indices.tolist()):
+                    features_dict[index] = values[offsets[position]:offsets[position + 1]]
+                    failed.discard(index)
+                for index in shard['failed'].tolist():
+                    if index not in features_dict:
+                        failed.add(index)
+        return features_dict, failed
+
+    def compact(self):
+        """
+        Merges all shards into a single shard and rewrites the manifest to one record.
+
+        Returns:
+            dict: The manifest record of the compacted shard, or None if the log is empty.
+        """
+        records = self._read_manifest()
+        if not records:
+            return None
+
+        features_dict, failed = self.replay()
+        results = sorted(features_dict.items()) + [(index, np.array([])) for index in sorted(failed)]
+        record = self._write_shard(f"compacted_{self._next_shard:06d}.npz", results)
+        _fsync_directory(self.directory)
+
+        # Swap in the compacted manifest atomically, then drop the merged shards
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        _fsync_directory(self.directory)
+
+        for old_record in records:
+            os.remove(os.path.join(self.directory, old_record['shard']))
+        self._next_shard += 1
+        return record
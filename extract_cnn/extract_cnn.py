@@ -9,79 +9,208 @@ import os
 import pickle
 from skimage.feature import local_binary_pattern
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import time
 import warnings
+import sys
+
+# Add the project root to the Python path so the module also runs as a script
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from recommender.feature_store import default_store_path, save_features_dict
+from extract_cnn.checkpoint import CheckpointLog
+from image_context import ImageContext
 warnings.filterwarnings("ignore", category=UserWarning)
 
 # Global variables for models to avoid reloading in each process
 MODELS = {}
 
-def extract_deep_features(image_path, model_name='efficientnet_v2'):
+# Start time and model load time of a pool worker, reported with its first result
+WORKER_STATS = {}
+
+# Pipeline stages reported by process_images_with_features
+TIMING_STAGES = ['spawn', 'model_load', 'decode', 'forward', 'traditional', 'write']
+
+# Image transformations shared by every model, built once per process
+PREPROCESS = transforms.Compose([
+    transforms.Resize(256),
+    transforms.CenterCrop(224),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+])
+
+# Model constructors and the size of their feature vectors
+MODEL_MAP = {
+    'efficientnet_v2': (models.efficientnet_v2_s, 1280),
+    'mobilenet_v3': (models.mobilenet_v3_large, 1280),
+    'resnet50': (models.resnet50, 2048),
+    'convnext': (models.convnext_tiny, 768)
+}
+
+
+def load_model(model_name='efficientnet_v2'):
+    """
+    Load a pre-trained CNN without its classification layer, once per process.
+    
+    Parameters:
+        model_name (str): Model to use ('efficientnet_v2', 'mobilenet_v3', 'resnet50', 'convnext').
+        
+    Returns:
+        tuple: (model in eval mode, feature vector size)
+    """
+    if model_name not in MODEL_MAP:
+        raise ValueError(f"Invalid model_name '{model_name}'. Choose from {list(MODEL_MAP.keys())}")
+    
+    model_func, feature_size = MODEL_MAP[model_name]
+    if model_name not in MODELS:
+        model = model_func(pretrained=True)
+        
+        # Remove the classification layer to get features
+        if model_name == 'resnet50':
+            model.fc = torch.nn.Identity()
+        else:
+            model.classifier = torch.nn.Identity()
+        
+        model.eval()
+        MODELS[model_name] = model
+    
+    return MODELS[model_name], feature_size
+
+
+def extract_deep_features(image_path, model_name='efficientnet_v2', timings=None):
     """
     Extract deep features using a pre-trained CNN model with PyTorch.
     
     Parameters:
-        image_path (str): Path to the image.
+        image_path (str): Path to the image, or an ImageContext of the already decoded image.
         model_name (str): Model to use ('efficientnet_v2', 'mobilenet_v3', 'resnet50', 'convnext').
+        timings (dict): If given, 'decode' and 'forward' seconds are added to it.
         
     Returns:
         np.ndarray: Flattened feature vector.
     """
-    # Define image transformations
-    preprocess = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-    ])
+    timings = {} if timings is None else timings
     
     # Load and preprocess image
+    start_time = time.perf_counter()
     try:
-        img = Image.open(image_path).convert('RGB')
-        img_tensor = preprocess(img)
+        if isinstance(image_path, ImageContext):
+            img = Image.fromarray(image_path.rgb)
+        else:
+            img = Image.open(image_path).convert('RGB')
+        img_tensor = PREPROCESS(img)
         img_tensor = img_tensor.unsqueeze(0)  # Add batch dimension
     except Exception as e:
         raise ValueError(f"Error loading image {image_path}: {e}")
+    timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - start_time
     
-    # Select model
-    model_map = {
-        'efficientnet_v2': (models.efficientnet_v2_s, 1280),
-        'mobilenet_v3': (models.mobilenet_v3_large, 1280),
-        'resnet50': (models.resnet50, 2048),
-        'convnext': (models.convnext_tiny, 768)
-    }
+    model, feature_size = load_model(model_name)
     
-    if model_name not in model_map:
-        raise ValueError(f"Invalid model_name '{model_name}'. Choose from {list(model_map.keys())}")
+    # Extract features
+    start_time = time.perf_counter()
+    with torch.inference_mode():
+        features = model(img_tensor)
+    features = features.cpu().numpy().flatten()
+    timings['forward'] = timings.get('forward', 0.0) + time.perf_counter() - start_time
     
-    # Get or create model
-    global MODELS
-    if model_name not in MODELS:
-        model_func, feature_size = model_map[model_name]
-        model = model_func(pretrained=True)
+    return features, feature_size
+
+
+class ImageDataset(torch.utils.data.Dataset):
+    """
+    Decodes and preprocesses images for batched inference.
+    
+    Images that cannot be loaded yield a zero tensor with `ok` set to False, so
+    one bad file does not break its batch. With `with_traditional` the
+    traditional features are computed in the loader workers as well, from the
+    same decoded image.
+    """
+    
+    def __init__(self, image_paths, indices, with_traditional=False):
+        self.image_paths = list(image_paths)
+        self.indices = list(indices)
+        self.with_traditional = with_traditional
+    
+    def __len__(self):
+        return len(self.image_paths)
+    
+    def __getitem__(self, position):
+        image_path, index = self.image_paths[position], self.indices[position]
+        try:
+            if self.with_traditional:
+                image = ImageContext.from_path(image_path)
+                img_tensor = PREPROCESS(Image.fromarray(image.rgb))
+            else:
+                img_tensor = PREPROCESS(Image.open(image_path).convert('RGB'))
+            ok = True
+        except Exception as e:
+            print(f"Error loading image {image_path}: {e}")
+            img_tensor = torch.zeros(3, 224, 224)
+            ok = False
         
-        # Remove the classification layer to get features
-        if model_name == 'efficientnet_v2':
-            model.classifier = torch.nn.Identity()
-        elif model_name == 'mobilenet_v3':
-            model.classifier = torch.nn.Identity()
-        elif model_name == 'resnet50':
-            model.fc = torch.nn.Identity()
-        elif model_name == 'convnext':
-            model.classifier = torch.nn.Identity()
+        trad_features = np.array([])
+        if ok and self.with_traditional:
+            trad_features = extract_traditional_features(image)
+        return index, img_tensor, ok, trad_features
+
+
+def _collate_images(items):
+    """Stacks dataset items into (indices, image batch, ok mask, traditional features)."""
+    indices, tensors, ok, trad_features = zip(*items)
+    return list(indices), torch.stack(tensors), torch.tensor(ok), list(trad_features)
+
+
+def extract_deep_features_batch(image_paths, indices, model_name='efficientnet_v2', batch_size=64,
+                                num_workers=0, method='deep', timings=None):
+    """
+    Extract deep features in fixed-size batches with a single shared model.
+    
+    A DataLoader decodes and preprocesses the images on `num_workers` processes
+    while the model runs on whole batches in the main process.
+    
+    Parameters:
+        image_paths (list): Paths to the images.
+        indices (list): Row index of each image.
+        model_name (str): Model to use ('efficientnet_v2', 'mobilenet_v3', 'resnet50', 'convnext').
+        batch_size (int): Number of images per forward pass.
+        num_workers (int): Number of decode/preprocess worker processes (0 decodes in this process).
+        method (str): 'deep', or 'both' to append the traditional features.
+        timings (dict): If given, 'model_load', 'decode' (time spent waiting for the loader)
+            and 'forward' seconds are added to it.
         
-        model.eval()
-        MODELS[model_name] = model
-    else:
-        model = MODELS[model_name]
-        _, feature_size = model_map[model_name]
+    Yields:
+        list: (index, features) tuples for one batch; empty features mark a failed image.
+    """
+    timings = {} if timings is None else timings
     
-    # Extract features
-    with torch.no_grad():
-        features = model(img_tensor)
+    start_time = time.perf_counter()
+    model, _ = load_model(model_name)
+    timings['model_load'] = timings.get('model_load', 0.0) + time.perf_counter() - start_time
+    
+    dataset = ImageDataset(image_paths, indices, with_traditional=(method == 'both'))
+    loader = torch.utils.data.DataLoader(dataset, batch_size=batch_size, num_workers=num_workers,
+                                         collate_fn=_collate_images)
     
-    return features.cpu().numpy().flatten(), feature_size
+    with torch.inference_mode():
+        start_time = time.perf_counter()
+        for batch_indices, img_tensors, ok, trad_features in loader:
+            timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - start_time
+            
+            start_time = time.perf_counter()
+            # Flatten like the single-image path: e.g. convnext without its classifier returns (n, 768, 1, 1)
+            deep_features = iter(model(img_tensors[ok]).reshape(int(ok.sum()), -1).cpu().numpy() if ok.any() else [])
+            timings['forward'] = timings.get('forward', 0.0) + time.perf_counter() - start_time
+            
+            results = []
+            for index, loaded, trad in zip(batch_indices, ok.tolist(), trad_features):
+                if not loaded:
+                    results.append((index, np.array([])))
+                elif len(trad) > 0:
+                    results.append((index, np.concatenate([next(deep_features), trad])))
+                else:
+                    results.append((index, next(deep_features)))
+            yield results
+            start_time = time.perf_counter()
 
 
 def extract_traditional_features(image_path):
@@ -89,23 +218,25 @@ def extract_traditional_features(image_path):
     Extract traditional computer vision features without deep learning.
     
     Parameters:
-        image_path (str): Path to the image.
+        image_path (str): Path to the image, or an ImageContext of the already decoded image.
         
     Returns:
         np.ndarray: Feature vector.
     """
     try:
         # Load image
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Could not load image: {image_path}")
+        if isinstance(image_path, ImageContext):
+            image = image_path
+        else:
+            image = ImageContext.from_path(image_path)
         
         # Resize for consistency
-        img = cv2.resize(img, (224, 224))
+        image = image.resized((224, 224))
+        img = image.bgr
         
         # Convert to different color spaces
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+        gray = image.gray
+        hsv = image.hsv
         
         features = []
         
@@ -148,16 +279,26 @@ def extract_traditional_features(image_path):
         return np.array([])
 
 
-def extract_features(args):
+def _timed_traditional_features(image_path, timings):
+    """Runs extract_traditional_features and adds its duration to timings['traditional']."""
+    start_time = time.perf_counter()
+    features = extract_traditional_features(image_path)
+    timings['traditional'] = timings.get('traditional', 0.0) + time.perf_counter() - start_time
+    return features
+
+
+def extract_features(args, timings=None):
     """
     Extract features using specified method.
     
     Parameters:
         args (tuple): (image_path, index, method, model_name)
+        timings (dict): If given, seconds per stage ('decode', 'forward', 'traditional') are added to it.
         
     Returns:
         tuple: (index, features)
     """
+    timings = {} if timings is None else timings
     image_path, index, method, model_name = args
     
     if not os.path.exists(image_path):
@@ -166,13 +307,17 @@ def extract_features(args):
     
     try:
         if method == 'deep':
-            features, _ = extract_deep_features(image_path, model_name)
+            features, _ = extract_deep_features(image_path, model_name, timings)
             return index, features
         elif method == 'traditional':
-            return index, extract_traditional_features(image_path)
+            return index, _timed_traditional_features(image_path, timings)
         elif method == 'both':
-            deep_features, _ = extract_deep_features(image_path, model_name)
-            trad_features = extract_traditional_features(image_path)
+            # Decode the file once and share it between both extractors
+            start_time = time.perf_counter()
+            image = ImageContext.from_path(image_path)
+            timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - start_time
+            deep_features, _ = extract_deep_features(image, model_name, timings)
+            trad_features = _timed_traditional_features(image, timings)
             if len(trad_features) > 0:
                 return index, np.concatenate([deep_features, trad_features])
             else:
@@ -184,11 +329,68 @@ def extract_features(args):
         return index, np.array([])
 
 
+def _init_worker(method, model_name, num_threads):
+    """
+    Pool initializer: loads the model once per worker process.
+    
+    Parameters:
+        method (str): 'deep', 'traditional', or 'both'.
+        model_name (str): Deep learning model to load.
+        num_threads (int): Torch threads per worker, so the workers share the cores.
+    """
+    WORKER_STATS['started'] = time.time()
+    torch.set_num_threads(num_threads)
+    
+    start_time = time.perf_counter()
+    if method != 'traditional':
+        load_model(model_name)
+    WORKER_STATS['model_load'] = time.perf_counter() - start_time
+
+
+def _extract_features_timed(args):
+    """
+    Pool task: extract_features plus the per-stage timings of this image.
+    
+    The first task of every worker also reports the worker's start time and model load time.
+    
+    Returns:
+        tuple: (index, features, timings)
+    """
+    timings = {}
+    if WORKER_STATS:
+        timings.update(WORKER_STATS)
+        WORKER_STATS.clear()
+    index, features = extract_features(args, timings)
+    return index, features, timings
+
+
+def _print_stage_timings(stage_seconds, wall_seconds, num_images):
+    """Prints the time spent per pipeline stage and the overall throughput."""
+    print("\n===== EXTRACTION TIMINGS =====")
+    for stage in TIMING_STAGES:
+        print(f"{stage:<12} {stage_seconds.get(stage, 0.0):10.2f}s")
+    rate = num_images / wall_seconds if wall_seconds > 0 else 0.0
+    print(f"{'wall':<12} {wall_seconds:10.2f}s  ({num_images} images, {rate:.1f} images/sec)")
+    print("(decode, forward, traditional and model_load are summed over workers; "
+          "spawn is the latest worker start after the pool was created)")
+    print("==============================\n")
+
+
 def process_images_with_features(csv_path, method='both', model_name='efficientnet_v2', 
                                 output_csv_path=None, features_pickle_path=None,
-                                checkpoint_interval=40, num_workers=None):
+                                checkpoint_interval=40, num_workers=None, features_store_path=None,
+                                checkpoint_dir=None, batch_size=None):
     """
-    Process images to extract features, save a CSV with metadata and a pickle file with features.
+    Process images to extract features, save a CSV with metadata, a pickle file with features
+    and a memory-mappable feature store (see recommender.feature_store).
+
+    Progress is checkpointed to an append-only log (see extract_cnn.checkpoint) with one
+    shard per batch. The CSV, pickle and feature store are written once at the end, after
+    the log is compacted. Resuming replays the log and processes every index without
+    features, including gaps and indices that failed before.
+
+    Images are processed by one long-lived worker pool whose workers load the model once,
+    and the time spent per stage (spawn, model load, decode, forward, write) is printed at the end.
 
     Args:
         csv_path (str): Path to the CSV file with image paths.
@@ -198,10 +400,17 @@ def process_images_with_features(csv_path, method='both', model_name='efficientn
         features_pickle_path (str): Path for the pickle file with features. If None, will generate one.
         checkpoint_interval (int): Save progress every N songs.
         num_workers (int): Number of parallel workers. If None, uses CPU count - 1.
+        features_store_path (str): Directory for the feature store. If None, will generate one.
+        checkpoint_dir (str): Directory for the checkpoint log. If None, will generate one.
+        batch_size (int): If set, deep features are extracted in batches of this size by a single
+            shared model, with num_workers decoding images (see extract_deep_features_batch).
 
     Returns:
         tuple: (DataFrame with metadata, Dictionary with features)
     """
+    if method != 'traditional' and model_name not in MODEL_MAP:
+        raise ValueError(f"Invalid model_name '{model_name}'. Choose from {list(MODEL_MAP.keys())}")
+    
     # Set number of workers
     if num_workers is None:
         num_workers = max(1, multiprocessing.cpu_count() - 1)
@@ -217,6 +426,13 @@ def process_images_with_features(csv_path, method='both', model_name='efficientn
         base, _ = os.path.splitext(csv_path)
         features_pickle_path = f"{base}_{method}_{model_name}_features.pkl"
     
+    if features_store_path is None:
+        features_store_path = default_store_path(features_pickle_path)
+    
+    if checkpoint_dir is None:
+        base, _ = os.path.splitext(features_pickle_path)
+        checkpoint_dir = f"{base}.checkpoints"
+    
     # Load the original CSV
     df = pd.read_csv(csv_path, low_memory=False)
     
@@ -227,25 +443,21 @@ def process_images_with_features(csv_path, method='both', model_name='efficientn
     # Create a copy for output
     result_df = df.copy()
     
-    # Initialize or load features dictionary
-    features_dict = {}
-    start_index = 0
-    
-    # Check if pickle file exists to resume processing
-    if os.path.exists(features_pickle_path):
+    # Restore progress from the checkpoint log
+    checkpoint_log = CheckpointLog(checkpoint_dir)
+    if not checkpoint_log.exists() and os.path.exists(features_pickle_path):
+        # Seed the log from a pickle written before checkpoint logs existed
         try:
             with open(features_pickle_path, 'rb') as f:
-                features_dict = pickle.load(f)
-            
-            # Determine how many images have been processed
-            processed_indices = list(features_dict.keys())
-            if processed_indices:
-                start_index = max(processed_indices) + 1
-                print(f"Resuming from index {start_index} ({len(processed_indices)} images already processed)")
+                checkpoint_log.append(list(pickle.load(f).items()))
         except Exception as e:
             print(f"Error loading existing features file: {e}")
             print("Starting from scratch")
-            features_dict = {}
+    
+    features_dict, failed_indices = checkpoint_log.replay()
+    if features_dict or failed_indices:
+        print(f"Resuming from checkpoint log ({len(features_dict)} images already processed, "
+              f"{len(failed_indices)} failed images will be retried)")
     
     # Add a column to indicate feature extraction status
     feature_status_col = f"{method}_{model_name}_extracted"
@@ -257,64 +469,113 @@ def process_images_with_features(csv_path, method='both', model_name='efficientn
         if idx < len(result_df):
             result_df.at[idx, feature_status_col] = True
     
-    # Get the list of images to process
-    images_to_process = df['image_path'].iloc[start_index:].tolist()
-    indices_to_process = list(range(start_index, len(df)))
+    # Get the list of images to process: every index without features, wherever it is
+    indices_to_process = [idx for idx in range(len(df)) if idx not in features_dict]
+    images_to_process = df['image_path'].iloc[indices_to_process].tolist()
     
-    # Prepare arguments for parallel processing
-    process_args = [(img, idx, method, model_name) 
-                   for img, idx in zip(images_to_process, indices_to_process)]
+    stage_seconds = {stage: 0.0 for stage in TIMING_STAGES}
+    run_start_time = time.perf_counter()
     
-    # Process in batches for checkpointing
-    batch_size = min(checkpoint_interval, len(process_args))
-    num_batches = (len(process_args) + batch_size - 1) // batch_size
+    def record_batch(batch_results):
+        """Updates the features and the dataframe, then checkpoints only this batch."""
+        start_time = time.perf_counter()
+        for idx, features in batch_results:
+            if len(features) > 0:
+                features_dict[idx] = features
+                result_df.at[idx, feature_status_col] = True
+        record = checkpoint_log.append(batch_results)
+        stage_seconds['write'] += time.perf_counter() - start_time
+        tqdm.write(f"Checkpoint saved: {record['succeeded']} features, {record['failed']} failures")
     
-    # Process images with parallel execution and checkpointing
-    with tqdm(total=num_batches, desc="Processing Batches") as batch_pbar:
-        for batch_idx in range(num_batches):
-            batch_start = batch_idx * batch_size
-            batch_end = min((batch_idx + 1) * batch_size, len(process_args))
-            batch_args = process_args[batch_start:batch_end]
-            
-            batch_pbar.set_description(f"Processing batch {batch_idx+1}/{num_batches} (indices {start_index + batch_start} to {start_index + batch_end - 1})")
-            
-            # Process batch in parallel
-            batch_results = []
-            with ProcessPoolExecutor(max_workers=num_workers) as executor:
-                futures = {executor.submit(extract_features, arg): arg for arg in batch_args}
-                
-                # Show progress bar
-                with tqdm(total=len(batch_args), desc=f"Extracting {method} features") as pbar:
-                    for future in as_completed(futures):
-                        pbar.update(1)
-                        try:
-                            batch_results.append(future.result())
-                        except Exception as e:
-                            print(f"Error in worker: {e}")
-            
-            # Update features dictionary and dataframe
-            for idx, features in batch_results:
-                if len(features) > 0:
-                    features_dict[idx] = features
-                    result_df.at[idx, feature_status_col] = True
+    batched = bool(batch_size) and method != 'traditional'
+    if batched and indices_to_process:
+        # Batched inference with one shared model; checkpoint every checkpoint_interval images
+        pending_results = []
+        with tqdm(total=len(indices_to_process), desc=f"Extracting {method} features") as pbar:
+            for batch_results in extract_deep_features_batch(images_to_process, indices_to_process,
+                                                             model_name=model_name, batch_size=batch_size,
+                                                             num_workers=num_workers, method=method,
+                                                             timings=stage_seconds):
+                pending_results.extend(batch_results)
+                pbar.update(len(batch_results))
+                if len(pending_results) >= checkpoint_interval:
+                    record_batch(pending_results)
+                    pending_results = []
+        if pending_results:
+            record_batch(pending_results)
+    
+    # Prepare arguments for parallel processing; the batched path has already handled every image
+    process_args = [] if batched else [(img, idx, method, model_name)
+                                       for img, idx in zip(images_to_process, indices_to_process)]
+    
+    if process_args:
+        # One long-lived pool for the whole run; each worker loads the model once in its initializer.
+        # A bounded number of images is in flight and results are checkpointed as they complete.
+        max_in_flight = num_workers * 4
+        pending_args = iter(process_args)
+        pending_results = []
+        pool_start_time = time.time()
+        try:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                     initargs=(method, model_name,
+                                               max(1, multiprocessing.cpu_count() // num_workers))) as executor:
+                futures = {}
             
-            # Save checkpoint after each batch
-            result_df.to_csv(output_csv_path, index=False)
-            with open(features_pickle_path, 'wb') as f:
-                pickle.dump(features_dict, f)
+                def submit_next():
+                    arg = next(pending_args, None)
+                    if arg is not None:
+                        futures[executor.submit(_extract_features_timed, arg)] = arg
             
-            print(f"Checkpoint saved at index {start_index + batch_end - 1}")
-            print(f"Features saved to {features_pickle_path}")
-            print(f"Metadata saved to {output_csv_path}")
+                for _ in range(max_in_flight):
+                    submit_next()
             
-            # Small delay to allow system resources to stabilize
-            time.sleep(1)
-            batch_pbar.update(1)
+                with tqdm(total=len(process_args), desc=f"Extracting {method} features") as pbar:
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            arg = futures.pop(future)
+                            try:
+                                idx, features, timings = future.result()
+                            except Exception as e:
+                                print(f"Error in worker: {e}")
+                                idx, features, timings = arg[1], np.array([]), {}
+                            submit_next()
+                            pbar.update(1)
+                        
+                            if 'started' in timings:
+                                stage_seconds['spawn'] = max(stage_seconds['spawn'],
+                                                             timings.pop('started') - pool_start_time)
+                            for stage, seconds in timings.items():
+                                stage_seconds[stage] += seconds
+                        
+                            pending_results.append((idx, features))
+                            if len(pending_results) >= checkpoint_interval:
+                                record_batch(pending_results)
+                                pending_results = []
+        finally:
+            # Results that completed before an interruption are not lost
+            if pending_results:
+                record_batch(pending_results)
+    
+    # Compact the log and write the final outputs once
+    start_time = time.perf_counter()
+    checkpoint_log.compact()
+    result_df.to_csv(output_csv_path, index=False)
+    with open(features_pickle_path, 'wb') as f:
+        pickle.dump(features_dict, f)
+    
+    # Save the dense, memory-mappable copy of the features
+    if features_dict:
+        save_features_dict(features_dict, features_store_path,
+                           metadata={'method': method, 'model_name': model_name})
+    stage_seconds['write'] += time.perf_counter() - start_time
     
     print(f"Processing complete. Extracted {method} features using {model_name if method != 'traditional' else 'N/A'}")
     print(f"Total features extracted: {len(features_dict)}")
     print(f"Features saved to: {features_pickle_path}")
+    print(f"Feature store saved to: {features_store_path}")
     print(f"Metadata saved to: {output_csv_path}")
+    _print_stage_timings(stage_seconds, time.perf_counter() - run_start_time, len(indices_to_process))
 
     return result_df, features_dict
 
@@ -326,14 +587,19 @@ if __name__ == "__main__":
     parser.add_argument('--csv', required=True, help='Path to input CSV with image_path column')
     parser.add_argument('--output-csv', help='Path to output CSV with metadata (default: auto-generated)')
     parser.add_argument('--output-pickle', help='Path to output pickle file with features (default: auto-generated)')
+    parser.add_argument('--output-store', help='Path to output feature store directory (default: auto-generated)')
     parser.add_argument('--method', choices=['deep', 'traditional', 'both'], default='both',
                         help='Feature extraction method (default: both)')
     parser.add_argument('--model', choices=['efficientnet_v2', 'mobilenet_v3', 'resnet50', 'convnext'], 
                         default='efficientnet_v2', help='Deep learning model to use (default: efficientnet_v2)')
     parser.add_argument('--checkpoint', type=int, default=40,
                         help='Save checkpoint every N songs (default: 40)')
+    parser.add_argument('--checkpoint-dir', help='Directory for the checkpoint log (default: auto-generated)')
     parser.add_argument('--workers', type=int, default=None,
                         help='Number of parallel workers (default: CPU count - 1)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Run deep features in batches of N images (e.g. 32-128) on one shared model, '
+                             'with the workers decoding images (default: one image per worker)')
     
     args = parser.parse_args()
     
@@ -349,7 +615,10 @@ if __name__ == "__main__":
             output_csv_path=args.output_csv,
             features_pickle_path=args.output_pickle,
             checkpoint_interval=args.checkpoint,
-            num_workers=args.workers
+            num_workers=args.workers,
+            features_store_path=args.output_store,
+            checkpoint_dir=args.checkpoint_dir,
+            batch_size=args.batch_size
         )
         
         print(f"Processing complete. Added {args.method} features using {args.model if args.method != 'traditional' else 'N/A'}")
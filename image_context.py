@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+from typing import Dict, Tuple, Union
+
+
+class ImageContext:
+    """
+    A decoded image with lazily cached derived representations.
+
+    The file is decoded once and every color conversion (RGB, HSV, gray) or
+    resize is computed the first time it is requested and reused afterwards,
+    so feature functions sharing a context never convert the same image twice.
+    `conversions` counts how often each representation was computed.
+    """
+
+    def __init__(self, bgr: np.ndarray):
+        """
+        Args:
+            bgr: The image as decoded by OpenCV (H, W, 3) in BGR order.
+        """
+        self.bgr = bgr
+        self.conversions: Dict[str, int] = {}
+        self._cache = {}
+
+    @classmethod
+    def from_path(cls, image_path: str) -> "ImageContext":
+        """
+        Decodes an image file.
+
+        Args:
+            image_path: The path to the image file.
+
+        Returns:
+            The image context.
+        """
+        bgr = cv2.imread(image_path)
+        if bgr is None:
+            raise ValueError(f"Could not load image: {image_path}")
+        return cls(bgr)
+
+    def _cached(self, key, compute):
+        """Returns the cached value for key, computing it on first use."""
+        if key not in self._cache:
+            self._cache[key] = compute()
+            name = key if isinstance(key, str) else key[0]
+            self.conversions[name] = self.conversions.get(name, 0) + 1
+        return self._cache[key]
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self._cached("rgb", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB))
+
+    @property
+    def hsv(self) -> np.ndarray:
+        return self._cached("hsv", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2HSV))
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self._cached("gray", lambda: cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY))
+
+    def resized(self, size: Tuple[int, int], interpolation: int = cv2.INTER_LINEAR) -> "ImageContext":
+        """
+        Returns a context for a resized copy of the image, with its own cached conversions.
+
+        Args:
+            size: Target (width, height), as for cv2.resize.
+            interpolation: OpenCV interpolation flag.
+
+        Returns:
+            The context of the resized image.
+        """
+        return self._cached(("resized", tuple(size), interpolation),
+                            lambda: ImageContext(cv2.resize(self.bgr, tuple(size), interpolation=interpolation)))
+
+
+def as_context(image: Union[np.ndarray, ImageContext]) -> ImageContext:
+    """Wraps a BGR array in an ImageContext; contexts are returned unchanged."""
+    if isinstance(image, ImageContext):
+        return image
+    return ImageContext(image)
@@ -222,29 +222,18 @@ def find_most_vibrant_color(image: np.ndarray, brightness_threshold: float = 0.5
     # Convert the image to HSV color space
     hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
 
-    # Get the height and width of the image
-    height, width = hsv_image.shape[:2]
-
-    # Create a list to store the vibrant colors
-    vibrant_colors = []
-
-    # Iterate over the pixels in the image
-    for y in range(height):
-        for x in range(width):
-            # Get the HSV values for the pixel
-            hue, saturation, value = hsv_image[y, x]
-
-            # Check if the pixel meets the brightness threshold
-            if value / 255.0 > brightness_threshold:
-                # Add the pixel to the list of vibrant colors
-                vibrant_colors.append((hue, saturation, value))
+    # Only pixels above the brightness threshold are considered
+    bright = hsv_image[..., 2] / 255.0 > brightness_threshold
 
     # Check if there are any vibrant colors
-    if not vibrant_colors:
+    if not bright.any():
         return (0, 0, 0)  # Return black if there are no vibrant colors
 
-    # Find the most saturated color
-    most_vibrant_color = max(vibrant_colors, key=lambda color: color[1])
+    # Find the most saturated color; argmax returns the first maximum in row-major
+    # order, the same pixel the original per-pixel loop picked on ties
+    saturation = np.where(bright, hsv_image[..., 1].astype(np.int16), -1)
+    y, x = np.unravel_index(np.argmax(saturation), saturation.shape)
+    most_vibrant_color = hsv_image[y, x]
 
     # Convert the most vibrant color back to RGB
     most_vibrant_color_hsv = np.uint8([[most_vibrant_color]])
@@ -334,7 +323,7 @@ if __name__ == "__main__":
     detected_objects = object_detection(image)
     print(f"Detected Objects: {detected_objects}")
 
-    Display the edge map (optional)
-    cv2.imshow("Edges", edges)
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
+    # Display the edge map (optional)
+    # cv2.imshow("Edges", edges)
+    # cv2.waitKey(0)
+    # cv2.destroyAllWindows()
@@ -1,8 +1,8 @@
 import pandas as pd
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.neighbors import NearestNeighbors
 import ast
 import numpy as np
+from recommender.exact import build_exact_index
 
 def parse_pixel_color(color_str):
     # Convert string like "(np.uint8(45), np.uint8(45), np.uint8(60))" into a numeric tuple
@@ -47,38 +47,34 @@ def build_recommender_model(csv_path: str, feature_columns: list, use_rgb: bool
     scaler = StandardScaler()
     X = scaler.fit_transform(df[feature_columns].values)
 
-    nn_model = NearestNeighbors(metric='cosine', algorithm='brute')
-    nn_model.fit(X)
+    # Exact cosine k-NN; batched queries are answered with one matrix product per block
+    nn_model = build_exact_index(X, space='cosine')
 
     return df, X, nn_model, scaler
 
 def recommend_similar_tracks_by_id(track_ids: list, df: pd.DataFrame, X, nn_model, k=5):
-    track_indices = df[df['id'].isin(track_ids)].index.tolist()
-    if not track_indices:
+    track_indices = np.flatnonzero(df['id'].isin(track_ids).to_numpy())
+    if len(track_indices) == 0:
         print("No tracks found with the given IDs.")
         return None
 
-    track_vectors = X[track_indices]
-    all_indices = []
-    all_distances = []
-    for track_vector in track_vectors:
-        distances, indices = nn_model.kneighbors(track_vector.reshape(1, -1), n_neighbors=k+1)
-        valid_indices = indices[0][1:]
-        valid_distances = distances[0][1:]
-        all_indices.extend(valid_indices)
-        all_distances.extend(valid_distances)
+    # Query every track in one call; the first neighbour of each track is the track itself
+    indices, distances = nn_model.query(X[track_indices], k=k+1)
+    all_indices = indices[:, 1:].ravel()
+    all_distances = distances[:, 1:].ravel()
 
     results = df.iloc[all_indices].copy()
+    results['distance'] = all_distances
+    return results
+
+
+if __name__ == "__main__":
     csv_path = "test_data.csv"
     # Example usage with only r, g, b features
     features = ["danceability", "energy"]  # Start with an empty list, or add other features you want
-    
-    df, X, nn_model, scaler = build_recommender_model(csv_path, features, use_rgb=True)
-    # Example track IDs to test
-    sample_ids = ["00Ci0EXS4fNPnkTbS6wkOh"]
-    
+
     df, X, nn_model, scaler = build_recommender_model(csv_path, features, use_rgb=True)
     # Example track IDs to test
     sample_ids = ["00Ci0EXS4fNPnkTbS6wkOh"]
     recs = recommend_similar_tracks_by_id(sample_ids, df, X, nn_model, k=5)
-    print(recs[['name', 'artist', 'distance']])
\ No newline at end of file
+    print(recs[['name', 'artist', 'distance']])
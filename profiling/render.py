@@ -0,0 +1,432 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+
+from .stats import calculate_statistics, is_numeric_column
+from .streaming import profile_csv
+
+# Records the content hash of every rendered column, next to the images
+RENDER_MANIFEST_FILE = 'render_manifest.json'
+
+# Bump when the layout of the images changes so every column is rendered again
+RENDER_VERSION = 1
+
+# Columns sent to a worker per task
+RENDER_CHUNK_SIZE = 16
+
+# The figure a process draws every column on
+_FIGURE = None
+
+
+def _new_figure():
+    """
+    Creates a figure drawn with the Agg canvas.
+
+    Figures are created without pyplot, so rendering is headless and does not
+    switch the backend of an interactive session that imports this module.
+    """
+    return Figure(figsize=(10, 6))
+
+
+def _init_renderer():
+    """Creates the figure a worker process reuses for all its columns."""
+    global _FIGURE
+    _FIGURE = _new_figure()
+
+
+def visualization_path(output_dir, column_name):
+    """Returns the path the visualization of a column is saved to."""
+    return f"{output_dir}/{column_name[:50]}_visualization.png"
+
+
+def column_content_hash(series, stats):
+    """
+    Hashes everything a column's visualization is drawn from.
+
+    Args:
+        series: The column.
+        stats: Statistics dictionary for this column.
+
+    Returns:
+        str: Hex digest of the column values, its statistics and the render version.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{RENDER_VERSION}\0{series.name}\0{series.dtype}\0".encode())
+    digest.update(json.dumps(stats, sort_keys=True, default=str).encode())
+    digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def load_render_manifest(output_dir):
+    """Returns column -> content hash of the previous render in output_dir."""
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path) as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+
+def save_render_manifest(output_dir, manifest):
+    """Writes the render manifest atomically."""
+    manifest_path = os.path.join(output_dir, RENDER_MANIFEST_FILE)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def create_column_visualization(df, column_name, stats, output_dir='column_visualizations', fig=None):
+    """
+    Creates a visualization for a specific column based on its data type.
+
+    Args:
+        df: pandas DataFrame
+        column_name: name of the column to visualize
+        stats: statistics dictionary for this column
+        output_dir: directory to save the visualizations
+        fig: figure to draw on; it is cleared first. If None, a new figure is used.
+    """
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Get the series
+    series = df[column_name]
+
+    # Get statistics from the stats dictionary
+    valid_count = stats["Valid"]
+    total_count = len(series)
+    valid_percent = (valid_count / total_count) * 100 if total_count > 0 else 0
+    missing_count = stats["Missing"]
+    missing_percent = (missing_count / total_count) * 100 if total_count > 0 else 0
+    mismatched_count = stats["Mismatched"]
+    mismatched_percent = (mismatched_count / total_count) * 100 if total_count > 0 else 0
+
+    # Reuse the figure if one is given
+    if fig is None:
+        fig = _new_figure()
+    else:
+        fig.clf()
+    gs = GridSpec(1, 2, figure=fig, width_ratios=[1, 1])
+
+    # Same column types as calculate_statistics; booleans are plotted as numbers
+    is_numeric = pd.api.types.is_bool_dtype(series) or is_numeric_column(series)
+
+    if is_numeric:
+        # For numeric columns
+        numeric_series = pd.to_numeric(series)
+        ax1 = fig.add_subplot(gs[0])
+
+        # Create histogram
+        if not series.dropna().empty:
+            sns.histplot(numeric_series.dropna(), ax=ax1, color='#0072B2')
+
+            # Add min and max labels
+            min_val = stats.get("Min", "N/A")
+            max_val = stats.get("Max", "N/A")
+            if min_val is not None and min_val!= "N/A":
+                ax1.text(min_val, 0, f"{min_val:.2f}" if isinstance(min_val, float) else str(min_val),
+                        ha='left', va='bottom')
+            if max_val is not None and max_val != "N/A":
+                ax1.text(max_val, 0, f"{max_val:.2f}" if isinstance(max_val, float) else str(max_val),
+                        ha='right', va='bottom')
+        else:
+            ax1.text(0.5, 0.5, "No data to display", ha='center', va='center', transform=ax1.transAxes)
+            ax1.set_xticks([])
+            ax1.set_yticks([])
+
+        # Stats panel
+        ax2 = fig.add_subplot(gs[1])
+        ax2.axis('off')
+
+        # Get statistics
+        mean = stats.get("Mean", "N/A")
+        std = stats.get("Std. Deviation", "N/A")
+        min_val = stats.get("Min", "N/A")
+        q25 = stats.get("25%", "N/A")
+        q50 = stats.get("50%", "N/A")
+        q75 = stats.get("75%", "N/A")
+        max_val = stats.get("Max", "N/A")
+
+
+        # Format numeric values
+        mean_str = f"{mean:.2f}" if isinstance(mean, (int, float)) else str(mean)
+        std_str = f"{std:.2f}" if isinstance(std, (int, float)) else str(std)
+        min_str = f"{min_val:.2f}" if isinstance(min_val, (int, float)) else str(min_val)
+        q25_str = f"{q25:.2f}" if isinstance(q25, (int, float)) else str(q25)
+        q50_str = f"{q50:.2f}" if isinstance(q50, (int, float)) else str(q50)
+        q75_str = f"{q75:.2f}" if isinstance(q75, (int, float)) else str(q75)
+        max_str = f"{max_val:.2f}" if isinstance(max_val, (int, float)) else str(max_val)
+
+        # Create stats table
+        stats_text = [
+            f"Valid █", f"{valid_count:,}", f"{valid_percent:.0f}%",
+            f"Mismatched █", f"{mismatched_count:,}", f"{mismatched_percent:.0f}%",
+            f"Missing █", f"{missing_count:,}", f"{missing_percent:.0f}%",
+            "",
+            f"Mean", mean_str,
+            f"Std. Deviation", std_str,
+            "",
+            f"Quantiles",
+            min_str, f"Min",
+            q25_str, f"25%",
+            q50_str, f"50%",
+            q75_str, f"75%",
+            max_str, f"Max"
+        ]
+
+        # Position the text
+        y_pos = 0.95
+        for i in range(0, len(stats_text), 3):
+            if i+2 < len(stats_text):
+                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
+                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
+                ax2.text(0.95, y_pos, stats_text[i+2], ha='right', color='#666666')
+            elif i+1 < len(stats_text):
+                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
+                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
+            else:
+                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
+            y_pos -= 0.05
+
+        # Add a green bar at the top
+        ax2.axhspan(0.97, 1.0, facecolor='green', alpha=0.3)
+
+    else:
+        # For string/categorical columns
+        ax1 = fig.add_subplot(gs[0])
+
+        # Get value counts if available
+        if "Value Counts" in stats:
+            value_counts = pd.Series(stats["Value Counts"])
+
+            # Plot as text
+            ax1.axis('off')
+            y_pos = 0.9
+            for value, count in value_counts.items():
+                percentage = (count / total_count) * 100 if total_count > 0 else 0
+                ax1.text(0.1, y_pos, str(value)[:100], ha='left') # Truncate string values
+                ax1.text(0.9, y_pos, f"{percentage:.0f}%", ha='right')
+                y_pos -= 0.2
+        else:
+            # If no value counts available
+            ax1.axis('off')
+            ax1.text(0.5, 0.5, "No categorical data to display", ha='center', va='center', transform=ax1.transAxes)
+
+        # Stats panel
+        ax2 = fig.add_subplot(gs[1])
+        ax2.axis('off')
+
+        # Get unique count and most common
+        unique_count = stats.get("Unique", "N/A")
+        most_common = stats.get("Most Common", "None")
+
+        # Calculate percentage of most common value
+        most_common_percent = 0
+        if "Value Counts" in stats and most_common in stats["Value Counts"]:
+            most_common_count = stats["Value Counts"][most_common]
+            most_common_percent = (most_common_count / total_count) * 100 if total_count > 0 else 0
+
+        # Create stats table
+        stats_text = [
+            f"Valid █", f"{valid_count:,}", f"{valid_percent:.0f}%",
+            f"Mismatched █", f"{mismatched_count:,}", f"{mismatched_percent:.0f}%",
+            f"Missing █", f"{missing_count:,}", f"{missing_percent:.0f}%",
+            "",
+            f"Unique", f"{unique_count:,}",
+            f"Most Common", str(most_common)[:100], f"{most_common_percent:.0f}%" # Truncate most common as well
+        ]
+
+        # Position the text
+        y_pos = 0.95
+        for i in range(0, len(stats_text), 3):
+            if i+2 < len(stats_text):
+                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
+                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
+                ax2.text(0.95, y_pos, stats_text[i+2], ha='right', color='#666666')
+            elif i+1 < len(stats_text):
+                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
+                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
+            else:
+                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
+            y_pos -= 0.05
+
+        # Add a green bar at the top
+        ax2.axhspan(0.97, 1.0, facecolor='green', alpha=0.3)
+
+    # Add title
+    column_name_truncated = column_name[:50] # Truncated to avoid long titles
+    if is_numeric:
+        fig.suptitle(f"# {column_name_truncated}", fontsize=14, fontweight='bold', ha='left', x=0.1)
+    else:
+        fig.suptitle(f"△ {column_name_truncated}", fontsize=14, fontweight='bold', ha='left', x=0.1)
+
+    # Save the figure
+    fig.tight_layout()
+    fig.savefig(visualization_path(output_dir, column_name), dpi=100, bbox_inches='tight')
+
+
+def _render_chunk(task):
+    """
+    Renders a chunk of columns on the process's reused figure.
+
+    Args:
+        task (tuple): (DataFrame holding the columns, {column: stats}, {column: content hash}, output_dir)
+
+    Returns:
+        list: (column, content hash) for every rendered column.
+    """
+    global _FIGURE
+    df, column_stats, hashes, output_dir = task
+    if _FIGURE is None:
+        _init_renderer()
+    rendered = []
+    for column in df.columns:
+        create_column_visualization(df, column, column_stats[column], output_dir, fig=_FIGURE)
+        rendered.append((column, hashes[column]))
+    return rendered
+
+
+def render_columns(df, column_stats, output_dir='column_visualizations', workers=None, skip_unchanged=True,
+                   chunk_size=RENDER_CHUNK_SIZE):
+    """
+    Renders the visualizations of all columns, in parallel and without a display.
+
+    Columns are split into chunks that are rendered by a pool of worker
+    processes, each of which reuses a single figure. With skip_unchanged,
+    columns whose values and statistics hash to the same value as in the last
+    run, and whose image still exists, are not rendered again.
+
+    Args:
+        df: pandas DataFrame
+        column_stats: statistics dictionary from calculate_statistics
+        output_dir: directory to save the visualizations
+        workers: number of worker processes. Defaults to the number of CPUs; 1 renders in this process.
+        skip_unchanged: whether to skip columns that have not changed since the last run
+        chunk_size: number of columns per worker task
+
+    Returns:
+        dict: Number of rendered and skipped columns and the elapsed seconds.
+    """
+    start_time = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    previous = load_render_manifest(output_dir) if skip_unchanged else {}
+    manifest = {}
+    pending = []
+    hashes = {}
+    for column in df.columns:
+        hashes[column] = column_content_hash(df[column], column_stats[column])
+        if (skip_unchanged and previous.get(column) == hashes[column]
+                and os.path.exists(visualization_path(output_dir, column))):
+            manifest[column] = hashes[column]
+        else:
+            pending.append(column)
+    num_skipped = len(manifest)
+
+    tasks = [
+        (df[columns], {column: column_stats[column] for column in columns},
+         {column: hashes[column] for column in columns}, output_dir)
+        for columns in (pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size))
+    ]
+
+    # Columns are only added to the manifest once their image is written, so an interrupted run resumes
+    try:
+        if workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                manifest.update(_render_chunk(task))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_renderer) as executor:
+                for future in as_completed([executor.submit(_render_chunk, task) for task in tasks]):
+                    manifest.update(future.result())
+    finally:
+        save_render_manifest(output_dir, manifest)
+
+    render_stats = {
+        'rendered': len(manifest) - num_skipped,
+        'skipped': num_skipped,
+        'seconds': time.perf_counter() - start_time,
+    }
+    print(f"Rendered {render_stats['rendered']} columns in {render_stats['seconds']:.1f}s "
+          f"({render_stats['skipped']} unchanged columns skipped)")
+    return render_stats
+
+
+def process_csv_file(csv_file, data_folder, output_dir='column_visualizations', save_stats=True, sep=',',
+                     workers=None, skip_unchanged=True, chunksize=None):
+    """
+    Processes a CSV file: calculates statistics and creates visualizations.
+
+    Args:
+        csv_file: name of the CSV file
+        data_folder: path to the data directory
+        output_dir: directory to save the visualizations
+        save_stats: whether to save statistics to a JSON file
+        sep: The separator used in the CSV file. Defaults to comma (',').
+        workers: number of rendering processes. Defaults to the number of CPUs.
+        skip_unchanged: whether to skip columns whose visualization is up to date
+        chunksize: if set, the CSV is profiled in chunks of this many rows with bounded memory.
+            Visualizations need the full columns and are not created in this mode.
+    """
+    try:
+        # Create full file path using os.path.join
+        csv_path = os.path.join(data_folder, csv_file)
+
+        if chunksize:
+            # Stream the file through mergeable sketches instead of loading it
+            df = None
+            print(f"Calculating statistics in chunks of {chunksize:,} rows...")
+            column_stats = profile_csv(csv_path, sep=sep, chunksize=chunksize)
+        else:
+            # Load the CSV file with specified separator
+            df = pd.read_csv(csv_path, sep=sep, low_memory=False)
+            print(f"Successfully loaded CSV file: {csv_path}")
+            print(f"Shape: {df.shape} (rows, columns)")
+
+            # Calculate statistics
+            print("Calculating statistics...")
+            column_stats = calculate_statistics(df)
+
+        # Save statistics to JSON if requested
+        if save_stats:
+            stats_file = f"{output_dir}/column_statistics.json"
+            os.makedirs(output_dir, exist_ok=True)
+            with open(stats_file, 'w') as f:
+                json.dump(column_stats, f, indent=4)
+            print(f"Statistics saved to {stats_file}")
+
+        # Print statistics to console
+        for col, stats in column_stats.items():
+            print(f"Column: {col}")
+            for stat, value in stats.items():
+                print(f"  {stat}: {value}")
+            print("-" * 30)
+
+        if df is None:
+            print("Skipping visualizations in chunked mode")
+            return
+
+        # Create visualizations
+        print("Creating visualizations...")
+        render_columns(df, column_stats, output_dir, workers=workers, skip_unchanged=skip_unchanged)
+
+        print(f"Visualizations saved to {output_dir}/")
+
+    except FileNotFoundError:
+        print(f"Error: File not found: {csv_path}")  # Use constructed path for error message
+        exit()
+    except Exception as e:
+        print(f"Error processing CSV: {e}")
+        import traceback
+        traceback.print_exc()
+        exit()
@@ -0,0 +1,237 @@
+import numpy as np
+import pandas as pd
+
+# Quantiles reported for numeric columns, with their JSON keys
+QUANTILES = {"25%": 0.25, "50%": 0.50, "75%": 0.75}
+
+# Number of bins in the "Label Distribution" of numeric columns
+NUM_BINS = 10
+
+# Numeric columns are converted to float64 this many at a time, to bound memory on wide frames
+COLUMN_BLOCK_SIZE = 64
+
+# Types reported by pd.api.types.infer_dtype for object columns that hold numbers
+NUMERIC_INFERRED_TYPES = {"integer", "floating", "mixed-integer-float", "decimal", "empty"}
+
+
+def _optional_float(value):
+    """Converts a statistic to a JSON float, or None if it is NaN."""
+    return None if pd.isna(value) else float(value)
+
+
+def is_numeric_column(series):
+    """
+    Decides from the dtype whether a column gets numeric statistics.
+
+    Object columns count as numeric when all their values are numbers (or missing),
+    which is what a successful pd.to_numeric would have found for them.
+    """
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+        return False
+    if pd.api.types.is_numeric_dtype(series):
+        return True
+    if series.dtype == object:
+        return pd.api.types.infer_dtype(series, skipna=True) in NUMERIC_INFERRED_TYPES
+    return False
+
+
+def _linear_quantiles(sorted_values, counts, q):
+    """
+    Quantiles of every column of a column-wise sorted block, NaNs sorted last.
+
+    Uses the same virtual index and interpolation as numpy's 'linear' method,
+    which pandas' Series.quantile uses.
+    """
+    virtual_index = counts * q + (1 + q * -1) - 1
+    previous_index = np.clip(np.floor(virtual_index), 0, counts - 1).astype(np.intp)
+    next_index = np.clip(previous_index + 1, 0, counts - 1).astype(np.intp)
+    gamma = virtual_index - np.floor(virtual_index)
+
+    columns = np.arange(sorted_values.shape[1])
+    below = sorted_values[previous_index, columns]
+    above = sorted_values[next_index, columns]
+    difference = above - below
+    return np.where(gamma >= 0.5, above - difference * (1 - gamma), below + difference * gamma)
+
+
+def _label_distribution(sorted_valid, minimum, maximum):
+    """
+    Counts values in the 10 equal-width, right-closed bins pd.cut(bins=10) would use.
+
+    The bin edges and labels come from cutting just [min, max], which gives the
+    same edges as cutting the whole column; values are then counted with one
+    searchsorted over the already sorted column.
+    """
+    categories, edges = pd.cut(np.array([minimum, maximum]), bins=NUM_BINS, retbins=True)
+    cumulative = np.searchsorted(sorted_valid, edges, side="right")
+    counts = np.diff(cumulative)
+    return {str(interval): int(count) for interval, count in zip(categories.categories, counts)}
+
+
+def _numeric_statistics_exact(numeric_series):
+    """Per-column numeric statistics for columns the vectorized pass does not cover (booleans, infinities, empty)."""
+    col_stats = {}
+    try:
+        col_stats["Unique"] = int(numeric_series.nunique())
+        col_stats["Mean"] = _optional_float(numeric_series.mean())
+        col_stats["Std. Deviation"] = _optional_float(numeric_series.std())
+        col_stats["Min"] = _optional_float(numeric_series.min())
+        for key, q in QUANTILES.items():
+            col_stats[key] = _optional_float(numeric_series.quantile(q))
+        col_stats["Max"] = _optional_float(numeric_series.max())
+
+        try:
+            bins = pd.cut(numeric_series.dropna(), bins=NUM_BINS)
+            bin_counts = bins.value_counts().sort_index()
+
+            col_stats["Label Distribution"] = {
+                str(interval): int(count)
+                for interval, count in zip(bin_counts.index, bin_counts.values)
+            }
+        except Exception as e:
+            col_stats["Label Distribution"] = f"Binning failed: {str(e)}"
+    except Exception as generalFailure:
+        print(f"General failure in a numeric section{str(generalFailure)}")
+    return col_stats
+
+
+def _numeric_block_statistics(block):
+    """
+    Computes the numeric statistics of a block of columns in one vectorized pass.
+
+    Args:
+        block (pd.DataFrame): Numeric columns.
+
+    Returns:
+        dict: Column name -> numeric statistics.
+    """
+    values = block.to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = np.isnan(values)
+    counts = values.shape[0] - missing.sum(axis=0)
+
+    # Mean and sample variance the way pandas computes them: NaNs count as zero in the sums
+    filled = np.where(missing, 0.0, values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = filled.sum(axis=0) / counts
+        squared = np.where(missing, 0.0, (values - means) ** 2)
+        stds = np.sqrt(squared.sum(axis=0) / (counts - 1))
+    stds[counts <= 1] = np.nan
+
+    sorted_values = np.sort(values, axis=0)
+    quantiles = {key: _linear_quantiles(sorted_values, counts, q) for key, q in QUANTILES.items()}
+    minimums = sorted_values[0]
+    maximums = sorted_values[np.maximum(counts - 1, 0), np.arange(values.shape[1])]
+
+    # Sorted columns make the number of distinct values a count of changes between neighbours
+    changes = sorted_values[1:] != sorted_values[:-1]
+    in_range = np.arange(1, values.shape[0])[:, None] < counts[None, :]
+    uniques = (changes & in_range).sum(axis=0) + (counts > 0)
+
+    block_stats = {}
+    for position, column in enumerate(block.columns):
+        sorted_valid = sorted_values[:counts[position], position]
+        col_stats = {
+            "Unique": int(uniques[position]),
+            "Mean": _optional_float(means[position]),
+            "Std. Deviation": _optional_float(stds[position]),
+            "Min": float(minimums[position]),
+        }
+        for key in QUANTILES:
+            col_stats[key] = float(quantiles[key][position])
+        col_stats["Max"] = float(maximums[position])
+        col_stats["Label Distribution"] = _label_distribution(sorted_valid, minimums[position], maximums[position])
+        block_stats[column] = col_stats
+    return block_stats
+
+
+def _categorical_statistics(series):
+    """Unique count, most common value and value counts of a non-numeric column from one value_counts pass."""
+    col_stats = {}
+    value_counts = series.value_counts(dropna=False)
+    non_null_counts = value_counts[value_counts.index.notna()]
+
+    col_stats["Unique"] = int(len(non_null_counts))
+    if len(non_null_counts) > 0:
+        # Like Series.mode: the smallest of the most frequent values
+        candidates = non_null_counts.index[non_null_counts.values == non_null_counts.values.max()].tolist()
+        try:
+            most_common = sorted(candidates)[0]
+        except TypeError:
+            most_common = candidates[0]
+        col_stats["Most Common"] = str(most_common)
+    else:
+        col_stats["Most Common"] = None
+
+    # Example for string columns to identify values from non values
+    if pd.api.types.is_string_dtype(series) or series.dtype == 'object':
+        if not value_counts.empty:
+            # Convert to a more readable format
+            if len(value_counts) > 10:
+                # Show top 3 and group the rest
+                top_values = value_counts.head(3)
+                other_count = value_counts[3:].sum()
+
+                col_stats["Value Counts"] = {
+                    str(val): int(count) for val, count in top_values.items()
+                }
+                col_stats["Value Counts"][f"Other ({len(value_counts) - 3})"] = int(other_count)
+            else:
+                col_stats["Value Counts"] = {
+                    str(val): int(count) for val, count in value_counts.items()
+                }
+    return col_stats
+
+
+def calculate_statistics(df):
+    """
+    Calculates statistics for each column of a pandas DataFrame.
+
+    Column types are decided from the dtypes. Numeric columns are converted to
+    float64 and summarised a block of columns at a time: one sort per block
+    gives the quantiles, minimum, maximum, unique count and the bin counts.
+    Booleans, columns with infinities and empty columns take a per-column path
+    so they produce the same output as before.
+
+    Args:
+        df (pd.DataFrame): The input DataFrame.
+
+    Returns:
+        dict: A dictionary where keys are column names and values
+              are dictionaries containing the calculated statistics.
+    """
+    valid_counts = df.count()
+    numeric_columns = []
+    vectorized_columns = []
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            numeric_columns.append(column)
+        elif is_numeric_column(series):
+            numeric_columns.append(column)
+            if series.dtype != object:
+                vectorized_columns.append(column)
+
+    # Columns with infinities or without values are left to the per-column path
+    numeric_details = {}
+    for start in range(0, len(vectorized_columns), COLUMN_BLOCK_SIZE):
+        block = df[vectorized_columns[start:start + COLUMN_BLOCK_SIZE]]
+        finite = [column for column in block.columns
+                  if valid_counts[column] > 0 and np.isfinite(block[column].to_numpy(dtype=np.float64, na_value=0.0)).all()]
+        numeric_details.update(_numeric_block_statistics(block[finite]))
+
+    stats = {}
+    for column in df.columns:
+        series = df[column]
+        col_stats = {
+            "Valid": int(valid_counts[column]),
+            "Missing": int(len(series) - valid_counts[column]),
+            "Mismatched": 0,
+        }
+        if column in numeric_details:
+            col_stats.update(numeric_details[column])
+        elif column in numeric_columns:
+            col_stats.update(_numeric_statistics_exact(pd.to_numeric(series)))
+        else:
+            col_stats.update(_categorical_statistics(series))
+        stats[column] = col_stats
+    return stats
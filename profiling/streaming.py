@@ -0,0 +1,487 @@
+import numpy as np
+import pandas as pd
+
+from .stats import QUANTILES, NUM_BINS, is_numeric_column
+
+# Rows read from the CSV per chunk
+DEFAULT_CHUNKSIZE = 100_000
+
+# Items kept by the top compactor of a KLL sketch; rank error shrinks as 1 / k.
+# A sketch holds about 3 * k values, so k = 1000 costs ~24 KB per column.
+KLL_K = 1000
+
+# HyperLogLog precision: 2**14 registers, about 0.8% standard error
+HLL_PRECISION = 14
+
+# Distinct hashes kept exactly before a HyperLogLog switches to its registers
+HLL_EXACT_LIMIT = 4096
+
+# Counters kept per categorical column; counts are exact while a column has fewer distinct values
+TOP_K_CAPACITY = 1000
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch.
+
+    Values are kept in a hierarchy of compactors. Level h holds items of
+    weight 2**h; when a level outgrows its capacity it is sorted and every
+    other item, starting at a random offset, is promoted to the next level.
+    Capacities shrink geometrically (by 2/3) from the top level down, so the
+    sketch holds O(k) items. While nothing has been compacted, the quantiles
+    and ranks are exact. Sketches of disjoint data merge by concatenating
+    their levels.
+    """
+
+    def __init__(self, k=KLL_K, seed=0):
+        """
+        Args:
+            k (int): Capacity of the top level.
+            seed (int): Seed for the compaction offsets.
+        """
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compact(self, level):
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        items = np.sort(self.levels[level])
+        # An odd item out stays behind so the total weight is preserved
+        even = len(items) - len(items) % 2
+        promoted = items[self._rng.integers(2):even:2]
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+        self.levels[level] = items[even:]
+
+    def _compress(self):
+        # Adding a level lowers the capacity of the ones below, so check from the bottom again
+        while True:
+            for level in range(len(self.levels)):
+                if len(self.levels[level]) > self._capacity(level):
+                    self._compact(level)
+                    break
+            else:
+                return
+
+    def update(self, values):
+        """Adds an array of finite or infinite (but not NaN) values."""
+        values = np.asarray(values, dtype=np.float64)
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """Adds the values summarised by another sketch."""
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self._compress()
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2.0 ** level) for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantiles(self, qs):
+        """
+        Estimates quantiles with linear interpolation between ranks.
+
+        Every item stands for `weight` consecutive ranks and is placed at their
+        centre, so an uncompacted sketch gives the same result as numpy's
+        'linear' method.
+
+        Returns:
+            np.ndarray: One estimate per q, NaN if the sketch is empty.
+        """
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        items, weights = self._weighted_items()
+        centres = np.cumsum(weights) - (weights + 1) / 2
+        return np.interp(np.asarray(qs) * (self.n - 1), centres, items)
+
+    def rank(self, values):
+        """Estimates the number of summarised values <= each of values."""
+        items, weights = self._weighted_items()
+        cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+        return cumulative[np.searchsorted(items, values, side='right')]
+
+
+def _bit_length(values):
+    """Number of significant bits of every uint64 in values, which must be below 2**53."""
+    # Integers below 2**53 are exact in float64, so the binary exponent is the bit length
+    return np.frexp(values.astype(np.float64))[1]
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter over 64-bit hashes.
+
+    Small sets are counted exactly: the distinct hashes are kept until there
+    are more than exact_limit of them, after which they are folded into the
+    registers. Counters merge by taking the union of their sets or the
+    maximum of their registers.
+    """
+
+    def __init__(self, precision=HLL_PRECISION, exact_limit=HLL_EXACT_LIMIT):
+        """
+        Args:
+            precision (int): log2 of the number of registers.
+            exact_limit (int): Number of distinct hashes counted exactly.
+
+        Raises:
+            ValueError: If precision is not between 11 and 18.
+        """
+        if not 11 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 11 and 18, got {precision}")
+        self.precision = precision
+        self.exact_limit = exact_limit
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.registers = None
+
+    def _add_to_registers(self, hashes):
+        remaining_bits = 64 - self.precision
+        buckets = (hashes >> np.uint64(remaining_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << remaining_bits) - 1)
+        ranks = (remaining_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def update(self, hashes):
+        """Adds an array of uint64 hashes."""
+        if self.registers is None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > self.exact_limit:
+                self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+                self._add_to_registers(self.hashes)
+                self.hashes = np.empty(0, dtype=np.uint64)
+        else:
+            self._add_to_registers(hashes)
+
+    def merge(self, other):
+        """Adds the hashes counted by another counter with the same precision."""
+        if other.registers is None:
+            self.update(other.hashes)
+            return
+        if self.registers is None:
+            hashes = self.hashes
+            self.registers = other.registers.copy()
+            self.hashes = np.empty(0, dtype=np.uint64)
+            self._add_to_registers(hashes)
+        else:
+            np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """Estimated number of distinct hashes."""
+        if self.registers is None:
+            return len(self.hashes)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(2.0 ** -self.registers.astype(np.float64))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class TopKCounter:
+    """
+    Mergeable frequent-items summary (Misra-Gries).
+
+    Keeps at most `capacity` counters. When a merge leaves more, the
+    (capacity + 1)-th largest count is subtracted from every counter and the
+    ones that drop to zero are removed; counts are then underestimated by at
+    most total / (capacity + 1). Columns with at most `capacity` distinct
+    values are counted exactly.
+    """
+
+    def __init__(self, capacity=TOP_K_CAPACITY):
+        """
+        Args:
+            capacity (int): Maximum number of counters.
+        """
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+
+    def update(self, counts):
+        """
+        Adds value counts.
+
+        Args:
+            counts (pd.Series): Value -> count.
+        """
+        combined = self.counts.add(counts, fill_value=0).astype(np.int64)
+        if len(combined) > self.capacity:
+            threshold = np.partition(combined.to_numpy(), len(combined) - self.capacity - 1)[len(combined) - self.capacity - 1]
+            combined = combined - threshold
+            combined = combined[combined > 0]
+        self.counts = combined
+
+    def merge(self, other):
+        """Adds the counts of another summary."""
+        self.update(other.counts)
+
+    def most_common(self, n=None):
+        """Returns (value, count) pairs by decreasing count."""
+        ordered = self.counts.sort_values(ascending=False, kind='stable')
+        return list(ordered.items())[:n]
+
+
+def _values_are_boolean(series):
+    return pd.api.types.is_bool_dtype(series) or (
+        series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) == 'boolean')
+
+
+def _chunk_kind(series):
+    """Column type the values of a chunk suggest: 'numeric' or 'categorical'."""
+    if _values_are_boolean(series) or is_numeric_column(series):
+        return 'numeric'
+    return 'categorical'
+
+
+class ColumnProfile:
+    """
+    Running statistics of one column.
+
+    The column type is fixed by the first chunk with values. Values of later
+    chunks that cannot be read as that type are counted as mismatched:
+    non-numeric values in a numeric column are excluded from the numeric
+    statistics, and numbers in a categorical column are counted as strings.
+    """
+
+    def __init__(self, name, kll_k=KLL_K, top_k_capacity=TOP_K_CAPACITY):
+        """
+        Args:
+            name (str): Column name.
+            kll_k (int): Size of the quantile sketch.
+            top_k_capacity (int): Number of value counters of a categorical column.
+        """
+        self.name = name
+        self.kind = None
+        self.valid = 0
+        self.missing = 0
+        self.mismatched = 0
+        # Welford/Chan running moments of the numeric values
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.quantiles = KLLSketch(kll_k)
+        self.distinct = HyperLogLog()
+        self.top_values = TopKCounter(top_k_capacity)
+
+    def _update_moments(self, values):
+        count = len(values)
+        if count == 0:
+            return
+        mean = values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+    def update(self, series):
+        """Adds the values of one chunk of the column."""
+        not_null = series.notna()
+        num_valid = int(not_null.sum())
+        self.valid += num_valid
+        self.missing += len(series) - num_valid
+        if num_valid == 0:
+            return
+        if self.kind is None:
+            self.kind = _chunk_kind(series)
+
+        if self.kind == 'numeric':
+            if _values_are_boolean(series):
+                numeric = series.astype(np.float64)
+            else:
+                numeric = pd.to_numeric(series, errors='coerce')
+            values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+            values = values[~np.isnan(values)]
+            self.mismatched += num_valid - len(values)
+            self._update_moments(values)
+            self.quantiles.update(values)
+            self.distinct.update(pd.util.hash_array(values))
+        else:
+            values = series[not_null]
+            if _chunk_kind(series) == 'numeric':
+                self.mismatched += num_valid
+                values = values.astype(str)
+            values = values.to_numpy(dtype=object)
+            self.distinct.update(pd.util.hash_array(values))
+            self.top_values.update(pd.Series(values).value_counts())
+
+    def merge(self, other):
+        """
+        Adds the statistics of the same column over other rows.
+
+        Raises:
+            ValueError: If the two profiles found different column types.
+        """
+        if self.kind is not None and other.kind is not None and self.kind != other.kind:
+            raise ValueError(f"Column '{self.name}' is {self.kind} in one profile and {other.kind} in the other")
+        self.kind = self.kind or other.kind
+        self.valid += other.valid
+        self.missing += other.missing
+        self.mismatched += other.mismatched
+        if other.count:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+            self.count = total
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.quantiles.merge(other.quantiles)
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+
+    def _numeric_statistics(self):
+        col_stats = {"Unique": self.distinct.count()}
+        if self.count == 0:
+            col_stats.update({"Mean": None, "Std. Deviation": None, "Min": None})
+            col_stats.update({key: None for key in QUANTILES})
+            col_stats["Max"] = None
+        else:
+            std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+            col_stats["Mean"] = None if np.isnan(self.mean) else float(self.mean)
+            col_stats["Std. Deviation"] = float(std) if np.isfinite(std) else None
+            col_stats["Min"] = float(self.min)
+            for key, value in zip(QUANTILES, self.quantiles.quantiles(list(QUANTILES.values()))):
+                col_stats[key] = None if np.isnan(value) else float(value)
+            col_stats["Max"] = float(self.max)
+
+        try:
+            values = np.array([self.min, self.max]) if self.count else np.empty(0)
+            categories, edges = pd.cut(values, bins=NUM_BINS, retbins=True)
+            counts = np.diff(self.quantiles.rank(edges))
+            col_stats["Label Distribution"] = {
+                str(interval): int(round(count)) for interval, count in zip(categories.categories, counts)
+            }
+        except Exception as e:
+            col_stats["Label Distribution"] = f"Binning failed: {str(e)}"
+        return col_stats
+
+    def _categorical_statistics(self):
+        col_stats = {"Unique": self.distinct.count()}
+        top_values = self.top_values.most_common()
+        if top_values:
+            max_count = top_values[0][1]
+            candidates = [value for value, count in top_values if count == max_count]
+            try:
+                most_common = sorted(candidates)[0]
+            except TypeError:
+                most_common = candidates[0]
+            col_stats["Most Common"] = str(most_common)
+        else:
+            col_stats["Most Common"] = None
+
+        # Missing values are counted exactly and reported like value_counts(dropna=False) does
+        value_counts = top_values + ([(np.nan, self.missing)] if self.missing else [])
+        value_counts.sort(key=lambda item: -item[1])
+        num_values = col_stats["Unique"] + (1 if self.missing else 0)
+        if num_values > 10:
+            col_stats["Value Counts"] = {str(val): int(count) for val, count in value_counts[:3]}
+            col_stats["Value Counts"][f"Other ({num_values - 3})"] = int(
+                self.valid + self.missing - sum(count for _, count in value_counts[:3]))
+        elif value_counts:
+            col_stats["Value Counts"] = {str(val): int(count) for val, count in value_counts}
+        return col_stats
+
+    def statistics(self):
+        """Returns the statistics in the format of calculate_statistics."""
+        col_stats = {"Valid": self.valid, "Missing": self.missing, "Mismatched": self.mismatched}
+        if self.kind == 'categorical':
+            col_stats.update(self._categorical_statistics())
+        else:
+            col_stats.update(self._numeric_statistics())
+        return col_stats
+
+
+class StreamingProfiler:
+    """
+    Column statistics over a table that is read in chunks.
+
+    Memory is bounded by the sketch sizes per column, not by the number of
+    rows. Profilers of disjoint sets of rows (e.g. parts of a file processed
+    in parallel) can be merged.
+    """
+
+    def __init__(self, kll_k=KLL_K, top_k_capacity=TOP_K_CAPACITY):
+        """
+        Args:
+            kll_k (int): Size of the quantile sketches.
+            top_k_capacity (int): Number of value counters per categorical column.
+        """
+        self.kll_k = kll_k
+        self.top_k_capacity = top_k_capacity
+        self.columns = {}
+        self.rows = 0
+
+    def _column(self, name):
+        if name not in self.columns:
+            self.columns[name] = ColumnProfile(name, self.kll_k, self.top_k_capacity)
+        return self.columns[name]
+
+    def update(self, chunk):
+        """
+        Adds a chunk of rows.
+
+        Args:
+            chunk (pd.DataFrame): The rows.
+        """
+        for column in chunk.columns:
+            self._column(column).update(chunk[column])
+        self.rows += len(chunk)
+
+    def merge(self, other):
+        """Adds the statistics of another profiler over other rows."""
+        for name, profile in other.columns.items():
+            self._column(name).merge(profile)
+        self.rows += other.rows
+
+    def statistics(self):
+        """
+        Returns:
+            dict: Column name -> statistics, as returned by calculate_statistics.
+        """
+        return {name: profile.statistics() for name, profile in self.columns.items()}
+
+
+def profile_csv(csv_path, sep=',', chunksize=DEFAULT_CHUNKSIZE, kll_k=KLL_K, top_k_capacity=TOP_K_CAPACITY):
+    """
+    Calculates column statistics of a CSV file without loading it into memory.
+
+    Quantiles, bin counts, unique counts and the counts of frequent values
+    are estimated from sketches once a column outgrows them; valid, missing
+    and mismatched counts, mean, standard deviation, min and max are exact.
+
+    Args:
+        csv_path (str): Path to the CSV file.
+        sep (str): The separator used in the CSV file.
+        chunksize (int): Rows read per chunk.
+        kll_k (int): Size of the quantile sketches.
+        top_k_capacity (int): Number of value counters per categorical column.
+
+    Returns:
+        dict: Column name -> statistics, as returned by calculate_statistics.
+    """
+    profiler = StreamingProfiler(kll_k, top_k_capacity)
+    for chunk in pd.read_csv(csv_path, sep=sep, chunksize=chunksize):
+        profiler.update(chunk)
+        print(f"Profiled {profiler.rows:,} rows", end='\r')
+    print(f"Profiled {profiler.rows:,} rows of {csv_path}")
+    return profiler.statistics()
+
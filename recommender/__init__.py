@@ -0,0 +1,2 @@
+from .engine import *
+from .id_index import *
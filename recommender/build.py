@@ -0,0 +1,232 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from .engine import MODEL_INDEX_FILES, _import_voyager
+from .exact import EXACT_INDEX_EXTENSION, build_exact_index, use_exact_index
+from .precision import STORAGE_DATA_TYPES, calibrate_scale, clip_to_storage, storage_data_type
+from .transforms import transform_path
+
+# Parameters for Voyager indexes
+DEFAULT_M = 12  # Number of connections between nodes
+DEFAULT_EF_CONSTRUCTION = 200  # Number of vectors to search during construction
+
+# Parameters for Annoy indexes
+DEFAULT_N_TREES = 10
+
+
+def annoy_index_file(model_name):
+    """Returns the .ann file name used for a model."""
+    return os.path.splitext(MODEL_INDEX_FILES[model_name])[0] + '.ann'
+
+
+def _as_float32_rows(features):
+    """Casts a feature matrix to C-contiguous float32 once, without copying if it already is."""
+    return np.ascontiguousarray(features, dtype=np.float32)
+
+
+def build_voyager_index(features, M=DEFAULT_M, ef_construction=DEFAULT_EF_CONSTRUCTION, num_threads=-1,
+                        precision='float32'):
+    """
+    Builds a Euclidean Voyager index with row positions as item ids.
+
+    Args:
+        features (np.ndarray): Feature matrix (n_items, n_dimensions).
+        M (int): Number of connections between nodes.
+        ef_construction (int): Number of vectors to search during construction.
+        num_threads (int): Threads used to insert the vectors (-1 uses all cores).
+        precision (str): Storage precision, 'float32', 'e4m3' or 'float8' (see precision.py).
+            The features must already be scaled into the range of an 8-bit precision.
+
+    Returns:
+        voyager.Index: The built index.
+    """
+    voyager = _import_voyager()
+    vectors = _as_float32_rows(features)
+
+    index = voyager.Index(voyager.Space.Euclidean, num_dimensions=vectors.shape[1],
+                          M=M, ef_construction=ef_construction, max_elements=len(vectors),
+                          storage_data_type=storage_data_type(voyager, precision))
+    index.add_items(vectors, ids=np.arange(len(vectors)), num_threads=num_threads)
+    return index
+
+
+def _build_and_save_index(model_name, features, data_folder, exact, M, ef_construction, num_threads,
+                          transform=None, precision='float32'):
+    """
+    Builds one exact or Voyager index, saves it with its transform and returns its build statistics.
+
+    For an 8-bit precision the features are first multiplied by their
+    calibration scale and clipped to the bounds of the type, which Voyager
+    rejects values outside of; the scale is stored in the transform so new
+    tracks and queries are embedded on the same scale. The index file of the other kind
+    is removed afterwards, so a space that crossed the exact search threshold
+    is not loaded from a stale file.
+    """
+    storage_scale = 1.0
+    if precision != 'float32':
+        storage_scale = calibrate_scale(features, precision)
+        features = clip_to_storage(_as_float32_rows(features) * np.float32(storage_scale), precision)
+        transform = transform.with_output_scale(storage_scale, precision)
+
+    voyager_path = os.path.join(data_folder, MODEL_INDEX_FILES[model_name])
+    exact_path = os.path.splitext(voyager_path)[0] + EXACT_INDEX_EXTENSION
+    path, stale_path = (exact_path, voyager_path) if exact else (voyager_path, exact_path)
+
+    start_time = time.perf_counter()
+    if exact:
+        index = build_exact_index(_as_float32_rows(features))
+    else:
+        index = build_voyager_index(features, M=M, ef_construction=ef_construction, num_threads=num_threads,
+                                    precision=precision)
+    build_seconds = time.perf_counter() - start_time
+    index.save(path)
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
+    stats = {
+        'path': path,
+        'index_type': 'exact' if exact else 'voyager',
+        'precision': precision,
+        'storage_scale': storage_scale,
+        'file_bytes': os.path.getsize(path),
+        'num_vectors': len(index),
+        'num_dimensions': index.num_dimensions,
+        'build_seconds': build_seconds,
+        'vectors_per_second': len(index) / build_seconds if build_seconds > 0 else float('inf'),
+    }
+    if transform is not None:
+        # Written after the index so a transform never refers to an index that was not saved
+        stats['transform_path'] = transform_path(path)
+        transform.save(stats['transform_path'], model_name=model_name, index_file=os.path.basename(path),
+                       num_elements=len(index))
+    return stats
+
+
+def _space_parameter(value, model_name, default):
+    """Returns a build parameter given either for all spaces or as a model name -> value dict."""
+    if isinstance(value, dict):
+        return value.get(model_name, default)
+    return value
+
+
+def build_indexes(feature_sets, data_folder, M=DEFAULT_M, ef_construction=DEFAULT_EF_CONSTRUCTION,
+                  max_workers=None, transforms=None, exact=None, precision=None):
+    """
+    Builds and saves an index for every feature space concurrently.
+
+    Spaces whose dimensions x vectors is at most EXACT_MAX_ELEMENTS are saved
+    as exact indexes (.npz), which need no graph construction and return exact
+    neighbours; larger spaces get a Voyager index (.voy). Each Voyager space is
+    inserted with a single multi-threaded add_items call; the available cores
+    are shared between the spaces that are built at the same time. Spaces
+    with an 8-bit storage precision always get a Voyager index.
+
+    Args:
+        feature_sets (dict): Model name (see MODEL_INDEX_FILES) -> feature matrix.
+        data_folder (str): Directory the index files are written to.
+        M (int or dict): Number of connections between nodes, for every space or per model name
+            (e.g. as chosen by benchmarks/index_params.py).
+        ef_construction (int or dict): Number of vectors to search during construction, likewise.
+        max_workers (int): Number of spaces built at once. If None, builds all at once.
+        transforms (dict): Model name -> FeatureTransform that produced its features. Each is
+            saved next to its index file so new tracks can be embedded into the space.
+        exact (bool): True builds exact indexes and False Voyager indexes for every space.
+            If None, the index type is chosen per space by its size.
+        precision (str or dict): Voyager storage precision ('float32', 'e4m3' or 'float8'),
+            for every space or per model name; defaults to float32. 8-bit spaces need a
+            transform, which stores their calibration scale.
+
+    Returns:
+        dict: Model name -> build statistics (index type, precision, time, vectors/sec, path, size).
+    """
+    transforms = transforms or {}
+    precisions = {model_name: _space_parameter(precision or 'float32', model_name, 'float32')
+                  for model_name in feature_sets}
+    for model_name, model_precision in precisions.items():
+        if model_precision not in STORAGE_DATA_TYPES:
+            raise ValueError(f"Invalid storage precision '{model_precision}'. Choose from {list(STORAGE_DATA_TYPES)}")
+        if model_precision != 'float32' and model_name not in transforms:
+            raise ValueError(f"'{model_name}' is stored as {model_precision}, which needs its transform "
+                             f"to store the calibration scale")
+        if model_precision != 'float32' and exact:
+            raise ValueError(f"Exact indexes store float32; '{model_name}' cannot use {model_precision}")
+    for model_name, transform in transforms.items():
+        if transform.num_dimensions != feature_sets[model_name].shape[1]:
+            raise ValueError(f"Transform of '{model_name}' has {transform.num_dimensions} dimensions, "
+                             f"features have {feature_sets[model_name].shape[1]}")
+
+    os.makedirs(data_folder, exist_ok=True)
+    max_workers = max_workers or len(feature_sets)
+    num_threads = max(1, multiprocessing.cpu_count() // max_workers)
+
+    build_stats = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_build_and_save_index, model_name, features, data_folder,
+                            (precisions[model_name] == 'float32' and use_exact_index(*features.shape))
+                            if exact is None else exact,
+                            _space_parameter(M, model_name, DEFAULT_M),
+                            _space_parameter(ef_construction, model_name, DEFAULT_EF_CONSTRUCTION),
+                            num_threads, transforms.get(model_name), precisions[model_name]): model_name
+            for model_name, features in feature_sets.items()
+        }
+        for future in as_completed(futures):
+            model_name = futures[future]
+            stats = future.result()
+            build_stats[model_name] = stats
+            print(f"{model_name} {stats['index_type']} {stats['precision']} index built in {stats['build_seconds']:.2f}s "
+                  f"({stats['vectors_per_second']:,.0f} vectors/sec) and saved to: {stats['path']}")
+
+    return build_stats
+
+
+def build_annoy_index(features, n_trees=DEFAULT_N_TREES, metric='euclidean', n_jobs=-1):
+    """
+    Builds an Annoy index with row positions as item ids.
+
+    Annoy has no bulk insert, so the matrix is converted to float32 lists once
+    and the tree build runs on `n_jobs` threads.
+
+    Args:
+        features (np.ndarray): Feature matrix (n_items, n_dimensions).
+        n_trees (int): Number of trees.
+        metric (str): Annoy distance metric.
+        n_jobs (int): Threads used to build the trees (-1 uses all cores).
+
+    Returns:
+        annoy.AnnoyIndex: The built index.
+    """
+    from annoy import AnnoyIndex
+
+    vectors = _as_float32_rows(features)
+    index = AnnoyIndex(vectors.shape[1], metric)
+    for i, vector in enumerate(vectors.tolist()):
+        index.add_item(i, vector)
+    index.build(n_trees, n_jobs=n_jobs)
+    return index
+
+
+def build_annoy_indexes(feature_sets, output_folder='.', n_trees=DEFAULT_N_TREES):
+    """
+    Builds and saves an Annoy index for every feature space.
+
+    Args:
+        feature_sets (dict): Model name (see MODEL_INDEX_FILES) -> feature matrix.
+        output_folder (str): Directory the .ann files are written to.
+        n_trees (int): Number of trees per index.
+
+    Returns:
+        dict: Model name -> built annoy.AnnoyIndex.
+    """
+    indexes = {}
+    for model_name, features in feature_sets.items():
+        start_time = time.perf_counter()
+        index = build_annoy_index(features, n_trees=n_trees)
+        build_seconds = time.perf_counter() - start_time
+        path = os.path.join(output_folder, annoy_index_file(model_name))
+        index.save(path)
+        indexes[model_name] = index
+        print(f"{model_name} index built in {build_seconds:.2f}s "
+              f"({len(features) / build_seconds:,.0f} vectors/sec) and saved to: {path}")
+    return indexes
@@ -0,0 +1,401 @@
+import importlib.machinery
+import importlib.util
+import os
+import sys
+import time
+import numpy as np
+from .exact import EXACT_INDEX_EXTENSION, ExactIndex
+from .fusion import BASE_MODALITIES, DEFAULT_OVERFETCH, fused_search
+from .id_index import SongIdIndex
+from .transforms import load_transform
+
+# Project root; it contains the voyager.py notebook export, which shadows the voyager package
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Index files written by section 6 of voyager.py, keyed by model name
+MODEL_INDEX_FILES = {
+    'audio': 'audio_features.voy',
+    'basic_image': 'basic_image_features.voy',
+    'audio_basic_image': 'audio_basic_image_features.voy',
+    'deep': 'deep_features.voy',
+    'all_image': 'all_image_features.voy',
+    'audio_deep': 'audio_deep_features.voy',
+    'all': 'all_features.voy',
+}
+
+
+def _import_voyager():
+    """
+    Imports the installed voyager package.
+
+    The voyager.py notebook export in the project root has the same name as the
+    package, so the project root is skipped when looking the package up.
+
+    Returns:
+        module: The voyager package.
+    """
+    module = sys.modules.get('voyager')
+    if module is not None and hasattr(module, 'Index'):
+        return module
+
+    search_path = [p for p in sys.path if os.path.abspath(p or os.curdir) != PROJECT_ROOT]
+    spec = importlib.machinery.PathFinder.find_spec('voyager', search_path)
+    if spec is None:
+        raise ImportError("voyager is not installed. Please install it using: pip install voyager")
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['voyager'] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules['voyager']
+        raise
+    return module
+
+
+def index_path(data_folder, model_name):
+    """
+    Returns the path of a model's saved index.
+
+    Small spaces are saved as exact indexes (.npz) instead of Voyager indexes
+    (.voy) under the same file stem; the exact index is used if it exists.
+
+    Args:
+        data_folder (str): Directory containing the index files.
+        model_name (str): Model name (see MODEL_INDEX_FILES).
+
+    Returns:
+        str: Path of the existing index file, or of the .voy file if there is none.
+    """
+    voyager_path = os.path.join(data_folder, MODEL_INDEX_FILES[model_name])
+    exact_path = os.path.splitext(voyager_path)[0] + EXACT_INDEX_EXTENSION
+    return exact_path if os.path.exists(exact_path) else voyager_path
+
+
+def load_index(path):
+    """Loads an exact (.npz) or Voyager (.voy) index, depending on the file extension."""
+    if path.endswith(EXACT_INDEX_EXTENSION):
+        return ExactIndex.load(path)
+    return _import_voyager().Index.load(path)
+
+
+def _resident_set_size():
+    """Returns the resident set size of this process in bytes, or None if it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    # Fall back to procfs on Linux
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _exclude_query_rows(closest_indices, distances, rows, k):
+    """
+    Removes each query row from its own neighbour list.
+
+    Args:
+        closest_indices (np.ndarray): Neighbour ids, one row per query.
+        distances (np.ndarray): Distances matching closest_indices.
+        rows (np.ndarray): Id of the query song for each row.
+        k (int): Number of neighbours to keep per row.
+
+    Returns:
+        tuple: (neighbour ids, distances), each of shape (len(rows), k) at most.
+    """
+    # A stable sort on the self-match flag moves the query song to the end and keeps the rest in order
+    order = np.argsort(closest_indices == rows[:, None], axis=1, kind='stable')[:, :k]
+    return (np.take_along_axis(closest_indices, order, axis=1),
+            np.take_along_axis(distances, order, axis=1))
+
+
+class RecommendationEngine:
+    """
+    Long-lived recommendation service that keeps every index resident.
+
+    The indexes are loaded from disk once when the engine is created, together
+    with the track id lookup index and the feature transforms stored next to
+    them; every query afterwards is answered from memory. The transforms let
+    tracks that are not in the indexes be embedded and queried directly.
+    """
+
+    def __init__(self, data_folder, models=None, verbose=True):
+        """
+        Args:
+            data_folder (str): Directory containing the .voy and .npz index files.
+            models (list): Model names to load. Defaults to every model in MODEL_INDEX_FILES.
+            verbose (bool): Print a line per loaded index.
+        """
+        self.data_folder = data_folder
+        self.verbose = verbose
+        self.indexes = {}
+        self.transforms = {}
+        self.load_stats = {}
+        self.id_index = SongIdIndex.load_from_folder(data_folder)
+
+        for model_name in (models or list(MODEL_INDEX_FILES)):
+            self._load_index(model_name)
+
+    def _load_index(self, model_name):
+        """Loads a single index and records how long it took and how much memory it uses."""
+        if model_name not in MODEL_INDEX_FILES:
+            raise ValueError(f"Invalid model name '{model_name}'. Choose from {list(MODEL_INDEX_FILES)}")
+
+        path = index_path(self.data_folder, model_name)
+        if not os.path.exists(path):
+            if self.verbose:
+                print(f"Warning: Index file {path} not found. Skipping {model_name} model.")
+            return
+
+        rss_before = _resident_set_size()
+        start_time = time.perf_counter()
+        index = load_index(path)
+        load_seconds = time.perf_counter() - start_time
+        rss_after = _resident_set_size()
+
+        file_bytes = os.path.getsize(path)
+        if rss_before is not None and rss_after is not None:
+            resident_bytes = max(rss_after - rss_before, 0)
+        else:
+            # The whole index is deserialized into memory, so the file size is a close estimate
+            resident_bytes = file_bytes
+
+        transform = load_transform(path)
+        if transform is not None and transform.num_dimensions != index.num_dimensions:
+            raise ValueError(f"Transform of '{model_name}' has {transform.num_dimensions} dimensions, "
+                             f"the index has {index.num_dimensions}")
+
+        self.indexes[model_name] = index
+        if transform is not None:
+            self.transforms[model_name] = transform
+        self.load_stats[model_name] = {
+            'path': path,
+            'load_seconds': load_seconds,
+            'resident_bytes': resident_bytes,
+            'file_bytes': file_bytes,
+            'num_elements': len(index),
+            'num_dimensions': index.num_dimensions,
+        }
+        if self.verbose:
+            print(f"Loaded {model_name} index from {path} in {load_seconds:.3f}s")
+
+    @property
+    def models(self):
+        """Names of the models that are loaded."""
+        return list(self.indexes)
+
+    def num_live(self, model_name):
+        """Number of items a model's index can return: its length without the deleted rows."""
+        index = self.indexes[model_name]
+        if self.id_index is None:
+            return len(index)
+        return self.id_index.num_live(len(index))
+
+    def query(self, model_name, vector, k=10, query_ef=-1):
+        """
+        Queries a resident index with a feature vector.
+
+        Args:
+            model_name (str): Model to query.
+            vector (np.ndarray): Query vector in the model's feature space.
+            k (int): Number of neighbours to return.
+            query_ef (int): Search breadth for this query (-1 uses the index default).
+
+        Returns:
+            tuple: (neighbour ids, distances)
+        """
+        if model_name not in self.indexes:
+            raise KeyError(f"Model '{model_name}' is not loaded. Loaded models: {self.models}")
+        vector = np.asarray(vector, dtype=np.float32)
+        return self.indexes[model_name].query(vector, k=k, query_ef=query_ef)
+
+    def embed(self, model_name, record):
+        """
+        Projects the raw features of a track into a model's index space in O(d).
+
+        Args:
+            model_name (str): Model whose space to embed into.
+            record (Mapping): Raw feature name -> value (e.g. a DataFrame row); deep
+                features use the names from deep_feature_columns. Missing values are imputed.
+
+        Returns:
+            np.ndarray: The float32 query vector.
+        """
+        if model_name not in self.transforms:
+            raise KeyError(f"No feature transform stored for model '{model_name}'. "
+                           f"Models with transforms: {list(self.transforms)}")
+        return self.transforms[model_name].transform_record(record)
+
+    def recommend_for_features(self, record, k=10, models=None):
+        """
+        Finds the nearest neighbours of a track that is not in the indexes.
+
+        Args:
+            record (Mapping): Raw feature name -> value of the track.
+            k (int): Number of recommendations per model.
+            models (list): Models to query. Defaults to every loaded model with a transform.
+
+        Returns:
+            dict: Model name -> (neighbour ids, distances)
+        """
+        recommendations = {}
+        for model_name in (models or list(self.transforms)):
+            recommendations[model_name] = self.query(model_name, self.embed(model_name, record), k=k)
+        return recommendations
+
+    def _fusion_weights(self, weights):
+        """Defaults to equal weights over the loaded modality indexes and checks the requested ones are loaded."""
+        if weights is None:
+            weights = {modality: 1.0 for modality in BASE_MODALITIES if modality in self.indexes}
+        missing = [modality for modality in weights if modality not in BASE_MODALITIES or modality not in self.indexes]
+        if missing:
+            raise KeyError(f"Modalities {missing} are not loaded. Fusion uses the indexes of {BASE_MODALITIES}; "
+                           f"loaded models: {self.models}")
+        return weights
+
+    def _fusion_normalizers(self, weights):
+        """Distance normalizers of the modalities with a transform: raw feature count x output scale squared."""
+        return {modality: len(self.transforms[modality]) * self.transforms[modality].output_scale ** 2
+                for modality in weights if modality in self.transforms}
+
+    def recommend_fused(self, song_index, weights=None, k=10, overfetch=DEFAULT_OVERFETCH):
+        """
+        Finds neighbours of an indexed song under per-request modality weights.
+
+        Only the per-modality indexes (audio, basic image, deep) are queried, so
+        the combined indexes do not need to be built; see fusion.fused_search.
+
+        Args:
+            song_index (int): Row position of the query song.
+            weights (dict): Modality -> weight, e.g. {'audio': 0.7, 'deep': 0.3}.
+                Defaults to equal weights for every loaded modality.
+            k (int): Number of recommendations.
+            overfetch (int): Candidates fetched per modality, as a multiple of k.
+
+        Returns:
+            tuple: (neighbour ids, fused distances), excluding the query song.
+        """
+        weights = self._fusion_weights(weights)
+        query_vectors = {modality: self.indexes[modality].get_vector(song_index) for modality in weights}
+        return fused_search(self.indexes, query_vectors, weights, k=k, overfetch=overfetch, exclude=song_index,
+                            normalizers=self._fusion_normalizers(weights),
+                            live_counts={modality: self.num_live(modality) for modality in weights})
+
+    def recommend_fused_for_features(self, record, weights=None, k=10, overfetch=DEFAULT_OVERFETCH):
+        """
+        Finds neighbours of a track that is not in the indexes under per-request modality weights.
+
+        Args:
+            record (Mapping): Raw feature name -> value of the track.
+            weights (dict): Modality -> weight. Defaults to equal weights for every loaded modality.
+            k (int): Number of recommendations.
+            overfetch (int): Candidates fetched per modality, as a multiple of k.
+
+        Returns:
+            tuple: (neighbour ids, fused distances)
+        """
+        weights = self._fusion_weights(weights)
+        query_vectors = {modality: self.embed(modality, record) for modality in weights}
+        return fused_search(self.indexes, query_vectors, weights, k=k, overfetch=overfetch,
+                            normalizers=self._fusion_normalizers(weights),
+                            live_counts={modality: self.num_live(modality) for modality in weights})
+
+    def resolve(self, song_id):
+        """Returns the row position of a track id, or None if it is not indexed."""
+        if self.id_index is None:
+            raise RuntimeError(f"No track id index found in {self.data_folder}")
+        return self.id_index.resolve(song_id)
+
+    def recommend(self, song_index, num_recommendations=10, models=None):
+        """
+        Finds the nearest neighbours of an indexed song in every loaded model.
+
+        The query vector is read back from the index, so no feature matrices
+        need to be kept around next to the engine.
+
+        Args:
+            song_index (int): Row position of the query song (its id in the indexes).
+            num_recommendations (int): Number of recommendations per model.
+            models (list): Models to query. Defaults to every loaded model.
+
+        Returns:
+            dict: Model name -> (neighbour ids, distances), excluding the query song.
+        """
+        recommendations = {}
+        for model_name in (models or self.models):
+            index = self.indexes[model_name]
+            closest_indices, distances = index.query(
+                index.get_vector(song_index), k=min(num_recommendations + 1, self.num_live(model_name)))
+            # Remove the query song itself
+            mask = closest_indices != song_index
+            recommendations[model_name] = (closest_indices[mask][:num_recommendations],
+                                           distances[mask][:num_recommendations])
+        return recommendations
+
+    def recommend_batch(self, song_ids, k=10, models=None, num_threads=-1):
+        """
+        Finds the nearest neighbours of many songs with one batched query per model.
+
+        Each model receives a single 2-D query matrix, which its index searches
+        on `num_threads` threads.
+
+        Args:
+            song_ids (array-like): Spotify track ids of the query songs.
+            k (int): Number of recommendations per song.
+            models (list): Models to query. Defaults to every loaded model.
+            num_threads (int): Threads used by each query (-1 uses all cores).
+
+        Returns:
+            dict: 'song_ids' and 'rows' of the resolved query songs, 'missing' ids
+                that are not indexed, and per model 'indices' and 'distances'
+                arrays of shape (len(rows), k) with the query songs excluded (fewer
+                columns if the index has no more than k live tracks).
+        """
+        if self.id_index is None:
+            raise RuntimeError(f"No track id index found in {self.data_folder}")
+
+        song_ids = np.asarray(song_ids).astype(str)
+        rows = self.id_index.resolve_many(song_ids)
+        found = rows >= 0
+        rows = rows[found]
+
+        batch = {
+            'song_ids': song_ids[found],
+            'rows': rows,
+            'missing': song_ids[~found].tolist(),
+            'indices': {},
+            'distances': {},
+        }
+        if len(rows) == 0:
+            return batch
+
+        for model_name in (models or self.models):
+            index = self.indexes[model_name]
+            query_vectors = index.get_vectors(rows)
+            # One extra neighbour for the query song itself, within the tracks that are not deleted
+            num_neighbours = min(k + 1, self.num_live(model_name))
+            closest_indices, distances = index.query(query_vectors, k=num_neighbours, num_threads=num_threads)
+            closest_indices, distances = _exclude_query_rows(
+                closest_indices.astype(np.int64), distances, rows, min(k, num_neighbours - 1))
+            batch['indices'][model_name] = closest_indices
+            batch['distances'][model_name] = distances
+        return batch
+
+    def report(self):
+        """Prints load time and resident memory for every loaded index."""
+        print("\n===== RECOMMENDATION ENGINE =====")
+        total_seconds = 0.0
+        total_bytes = 0
+        for model_name, stats in self.load_stats.items():
+            total_seconds += stats['load_seconds']
+            total_bytes += stats['resident_bytes']
+            print(f"{model_name:<20} {stats['num_elements']:>9,} x {stats['num_dimensions']:<5} "
+                  f"load {stats['load_seconds']:7.3f}s  memory {stats['resident_bytes'] / 2**20:9.1f} MiB")
+        print(f"{'total':<20} {'':>17} load {total_seconds:7.3f}s  memory {total_bytes / 2**20:9.1f} MiB")
+        print("=================================\n")
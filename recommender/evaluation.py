@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def recall_at_k(approximate_ids, exact_ids, k=None):
+    """
+    Fraction of the exact k nearest neighbours that an approximate search returned.
+
+    Args:
+        approximate_ids (np.ndarray): (n, >=k) neighbour ids returned by the index under test.
+        exact_ids (np.ndarray): (n, >=k) exact neighbour ids, nearest first.
+        k (int): Neighbours compared per query. Defaults to the width of exact_ids.
+
+    Returns:
+        float: Mean recall@k over the queries.
+    """
+    approximate_ids = np.atleast_2d(approximate_ids)
+    exact_ids = np.atleast_2d(exact_ids)
+    k = k or exact_ids.shape[1]
+    if len(approximate_ids) != len(exact_ids):
+        raise ValueError(f"Got {len(approximate_ids)} approximate and {len(exact_ids)} exact result rows")
+    if len(exact_ids) == 0:
+        return float('nan')
+
+    # Compare every approximate id with every exact id of the same query at once
+    matches = (approximate_ids[:, :k, None] == exact_ids[:, None, :k]).any(axis=1)
+    return float(matches.sum(axis=1).mean() / k)
@@ -0,0 +1,221 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# File extension of saved exact indexes (a .voy file holds a Voyager index instead)
+EXACT_INDEX_EXTENSION = '.npz'
+
+# Spaces with at most this many stored floats (dimensions x items) are built as exact indexes
+EXACT_MAX_ELEMENTS = 10_000_000
+
+# Upper bound on the distance matrix entries computed per query block (64M floats = 256 MB)
+DISTANCE_BLOCK_ELEMENTS = 2 ** 26
+
+SPACES = ('euclidean', 'cosine')
+
+
+def use_exact_index(num_items, num_dimensions, max_elements=EXACT_MAX_ELEMENTS):
+    """True if a space is small enough for exact search to be cheaper than building a graph."""
+    return num_items * num_dimensions <= max_elements
+
+
+class ExactIndex:
+    """
+    Exact k-nearest-neighbour index on dense matrix products.
+
+    Has the query interface of a Voyager index, so the engine can use either.
+    Distances for a block of queries come from one matrix product with the
+    stored vectors: squared Euclidean distances as |q|^2 - 2 q.x + |x|^2 (as
+    Voyager's Euclidean space reports them) or cosine distances 1 - q.x on
+    normalised vectors. The top k of every row is selected with argpartition
+    and only those k are sorted. Query blocks are sized so their distance
+    matrix stays below DISTANCE_BLOCK_ELEMENTS entries.
+    """
+
+    def __init__(self, num_dimensions, space='euclidean'):
+        """
+        Args:
+            num_dimensions (int): Vector length.
+            space (str): 'euclidean' (squared L2 distances) or 'cosine'.
+        """
+        if space not in SPACES:
+            raise ValueError(f"Invalid space '{space}'. Choose from {list(SPACES)}")
+        self.num_dimensions = num_dimensions
+        self.space = space
+        self._vectors = np.empty((0, num_dimensions), dtype=np.float32)
+        self._squared_norms = np.empty(0, dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._deleted = np.empty(0, dtype=bool)
+        self._id_positions = pd.Index(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, item_id):
+        return item_id in self._id_positions
+
+    @property
+    def ids(self):
+        """np.ndarray: Ids of the stored items, in insertion order."""
+        return self._ids
+
+    def _positions(self, ids):
+        positions = self._id_positions.get_indexer(np.asarray(ids, dtype=np.int64))
+        if (positions < 0).any():
+            raise KeyError(f"Unknown ids: {np.asarray(ids)[positions < 0][:5].tolist()}")
+        return positions
+
+    def _prepare(self, vectors):
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+        if vectors.shape[1] != self.num_dimensions:
+            raise ValueError(f"Expected vectors with {self.num_dimensions} dimensions, got {vectors.shape[1]}")
+        if self.space == 'cosine':
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1)
+        return vectors
+
+    def add_items(self, vectors, ids=None, num_threads=-1):
+        """
+        Adds vectors to the index.
+
+        Args:
+            vectors (np.ndarray): (n, num_dimensions) vectors.
+            ids (array-like): Item ids. Defaults to consecutive ids after the largest stored id.
+            num_threads (int): Accepted for compatibility with Voyager; adding is a single copy.
+
+        Returns:
+            np.ndarray: The ids of the added items.
+        """
+        vectors = self._prepare(vectors)
+        if ids is None:
+            start = int(self._ids.max()) + 1 if len(self._ids) else 0
+            ids = np.arange(start, start + len(vectors))
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(ids)} ids for {len(vectors)} vectors")
+        if self._id_positions.isin(ids).any() or pd.Index(ids).has_duplicates:
+            raise ValueError("Item ids must be unique")
+
+        self._vectors = np.concatenate([self._vectors, vectors])
+        self._squared_norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+        self._ids = np.concatenate([self._ids, ids])
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(ids), dtype=bool)])
+        self._id_positions = pd.Index(self._ids)
+        return ids
+
+    def mark_deleted(self, item_id):
+        """Excludes an item from query results."""
+        position = self._positions([item_id])[0]
+        if self._deleted[position]:
+            raise RuntimeError(f"Item {item_id} is already marked as deleted")
+        self._deleted[position] = True
+
+    def unmark_deleted(self, item_id):
+        """Includes a deleted item in query results again."""
+        self._deleted[self._positions([item_id])[0]] = False
+
+    def get_vector(self, item_id):
+        """Returns the stored vector of an item (normalised in the cosine space)."""
+        return self._vectors[self._positions([item_id])[0]].copy()
+
+    def get_vectors(self, ids):
+        """Returns the stored vectors of many items as an (n, num_dimensions) array."""
+        return self._vectors[self._positions(ids)]
+
+    def get_distance(self, a, b):
+        """Returns the distance between two vectors in this index's space."""
+        a, b = self._prepare(np.vstack([a, b]))
+        if self.space == 'cosine':
+            return float(1 - a @ b)
+        return float(np.sum((a - b) ** 2))
+
+    def _query_block(self, queries, k):
+        """Exact top-k ids and distances of a block of prepared queries."""
+        # The product matrix is turned into distances in place, without temporaries of its size
+        distances = queries @ self._vectors.T
+        if self.space == 'cosine':
+            np.subtract(1, distances, out=distances)
+        else:
+            distances *= -2
+            distances += self._squared_norms[None, :]
+            distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+            np.maximum(distances, 0, out=distances)
+        distances[:, self._deleted] = np.inf
+
+        if k < distances.shape[1]:
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=1, kind='stable')
+        positions = np.take_along_axis(candidates, order, axis=1)
+        return self._ids[positions], np.take_along_axis(candidate_distances, order, axis=1)
+
+    def query(self, vectors, k=1, num_threads=-1, query_ef=-1):
+        """
+        Finds the exact nearest neighbours of one or more vectors.
+
+        Args:
+            vectors (np.ndarray): (num_dimensions,) vector or (n, num_dimensions) matrix.
+            k (int): Number of neighbours to return.
+            num_threads (int): Threads working on separate query blocks (-1 uses all cores).
+            query_ef (int): Ignored; accepted for compatibility with Voyager.
+
+        Returns:
+            tuple: (ids, distances) of shape (k,) for one vector or (n, k) for a matrix.
+        """
+        single = np.ndim(vectors) == 1
+        queries = self._prepare(vectors)
+        num_live = int((~self._deleted).sum())
+        if k > num_live:
+            raise ValueError(f"Requested {k} neighbours but the index has {num_live} items")
+
+        num_threads = (os.cpu_count() or 1) if num_threads in (None, -1) else max(1, num_threads)
+        block_rows = max(1, DISTANCE_BLOCK_ELEMENTS // max(len(self._ids), 1) // num_threads)
+        blocks = [queries[start:start + block_rows] for start in range(0, len(queries), block_rows)]
+        if len(blocks) > 1 and num_threads > 1:
+            # numpy releases the GIL inside the matrix product, so blocks run in parallel
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:
+                results = list(executor.map(lambda block: self._query_block(block, k), blocks))
+        else:
+            results = [self._query_block(block, k) for block in blocks]
+
+        ids = np.concatenate([block_ids for block_ids, _ in results])
+        distances = np.concatenate([block_distances for _, block_distances in results]).astype(np.float32)
+        if single:
+            return ids[0], distances[0]
+        return ids, distances
+
+    def save(self, path):
+        """Saves the index to a .npz file (written to `path` exactly, without adding an extension)."""
+        with open(path, 'wb') as f:
+            np.savez(f, vectors=self._vectors, ids=self._ids, deleted=self._deleted, space=np.array(self.space))
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(data['vectors'].shape[1], space=str(data['space']))
+            index._vectors = data['vectors']
+            index._ids = data['ids']
+            index._deleted = data['deleted']
+        index._squared_norms = np.einsum('ij,ij->i', index._vectors, index._vectors)
+        index._id_positions = pd.Index(index._ids)
+        return index
+
+
+def build_exact_index(features, space='euclidean'):
+    """
+    Builds an exact index with row positions as item ids.
+
+    Args:
+        features (np.ndarray): Feature matrix (n_items, n_dimensions).
+        space (str): 'euclidean' or 'cosine'.
+
+    Returns:
+        ExactIndex: The index.
+    """
+    index = ExactIndex(features.shape[1], space=space)
+    index.add_items(features, ids=np.arange(len(features)))
+    return index
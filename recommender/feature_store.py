@@ -0,0 +1,207 @@
+import os
+import json
+import pickle
+import numpy as np
+from numpy.lib.format import open_memmap
+
+# Files inside a feature store directory
+FEATURES_FILE = 'features.npy'
+ROW_IDS_FILE = 'row_ids.npy'
+METADATA_FILE = 'metadata.json'
+
+
+def default_store_path(features_pickle_path):
+    """Returns the feature store path used for a features pickle (x.pkl -> x.features)."""
+    base, _ = os.path.splitext(features_pickle_path)
+    return f"{base}.features"
+
+
+def _write_store(store_path, row_ids, fill_features, num_dimensions, metadata=None):
+    """
+    Writes a feature store, streaming the features into a memory-mapped .npy file.
+
+    Args:
+        store_path (str): Feature store directory.
+        row_ids (np.ndarray): Sorted row ids, one per feature row.
+        fill_features (callable): Called with the writable (n, d) float32 memmap.
+        num_dimensions (int): Feature vector length.
+        metadata (dict): Extra metadata saved with the store.
+    """
+    os.makedirs(store_path, exist_ok=True)
+    features_path = os.path.join(store_path, FEATURES_FILE)
+    row_ids_path = os.path.join(store_path, ROW_IDS_FILE)
+
+    # Files are written next to their final name and moved into place once complete
+    features = open_memmap(features_path + '.tmp', mode='w+', dtype=np.float32,
+                           shape=(len(row_ids), num_dimensions))
+    fill_features(features)
+    features.flush()
+    del features
+    os.replace(features_path + '.tmp', features_path)
+
+    with open(row_ids_path + '.tmp', 'wb') as f:
+        np.save(f, np.asarray(row_ids, dtype=np.int64))
+    os.replace(row_ids_path + '.tmp', row_ids_path)
+
+    with open(os.path.join(store_path, METADATA_FILE), 'w') as f:
+        json.dump({'num_rows': len(row_ids), 'num_dimensions': num_dimensions, **(metadata or {})}, f, indent=4)
+
+
+def save_feature_store(store_path, features, row_ids, metadata=None):
+    """
+    Saves a dense feature matrix and its row ids as a feature store.
+
+    Args:
+        store_path (str): Feature store directory.
+        features (np.ndarray): Feature matrix (n_rows, n_dimensions).
+        row_ids (array-like): Row id (original DataFrame index) of each feature row.
+        metadata (dict): Extra metadata saved with the store.
+    """
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    order = np.argsort(row_ids, kind='stable')
+
+    def fill_features(out):
+        out[:] = np.asarray(features, dtype=np.float32)[order]
+
+    _write_store(store_path, row_ids[order], fill_features, np.shape(features)[1], metadata)
+
+
+def save_features_dict(features_dict, store_path, metadata=None):
+    """
+    Saves a {row id: feature vector} dictionary as a feature store.
+
+    Vectors whose length differs from the first vector are skipped.
+
+    Args:
+        features_dict (dict): Row id -> feature vector, as written by extract_cnn.
+        store_path (str): Feature store directory.
+        metadata (dict): Extra metadata saved with the store.
+
+    Returns:
+        list: Row ids that were skipped because of a shape mismatch.
+    """
+    if not features_dict:
+        raise ValueError("Cannot create a feature store from an empty features dictionary")
+
+    expected_shape = np.shape(next(iter(features_dict.values())))
+    skipped = [row_id for row_id, feature in features_dict.items() if np.shape(feature) != expected_shape]
+    if skipped:
+        print(f"Warning: Skipping {len(skipped)} feature vectors that do not have shape {expected_shape}")
+    skipped_set = set(skipped)
+    row_ids = np.array(sorted(row_id for row_id in features_dict if row_id not in skipped_set), dtype=np.int64)
+
+    def fill_features(out):
+        for position, row_id in enumerate(row_ids):
+            out[position] = features_dict[row_id]
+
+    _write_store(store_path, row_ids, fill_features, int(np.prod(expected_shape)), metadata)
+    return skipped
+
+
+def convert_pickle_to_feature_store(pickle_path, store_path=None):
+    """
+    Converts a features pickle written by extract_cnn into a feature store.
+
+    Args:
+        pickle_path (str): Path to the pickled {row id: feature vector} dictionary.
+        store_path (str): Feature store directory. If None, uses default_store_path.
+
+    Returns:
+        str: Path of the feature store.
+    """
+    if store_path is None:
+        store_path = default_store_path(pickle_path)
+
+    with open(pickle_path, 'rb') as f:
+        features_dict = pickle.load(f)
+    print(f"Loaded features for {len(features_dict)} songs from {pickle_path}")
+
+    save_features_dict(features_dict, store_path, metadata={'source': os.path.basename(pickle_path)})
+    print(f"Feature store saved to {store_path}")
+    return store_path
+
+
+class FeatureStore:
+    """
+    Dense float32 feature matrix with a parallel array of row ids.
+
+    The matrix is memory-mapped by default, so slicing a subset of rows only
+    reads those rows from disk.
+    """
+
+    def __init__(self, features, row_ids, metadata=None):
+        self.features = features
+        self.row_ids = row_ids
+        self.metadata = metadata or {}
+
+    @classmethod
+    def open(cls, store_path, mmap_mode='r'):
+        """
+        Opens a feature store.
+
+        Args:
+            store_path (str): Feature store directory.
+            mmap_mode (str): Memory-map mode for the feature matrix, or None to read it into memory.
+
+        Returns:
+            FeatureStore: The opened store.
+        """
+        features = np.load(os.path.join(store_path, FEATURES_FILE), mmap_mode=mmap_mode)
+        row_ids = np.load(os.path.join(store_path, ROW_IDS_FILE))
+        metadata_path = os.path.join(store_path, METADATA_FILE)
+        metadata = None
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+        return cls(features, row_ids, metadata)
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @property
+    def num_dimensions(self):
+        return self.features.shape[1]
+
+    def positions(self, row_ids):
+        """
+        Finds the matrix positions of row ids.
+
+        Args:
+            row_ids (array-like): Row ids to look up.
+
+        Returns:
+            np.ndarray: Matrix positions, -1 where a row id is not in the store.
+        """
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        positions = np.searchsorted(self.row_ids, row_ids)
+        found = positions < len(self.row_ids)
+        found[found] = self.row_ids[positions[found]] == row_ids[found]
+        return np.where(found, positions, -1)
+
+    def get(self, row_ids):
+        """
+        Reads the feature vectors of the given row ids.
+
+        Args:
+            row_ids (array-like): Row ids to read; all of them must be in the store.
+
+        Returns:
+            np.ndarray: Feature matrix (len(row_ids), num_dimensions).
+        """
+        positions = self.positions(row_ids)
+        if (positions < 0).any():
+            missing = np.asarray(row_ids)[positions < 0]
+            raise KeyError(f"{len(missing)} row ids are not in the feature store, e.g. {missing[:5].tolist()}")
+        return np.asarray(self.features[positions])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert a features pickle into a memory-mappable feature store')
+    parser.add_argument('--pickle', required=True, help='Path to the features pickle written by extract_cnn')
+    parser.add_argument('--output', help='Path to the feature store directory (default: <pickle name>.features)')
+
+    args = parser.parse_args()
+
+    convert_pickle_to_feature_store(args.pickle, args.output)
@@ -0,0 +1,94 @@
+import numpy as np
+
+# Spotify audio features, in the column order of the audio index space
+AUDIO_COLUMNS = ['danceability', 'energy', 'loudness', 'speechiness', 'acousticness',
+                 'instrumentalness', 'liveness', 'valence', 'tempo']
+
+# Colour features from addBasicImagefeatures.py, in the column order of the basic image index space
+BASIC_IMAGE_COLUMNS = ['single_pixel_color_r', 'single_pixel_color_g', 'single_pixel_color_b',
+                       'weighted_average_color_r', 'weighted_average_color_g', 'weighted_average_color_b',
+                       'most_vibrant_color_r', 'most_vibrant_color_g', 'most_vibrant_color_b']
+
+# Feature blocks each index space concatenates, in dimension order (see MODEL_INDEX_FILES)
+SPACE_BLOCKS = {
+    'audio': ['audio'],
+    'basic_image': ['basic_image'],
+    'audio_basic_image': ['audio', 'basic_image'],
+    'deep': ['deep'],
+    'all_image': ['basic_image', 'deep'],
+    'audio_deep': ['audio', 'deep'],
+    'all': ['audio', 'basic_image', 'deep'],
+}
+
+
+def feature_block(df, columns, out=None):
+    """
+    Copies DataFrame columns into a C-contiguous float32 block.
+
+    Every column is converted straight into its slot of the block, without
+    per-row lookups or intermediate arrays; missing values become NaN.
+
+    Args:
+        df (pd.DataFrame): Source data.
+        columns (list): Columns to select, in order.
+        out (np.ndarray): Optional (len(df), len(columns)) float32 array (or view) to fill.
+
+    Returns:
+        np.ndarray: The filled block.
+    """
+    if out is None:
+        out = np.empty((len(df), len(columns)), dtype=np.float32)
+    for position, column in enumerate(columns):
+        out[:, position] = df[column].to_numpy(dtype=np.float32, na_value=np.nan)
+    return out
+
+
+def impute_non_finite(block, fill_values=None):
+    """
+    Replaces NaN and +/-inf values in place, in one vectorized pass.
+
+    Args:
+        block (np.ndarray): (n, d) feature block, modified in place.
+        fill_values (np.ndarray): Value per column. If None, the mean of the finite
+            values of each column is used (0 for columns without any).
+
+    Returns:
+        np.ndarray: The (d,) fill values used.
+    """
+    finite = np.isfinite(block)
+    if fill_values is None:
+        counts = finite.sum(axis=0)
+        sums = np.where(finite, block, 0).sum(axis=0, dtype=np.float64)
+        fill_values = np.divide(sums, counts, out=np.zeros(block.shape[1]), where=counts > 0)
+    if not finite.all():
+        np.copyto(block, np.broadcast_to(np.asarray(fill_values, dtype=block.dtype), block.shape), where=~finite)
+    return fill_values
+
+
+def assemble_features(df, spaces):
+    """
+    Assembles the feature blocks of several index spaces in one allocation.
+
+    The columns of all spaces are written side by side into one C-contiguous
+    float32 matrix whose non-finite values are replaced by column means. The
+    blocks of the individual spaces are views into that matrix, so spaces that
+    are adjacent in `spaces` can also be used together without concatenating.
+
+    Args:
+        df (pd.DataFrame): Source data.
+        spaces (dict): Space name -> list of columns, in the order they are laid out.
+
+    Returns:
+        tuple: (matrix (n, total columns), dict of space name -> (n, d) view)
+    """
+    num_columns = sum(len(columns) for columns in spaces.values())
+    matrix = np.empty((len(df), num_columns), dtype=np.float32)
+
+    blocks = {}
+    start = 0
+    for name, columns in spaces.items():
+        blocks[name] = feature_block(df, columns, out=matrix[:, start:start + len(columns)])
+        start += len(columns)
+
+    impute_non_finite(matrix)
+    return matrix, blocks
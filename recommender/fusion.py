@@ -0,0 +1,79 @@
+import numpy as np
+
+# Per-modality indexes that fused queries combine; the other spaces are concatenations of these
+BASE_MODALITIES = ['audio', 'basic_image', 'deep']
+
+# Candidates fetched from each modality index per requested neighbour
+DEFAULT_OVERFETCH = 10
+
+
+def _normalized_weights(weights, modalities):
+    """Validates the modality weights and drops modalities with weight 0."""
+    if weights is None:
+        weights = {modality: 1.0 for modality in modalities}
+    unknown = [modality for modality in weights if modality not in modalities]
+    if unknown:
+        raise KeyError(f"No query vector for modalities {unknown}. Available modalities: {list(modalities)}")
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("Modality weights must not be negative")
+    weights = {modality: float(weight) for modality, weight in weights.items() if weight > 0}
+    if not weights:
+        raise ValueError("At least one modality needs a positive weight")
+    return weights
+
+
+def fused_search(indexes, query_vectors, weights=None, k=10, overfetch=DEFAULT_OVERFETCH, exclude=None,
+                 normalizers=None, live_counts=None):
+    """
+    Nearest neighbours under a weighted combination of per-modality distances.
+
+    Every modality index with a positive weight is queried for k x overfetch
+    candidates. The union of the candidates is then re-ranked exactly with the
+    vectors stored in the indexes:
+
+        fused distance = sum over modalities of weight * squared distance / dimensions
+
+    Dividing by the dimensions makes a 1280-dimension deep block and a
+    9-dimension audio block contribute on the same scale, so the weights alone
+    set the audio/visual balance, per request and without rebuilding indexes.
+
+    Args:
+        indexes (dict): Modality name -> index (Voyager or exact) of that modality alone.
+        query_vectors (dict): Modality name -> query vector in that modality's space.
+        weights (dict): Modality name -> non-negative weight. Defaults to equal weights
+            for every modality in query_vectors.
+        k (int): Number of neighbours to return.
+        overfetch (int): Candidates fetched per modality, as a multiple of k.
+        exclude (int): Optional item id left out of the results (e.g. the query song).
+        normalizers (dict): Modality name -> value its squared distances are divided by.
+            Defaults to the index dimensions. A reduced space passes its number of raw
+            features, since its projection keeps the distances of the full space, times
+            the square of any storage calibration scale.
+        live_counts (dict): Modality name -> number of items that are not deleted, which caps
+            the candidates fetched. Defaults to the index lengths.
+
+    Returns:
+        tuple: (neighbour ids, fused distances), nearest first.
+    """
+    weights = _normalized_weights(weights, query_vectors)
+    num_wanted = k + (exclude is not None)
+
+    candidates = []
+    for modality in weights:
+        index = indexes[modality]
+        num_candidates = min(num_wanted * overfetch, (live_counts or {}).get(modality, len(index)))
+        ids, _ = index.query(np.asarray(query_vectors[modality], dtype=np.float32), k=num_candidates)
+        candidates.append(np.asarray(ids, dtype=np.int64))
+    candidates = np.unique(np.concatenate(candidates))
+    if exclude is not None:
+        candidates = candidates[candidates != exclude]
+
+    fused = np.zeros(len(candidates))
+    for modality, weight in weights.items():
+        vectors = np.asarray(indexes[modality].get_vectors(candidates), dtype=np.float32)
+        difference = vectors - np.asarray(query_vectors[modality], dtype=np.float32)
+        normalizer = (normalizers or {}).get(modality, vectors.shape[1])
+        fused += weight * np.einsum('ij,ij->i', difference, difference) / normalizer
+
+    order = np.argsort(fused, kind='stable')[:k]
+    return candidates[order], fused[order].astype(np.float32)
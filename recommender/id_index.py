@@ -0,0 +1,123 @@
+import os
+import numpy as np
+import pandas as pd
+
+# File written next to the .voy/.ann indexes
+SONG_ID_INDEX_FILE = 'song_ids.npy'
+
+# Row positions of tracks that were removed from the indexes, written next to SONG_ID_INDEX_FILE
+DELETED_ROWS_FILE = 'deleted_rows.npy'
+
+
+def _save_npy_atomically(path, array):
+    """Writes a .npy file next to its final name and moves it into place once complete."""
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(path + '.tmp', path)
+
+
+class SongIdIndex:
+    """
+    Hash index from Spotify track id to row position in the indexed DataFrame.
+
+    Row positions are the item ids used in the Voyager and Annoy indexes. When a
+    track id appears more than once, the first row wins so that lookups are
+    deterministic; every position of a duplicated id is kept in `duplicates`.
+    Deleted rows keep their position (ids are never reused) but no longer resolve.
+    """
+
+    def __init__(self, song_ids, deleted_rows=None):
+        """
+        Args:
+            song_ids (array-like): Track ids in row order (e.g. df['id']).
+            deleted_rows (array-like): Row positions of deleted tracks.
+        """
+        self.song_ids = np.asarray(song_ids).astype(str)
+        self.deleted_rows = np.unique(np.asarray([] if deleted_rows is None else deleted_rows, dtype=np.int64))
+
+        live = np.ones(len(self.song_ids), dtype=bool)
+        live[self.deleted_rows] = False
+        live_positions = np.flatnonzero(live)
+        first_occurrence = ~pd.Index(self.song_ids[live_positions]).duplicated(keep='first')
+        self._first_positions = live_positions[first_occurrence]
+        self._unique_ids = pd.Index(self.song_ids[self._first_positions])
+        self._positions = dict(zip(self._unique_ids, self._first_positions.tolist()))
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def num_live(self, num_rows=None):
+        """
+        Number of rows that are not deleted, i.e. the items a query can return.
+
+        Args:
+            num_rows (int): Only count the first num_rows rows (e.g. the length of an index).
+                Defaults to every row.
+
+        Returns:
+            int: The live row count.
+        """
+        num_rows = len(self.song_ids) if num_rows is None else num_rows
+        return num_rows - int(np.count_nonzero(self.deleted_rows < num_rows))
+
+    def __contains__(self, song_id):
+        return song_id in self._positions
+
+    @property
+    def duplicates(self):
+        """dict: Track id -> all row positions, for ids that appear more than once."""
+        ids = pd.Series(np.arange(len(self.song_ids)), index=self.song_ids)
+        duplicated = ids[ids.index.duplicated(keep=False)]
+        return {song_id: positions.to_numpy() for song_id, positions in duplicated.groupby(level=0)}
+
+    def resolve(self, song_id):
+        """
+        Resolves a single track id.
+
+        Args:
+            song_id (str): Spotify track id.
+
+        Returns:
+            int: Row position, or None if the id is not indexed.
+        """
+        return self._positions.get(song_id)
+
+    def resolve_many(self, song_ids):
+        """
+        Resolves many track ids in one vectorized lookup.
+
+        Args:
+            song_ids (array-like): Spotify track ids.
+
+        Returns:
+            np.ndarray: Row positions, -1 where an id is not indexed.
+        """
+        unique_positions = self._unique_ids.get_indexer(np.asarray(song_ids).astype(str))
+        if len(self._first_positions) == 0:
+            return np.full(len(unique_positions), -1, dtype=np.intp)
+        return np.where(unique_positions >= 0, self._first_positions[unique_positions], -1)
+
+    def save(self, path):
+        """Saves the ids in row order as a .npy file."""
+        np.save(path, self.song_ids)
+
+    def save_to_folder(self, data_folder):
+        """Saves the ids and the deleted rows next to the indexes in `data_folder`, each atomically."""
+        _save_npy_atomically(os.path.join(data_folder, SONG_ID_INDEX_FILE), self.song_ids)
+        _save_npy_atomically(os.path.join(data_folder, DELETED_ROWS_FILE), self.deleted_rows)
+
+    @classmethod
+    def load(cls, path, deleted_rows_path=None):
+        """Loads an index saved with `save`, and optionally its deleted rows."""
+        deleted_rows = None
+        if deleted_rows_path is not None and os.path.exists(deleted_rows_path):
+            deleted_rows = np.load(deleted_rows_path, allow_pickle=False)
+        return cls(np.load(path, allow_pickle=False), deleted_rows)
+
+    @classmethod
+    def load_from_folder(cls, data_folder):
+        """Loads the index stored next to the indexes in `data_folder`, or returns None if there is none."""
+        path = os.path.join(data_folder, SONG_ID_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        return cls.load(path, os.path.join(data_folder, DELETED_ROWS_FILE))
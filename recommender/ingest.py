@@ -0,0 +1,155 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from .engine import MODEL_INDEX_FILES, index_path, load_index
+from .id_index import SongIdIndex
+from .transforms import deep_feature_columns, load_transform
+
+
+def _save_index_atomically(index, path):
+    """Saves an index next to its final name and moves it into place once complete."""
+    tmp_path = path + '.tmp'
+    index.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _raw_feature_frame(tracks, deep_features=None):
+    """Raw features of the new tracks, with deep features as deep_<i> columns."""
+    if deep_features is None:
+        return tracks.reset_index(drop=True)
+    deep_features = np.asarray(deep_features)
+    if len(deep_features) != len(tracks):
+        raise ValueError(f"Got {len(deep_features)} deep feature rows for {len(tracks)} tracks")
+    deep_frame = pd.DataFrame(deep_features, columns=deep_feature_columns(deep_features.shape[1]))
+    return pd.concat([tracks.reset_index(drop=True), deep_frame], axis=1)
+
+
+def ingest_tracks(data_folder, tracks, deep_features=None, deleted_song_ids=(), models=None, num_threads=-1):
+    """
+    Adds new tracks to the saved indexes and removes deleted ones, without rebuilding.
+
+    New tracks get the next free row positions as ids, so the ids of indexed
+    tracks never change, and their raw features are embedded with the
+    transform stored next to each index. Deleted tracks are marked deleted in
+    every index, which excludes them from query results, and recorded so they
+    no longer resolve. Tracks that are already indexed are skipped. Every file
+    is replaced atomically; the indexes are written before the track ids, and
+    ids an interrupted ingest left in an index without a track id are marked
+    deleted by the next one. The cost is proportional to the delta.
+
+    Args:
+        data_folder (str): Directory with the .voy/.npz files, their transforms and the track id index.
+        tracks (pd.DataFrame): New tracks with an 'id' column and their raw feature columns.
+        deep_features (np.ndarray): Optional deep features of the tracks, one row per track.
+        deleted_song_ids (iterable): Track ids to remove.
+        models (list): Models to update. Defaults to every model with a saved index.
+        num_threads (int): Threads used to insert the vectors (-1 uses all cores).
+
+    Returns:
+        dict: Number of added, skipped and deleted tracks, seconds, and per model statistics.
+    """
+    start_time = time.perf_counter()
+
+    id_index = SongIdIndex.load_from_folder(data_folder)
+    if id_index is None:
+        raise FileNotFoundError(f"No track id index found in {data_folder}")
+
+    if models is None:
+        models = [model_name for model_name in MODEL_INDEX_FILES
+                  if os.path.exists(index_path(data_folder, model_name))]
+    for model_name in models:
+        if model_name not in MODEL_INDEX_FILES:
+            raise ValueError(f"Invalid model name '{model_name}'. Choose from {list(MODEL_INDEX_FILES)}")
+
+    # Tracks that are already indexed, or repeated within the delta, are not added again
+    song_ids = tracks['id'].astype(str).to_numpy()
+    is_new = (id_index.resolve_many(song_ids) < 0) & ~pd.Index(song_ids).duplicated(keep='first')
+    raw_features = _raw_feature_frame(tracks, deep_features)[is_new].reset_index(drop=True)
+    new_song_ids = song_ids[is_new]
+
+    deleted_rows = id_index.resolve_many(np.asarray(list(deleted_song_ids), dtype=str))
+    deleted_rows = deleted_rows[deleted_rows >= 0]
+
+    # Embed before touching any file, so a missing transform or feature fails without side effects
+    indexes = {}
+    vectors = {}
+    for model_name in models:
+        path = index_path(data_folder, model_name)
+        transform = load_transform(path)
+        if transform is None:
+            raise FileNotFoundError(f"No feature transform stored for '{model_name}'; rebuild its index with transforms")
+        missing_columns = [column for column in transform.columns if column not in raw_features.columns]
+        if missing_columns:
+            raise ValueError(f"Tracks are missing {len(missing_columns)} features of '{model_name}', "
+                             f"e.g. {missing_columns[:3]}")
+        vectors[model_name] = transform.transform(
+            raw_features[transform.columns].to_numpy(dtype=np.float64, na_value=np.nan).reshape(-1, len(transform)))
+        indexes[model_name] = load_index(path)
+
+    # Ids past the track id index were written by an interrupted ingest; they are skipped and deleted
+    next_row = max([len(id_index)] + [len(index) for index in indexes.values()])
+    orphan_rows = np.arange(len(id_index), next_row)
+    new_rows = np.arange(next_row, next_row + len(new_song_ids))
+
+    model_stats = {}
+    for model_name, index in indexes.items():
+        model_start = time.perf_counter()
+        if len(new_rows):
+            index.add_items(vectors[model_name], ids=new_rows, num_threads=num_threads)
+        num_deleted = 0
+        for row in np.concatenate([deleted_rows, orphan_rows]).tolist():
+            if row in index:
+                try:
+                    index.mark_deleted(row)
+                    num_deleted += 1
+                except RuntimeError:
+                    pass  # Already deleted
+        _save_index_atomically(index, index_path(data_folder, model_name))
+        model_stats[model_name] = {
+            'added': len(new_rows),
+            'deleted': num_deleted,
+            'num_elements': len(index),
+            'seconds': time.perf_counter() - model_start,
+        }
+        print(f"{model_name}: added {len(new_rows)} and deleted {num_deleted} tracks "
+              f"in {model_stats[model_name]['seconds']:.2f}s")
+
+    updated_index = SongIdIndex(
+        np.concatenate([id_index.song_ids, np.full(len(orphan_rows), ''), new_song_ids]),
+        np.concatenate([id_index.deleted_rows, deleted_rows, orphan_rows]))
+    updated_index.save_to_folder(data_folder)
+
+    ingest_stats = {
+        'added': len(new_rows),
+        'skipped': int((~is_new).sum()),
+        'deleted': len(deleted_rows),
+        'seconds': time.perf_counter() - start_time,
+        'models': model_stats,
+    }
+    print(f"Ingested {ingest_stats['added']} tracks ({ingest_stats['skipped']} already indexed) and "
+          f"deleted {ingest_stats['deleted']} in {ingest_stats['seconds']:.2f}s")
+    return ingest_stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add new tracks to the saved indexes and remove deleted ones.")
+    parser.add_argument("--data_folder", type=str, required=True, help="Directory with the index files and song_ids.npy.")
+    parser.add_argument("--tracks", type=str, default=None, help="CSV of new tracks with an 'id' column and raw feature columns.")
+    parser.add_argument("--deep_features", type=str, default=None, help=".npy file with the deep features of the tracks, in CSV row order.")
+    parser.add_argument("--delete", type=str, default=None, help="Text file with one track id to delete per line.")
+    parser.add_argument("--models", type=str, nargs='+', default=None, help="Models to update (default: every saved index).")
+    parser.add_argument("--num_threads", type=int, default=-1, help="Threads used to insert the vectors.")
+
+    args = parser.parse_args()
+
+    tracks = pd.read_csv(args.tracks) if args.tracks else pd.DataFrame({'id': pd.Series(dtype=str)})
+    deep_features = np.load(args.deep_features) if args.deep_features else None
+    deleted_song_ids = []
+    if args.delete:
+        with open(args.delete) as f:
+            deleted_song_ids = [line.strip() for line in f if line.strip()]
+
+    ingest_tracks(args.data_folder, tracks, deep_features=deep_features, deleted_song_ids=deleted_song_ids,
+                  models=args.models, num_threads=args.num_threads)
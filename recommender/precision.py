@@ -0,0 +1,103 @@
+import numpy as np
+
+# Storage precisions of Voyager indexes -> voyager.StorageDataType member
+STORAGE_DATA_TYPES = {'float32': 'Float32', 'e4m3': 'E4M3', 'float8': 'Float8'}
+
+# Values each 8-bit type accepts, as (lowest, highest): E4M3 is a float with a 4-bit exponent and
+# 3-bit mantissa, Float8 is fixed point with steps of 1/127. Voyager rejects values outside the bounds
+STORAGE_BOUNDS = {'e4m3': (-448.0, 448.0), 'float8': (-1.0, 1.0)}
+
+# Magnitude calibration maps onto
+STORAGE_RANGES = {precision: high for precision, (_, high) in STORAGE_BOUNDS.items()}
+
+# Bytes per stored value, for memory estimates
+STORAGE_BYTES = {'float32': 4, 'e4m3': 1, 'float8': 1}
+
+# Quantile of |value| mapped onto the end of the range. E4M3 has room for every value; the coarse
+# Float8 grid clips the most extreme 0.1% (see clip_to_storage) instead of spending its resolution on them
+CALIBRATION_QUANTILES = {'e4m3': 1.0, 'float8': 0.999}
+
+# Values sampled to calibrate large matrices
+CALIBRATION_SAMPLE_SIZE = 1_000_000
+
+
+def _check_precision(precision):
+    if precision not in STORAGE_DATA_TYPES:
+        raise ValueError(f"Invalid storage precision '{precision}'. Choose from {list(STORAGE_DATA_TYPES)}")
+
+
+def calibrate_scale(features, precision, quantile=None, seed=0):
+    """
+    Factor that maps standardized features onto the range of a storage precision.
+
+    Multiplying a space by one factor scales all distances alike, so the
+    neighbours do not change; it only decides how the 8-bit values cover the
+    feature distribution.
+
+    Args:
+        features (np.ndarray): (n, d) features of the space.
+        precision (str): 'float32', 'e4m3' or 'float8'.
+        quantile (float): Quantile of |value| mapped to the end of the range.
+            Defaults to CALIBRATION_QUANTILES[precision].
+        seed (int): Seed of the value sample taken from large matrices.
+
+    Returns:
+        float: The scale (1.0 for float32).
+    """
+    _check_precision(precision)
+    if precision == 'float32':
+        return 1.0
+    values = np.abs(np.asarray(features, dtype=np.float32).ravel())
+    if len(values) > CALIBRATION_SAMPLE_SIZE:
+        values = np.random.default_rng(seed).choice(values, size=CALIBRATION_SAMPLE_SIZE, replace=False)
+    quantile = CALIBRATION_QUANTILES[precision] if quantile is None else quantile
+    magnitude = float(np.quantile(values, quantile)) if len(values) else 0.0
+    return STORAGE_RANGES[precision] / magnitude if magnitude > 0 else 1.0
+
+
+def clip_to_storage(values, precision):
+    """
+    Clips calibrated values to the bounds of a storage precision, as float32.
+
+    Calibration may map a few values past the bounds (see CALIBRATION_QUANTILES);
+    index vectors, queries and new tracks are all clipped the same way.
+    """
+    _check_precision(precision)
+    values = np.asarray(values, dtype=np.float32)
+    if precision == 'float32':
+        return values
+    low, high = STORAGE_BOUNDS[precision]
+    return np.clip(values, np.float32(low), np.float32(high))
+
+
+def quantize(values, precision):
+    """
+    Rounds values to what a storage precision keeps, returned as float32.
+
+    Matches Voyager's storage: E4M3 saturates at +/-448 and has 3 mantissa bits
+    (subnormal below 2^-6); Float8 is fixed point in [-1, 1].
+
+    Args:
+        values (np.ndarray): Values already multiplied by the calibration scale.
+        precision (str): 'float32', 'e4m3' or 'float8'.
+
+    Returns:
+        np.ndarray: The stored values.
+    """
+    _check_precision(precision)
+    values = np.asarray(values, dtype=np.float32)
+    if precision == 'float32':
+        return values
+    values = clip_to_storage(values, precision)
+    if precision == 'float8':
+        return (np.round(values * 127) / 127).astype(np.float32)
+
+    exponent = np.floor(np.log2(np.maximum(np.abs(values), 2.0 ** -6)))
+    step = 2.0 ** (exponent - 3)
+    return (np.round(values / step) * step).astype(np.float32)
+
+
+def storage_data_type(voyager, precision):
+    """Returns the voyager.StorageDataType of a storage precision."""
+    _check_precision(precision)
+    return getattr(voyager.StorageDataType, STORAGE_DATA_TYPES[precision])
@@ -0,0 +1,102 @@
+import numpy as np
+
+# Share of the variance the PCA components of a reduced space keep by default
+DEFAULT_TARGET_VARIANCE = 0.95
+
+REDUCTION_METHODS = ('pca', 'random')
+
+# Rows accumulated at a time when fitting, so a memmapped block is never copied whole
+COVARIANCE_CHUNK_ROWS = 16384
+
+
+def _covariance_spectrum(block, chunk_rows=COVARIANCE_CHUNK_ROWS):
+    """Mean, eigenvalues (descending) and eigenvectors of the covariance of a block."""
+    num_rows, num_columns = block.shape
+    total = np.zeros(num_columns)
+    gram = np.zeros((num_columns, num_columns))
+    for start in range(0, num_rows, chunk_rows):
+        chunk = np.asarray(block[start:start + chunk_rows], dtype=np.float64)
+        total += chunk.sum(axis=0)
+        gram += chunk.T @ chunk
+    mean = total / max(num_rows, 1)
+    # A d x d eigendecomposition; cheaper than an SVD of the n x d block for n >> d
+    covariance = (gram - num_rows * np.outer(mean, mean)) / max(num_rows - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    order = np.argsort(eigenvalues)[::-1]
+    return mean, np.clip(eigenvalues[order], 0, None), eigenvectors[:, order]
+
+
+def components_for_variance(eigenvalues, target_variance):
+    """Smallest number of leading components whose eigenvalues hold target_variance of the total."""
+    cumulative = np.cumsum(eigenvalues) / eigenvalues.sum()
+    return int(min(np.searchsorted(cumulative, target_variance - 1e-12) + 1, len(eigenvalues)))
+
+
+def fit_projection(block, target_variance=DEFAULT_TARGET_VARIANCE, num_components=None, method='pca', seed=0):
+    """
+    Fits a linear projection of standardized features into fewer dimensions.
+
+    PCA keeps the leading principal components: the fewest that explain
+    target_variance of the variance, unless num_components is given. A
+    random projection uses a Gaussian matrix scaled by 1/sqrt(k), which keeps
+    squared distances in expectation (Johnson-Lindenstrauss); its size
+    defaults to the number of components PCA would keep. Both keep Euclidean
+    distances on the scale of the full space.
+
+    Args:
+        block (np.ndarray): (n, d) standardized features of the catalogue.
+        target_variance (float): Share of the variance to keep (0-1].
+        num_components (int): Fixed number of output dimensions; overrides target_variance.
+        method (str): 'pca' or 'random'.
+        seed (int): Seed of the random projection.
+
+    Returns:
+        tuple: (components (k, d), center (d,), report dict with the method, dimensions
+            and the explained variance of the kept PCA components)
+    """
+    if method not in REDUCTION_METHODS:
+        raise ValueError(f"Invalid reduction method '{method}'. Choose from {list(REDUCTION_METHODS)}")
+    if not 0 < target_variance <= 1:
+        raise ValueError(f"target_variance must be in (0, 1], got {target_variance}")
+
+    mean, eigenvalues, eigenvectors = _covariance_spectrum(block)
+    if num_components is None:
+        num_components = components_for_variance(eigenvalues, target_variance)
+    num_components = int(min(num_components, block.shape[1]))
+
+    if method == 'pca':
+        components = eigenvectors[:, :num_components].T
+        explained_variance = float(eigenvalues[:num_components].sum() / eigenvalues.sum())
+    else:
+        rng = np.random.default_rng(seed)
+        components = rng.normal(scale=1 / np.sqrt(num_components), size=(num_components, block.shape[1]))
+        explained_variance = None
+
+    report = {
+        'method': method,
+        'input_dimensions': int(block.shape[1]),
+        'num_components': num_components,
+        'explained_variance': explained_variance,
+    }
+    return components, mean, report
+
+
+def reduce_transform(transform, standardized_block, target_variance=DEFAULT_TARGET_VARIANCE, num_components=None,
+                     method='pca', seed=0):
+    """
+    Adds a fitted projection to a feature transform.
+
+    The projection is saved and loaded with the transform, so an index built
+    on the reduced features embeds and queries new tracks in the same space.
+
+    Args:
+        transform (FeatureTransform): Fitted transform of the block.
+        standardized_block (np.ndarray): The catalogue block after `transform` (without projection).
+        target_variance, num_components, method, seed: See fit_projection.
+
+    Returns:
+        tuple: (FeatureTransform with the projection, report dict)
+    """
+    components, center, report = fit_projection(standardized_block, target_variance=target_variance,
+                                                num_components=num_components, method=method, seed=seed)
+    return transform.with_projection(components, center), report
@@ -0,0 +1,256 @@
+import os
+import json
+import numpy as np
+from .features import impute_non_finite
+from .precision import clip_to_storage
+
+# Version of the transform file layout; bumped when it changes incompatibly
+TRANSFORM_FORMAT_VERSION = 1
+
+
+def transform_path(index_path):
+    """Returns the path of the transform stored next to an index file (x.voy -> x.transform.json)."""
+    return os.path.splitext(index_path)[0] + '.transform.json'
+
+
+def projection_path(path):
+    """Returns the path of the projection matrix stored next to a transform file (x.json -> x.npz)."""
+    return os.path.splitext(path)[0] + '.npz'
+
+
+def _block_diagonal(blocks):
+    """Stacks matrices along the diagonal of one zero matrix."""
+    matrix = np.zeros((sum(block.shape[0] for block in blocks), sum(block.shape[1] for block in blocks)))
+    row, column = 0, 0
+    for block in blocks:
+        matrix[row:row + block.shape[0], column:column + block.shape[1]] = block
+        row, column = row + block.shape[0], column + block.shape[1]
+    return matrix
+
+
+def deep_feature_columns(num_dimensions):
+    """Names of the deep feature dimensions, which have no DataFrame columns of their own."""
+    return [f"deep_{i}" for i in range(num_dimensions)]
+
+
+class FeatureTransform:
+    """
+    The preprocessing that maps raw features into one index space.
+
+    Holds the column order, the values non-finite features are replaced with
+    and the standardisation parameters that were fitted on the catalogue, so a
+    new track can be embedded without refitting on the full dataset. An
+    optional linear projection (see reduction.py) maps the standardized
+    features into a lower-dimensional index space, and an output scale maps
+    them onto the range of an 8-bit storage precision (see precision.py),
+    whose bounds the vectors are then clipped to.
+    Spaces that combine several feature blocks are the concatenation of the
+    blocks' transforms.
+    """
+
+    def __init__(self, columns, fill_values, mean, scale, components=None, center=None, output_scale=1.0,
+                 storage_precision='float32'):
+        """
+        Args:
+            columns (list): Raw feature names, in input order.
+            fill_values (array-like): Replacement for NaN/inf, per column.
+            mean (array-like): Mean subtracted from each column.
+            scale (array-like): Standard deviation each column is divided by.
+            components (array-like): Optional (num_dimensions, len(columns)) projection
+                applied to the standardized features.
+            center (array-like): Subtracted from the standardized features before the projection.
+            output_scale (float): Factor the index space vectors are multiplied by.
+            storage_precision (str): Storage precision of the index ('float32', 'e4m3' or
+                'float8'); scaled vectors are clipped to its bounds.
+        """
+        self.columns = list(columns)
+        self.fill_values = np.asarray(fill_values, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        if not len(self.columns) == len(self.fill_values) == len(self.mean) == len(self.scale):
+            raise ValueError("columns, fill_values, mean and scale must have the same length")
+        self.components = None if components is None else np.asarray(components, dtype=np.float64)
+        self.center = None
+        if self.components is not None:
+            self.center = np.zeros(len(self.columns)) if center is None else np.asarray(center, dtype=np.float64)
+            if self.components.shape[1] != len(self.columns) or len(self.center) != len(self.columns):
+                raise ValueError("components and center must have one column per feature")
+        self.output_scale = float(output_scale)
+        self.storage_precision = storage_precision
+
+    @classmethod
+    def fit(cls, block, columns):
+        """
+        Fits imputation values and a StandardScaler on a catalogue feature block.
+
+        Args:
+            block (np.ndarray): (n, d) raw features; non-finite values are allowed.
+            columns (list): Names of the d columns.
+
+        Returns:
+            FeatureTransform: The fitted transform.
+        """
+        from sklearn.preprocessing import StandardScaler
+
+        cleaned = np.array(block, dtype=np.float64)
+        fill_values = impute_non_finite(cleaned)
+        scaler = StandardScaler().fit(cleaned)
+        return cls(columns, fill_values, scaler.mean_, scaler.scale_)
+
+    @classmethod
+    def concat(cls, transforms):
+        """
+        Combines the transforms of feature blocks that are concatenated into one space.
+
+        If any block is projected, the combined projection is block diagonal,
+        with identity blocks for the blocks that are not. Output scales belong
+        to a whole space, so the blocks must not have one.
+        """
+        if any(transform.output_scale != 1.0 or transform.storage_precision != 'float32' for transform in transforms):
+            raise ValueError("Only transforms without an output scale can be concatenated")
+        components, center = None, None
+        if any(transform.components is not None for transform in transforms):
+            components = _block_diagonal([transform.components if transform.components is not None
+                                          else np.eye(len(transform)) for transform in transforms])
+            center = np.concatenate([transform.center if transform.center is not None
+                                     else np.zeros(len(transform)) for transform in transforms])
+        return cls([column for transform in transforms for column in transform.columns],
+                   np.concatenate([transform.fill_values for transform in transforms]),
+                   np.concatenate([transform.mean for transform in transforms]),
+                   np.concatenate([transform.scale for transform in transforms]),
+                   components, center)
+
+    def with_projection(self, components, center=None):
+        """Returns a copy of this transform that projects into the space spanned by `components`."""
+        if self.components is not None:
+            raise ValueError("The transform is already projected")
+        return FeatureTransform(self.columns, self.fill_values, self.mean, self.scale, components, center,
+                                self.output_scale, self.storage_precision)
+
+    def with_output_scale(self, output_scale, storage_precision='float32'):
+        """
+        Returns a copy of this transform whose index space vectors are multiplied by
+        `output_scale` and clipped to the bounds of `storage_precision`.
+        """
+        return FeatureTransform(self.columns, self.fill_values, self.mean, self.scale, self.components,
+                                self.center, output_scale, storage_precision)
+
+    def __len__(self):
+        """Number of raw input features."""
+        return len(self.columns)
+
+    @property
+    def num_dimensions(self):
+        """Number of dimensions of the index space the transform maps into."""
+        return len(self) if self.components is None else self.components.shape[0]
+
+    def project(self, standardized):
+        """
+        Applies only the projection, output scale and storage clipping, to features that are already standardized.
+
+        Args:
+            standardized (np.ndarray): (d,) vector or (n, d) matrix of standardized features.
+
+        Returns:
+            np.ndarray: float32 vectors in the index space.
+        """
+        vectors = np.asarray(standardized, dtype=np.float64)
+        if self.components is not None:
+            vectors = (vectors - self.center) @ self.components.T
+        return clip_to_storage(vectors * self.output_scale, self.storage_precision)
+
+    def transform(self, values):
+        """
+        Applies the transform to raw feature vectors.
+
+        Args:
+            values (np.ndarray): (d,) vector or (n, d) matrix in column order.
+
+        Returns:
+            np.ndarray: float32 vectors in the index space, one per input vector.
+        """
+        values = np.array(values, dtype=np.float64)
+        rows = np.atleast_2d(values)
+        if rows.shape[1] != len(self):
+            raise ValueError(f"Expected {len(self)} features, got {rows.shape[1]}")
+        impute_non_finite(rows, self.fill_values)
+        return self.project((values - self.mean) / self.scale)
+
+    def vector_from_record(self, record):
+        """
+        Reads the raw features of one track in column order.
+
+        Args:
+            record (Mapping): Feature name -> value, e.g. a DataFrame row or dict.
+                Missing features are imputed like NaN values.
+
+        Returns:
+            np.ndarray: The (d,) raw feature vector.
+        """
+        return np.array([record.get(column, np.nan) for column in self.columns], dtype=np.float64)
+
+    def transform_record(self, record):
+        """Embeds one track given as feature name -> value; O(d)."""
+        return self.transform(self.vector_from_record(record))
+
+    def to_dict(self):
+        return {
+            'format_version': TRANSFORM_FORMAT_VERSION,
+            'num_dimensions': self.num_dimensions,
+            'columns': self.columns,
+            'fill_values': self.fill_values.tolist(),
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'output_scale': self.output_scale,
+            'storage_precision': self.storage_precision,
+        }
+
+    def save(self, path, **metadata):
+        """
+        Writes the transform as JSON, replacing any previous file atomically.
+
+        A projection is written to an .npz file next to it first (see projection_path).
+
+        Args:
+            path (str): Destination file.
+            **metadata: Extra fields stored with the transform (e.g. the index it belongs to).
+        """
+        data = self.to_dict()
+        if self.components is not None:
+            matrix_path = projection_path(path)
+            with open(matrix_path + '.tmp', 'wb') as f:
+                np.savez(f, components=self.components, center=self.center)
+            os.replace(matrix_path + '.tmp', matrix_path)
+            data['projection_file'] = os.path.basename(matrix_path)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({**data, **metadata}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a transform written by save.
+
+        Raises:
+            ValueError: If the file was written in an unsupported format version.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('format_version') != TRANSFORM_FORMAT_VERSION:
+            raise ValueError(f"Unsupported transform format version {data.get('format_version')} in {path}")
+        components, center = None, None
+        if data.get('projection_file'):
+            with np.load(os.path.join(os.path.dirname(path), data['projection_file'])) as projection:
+                components, center = projection['components'], projection['center']
+        return cls(data['columns'], data['fill_values'], data['mean'], data['scale'], components, center,
+                   data.get('output_scale', 1.0), data.get('storage_precision', 'float32'))
+
+
+def load_transform(index_path):
+    """Loads the transform stored next to an index file, or returns None if there is none."""
+    path = transform_path(index_path)
+    if not os.path.exists(path):
+        return None
+    return FeatureTransform.load(path)
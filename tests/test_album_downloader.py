@@ -0,0 +1,152 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from album_downloader import HostRateLimiter, download_covers, load_manifest
+
+
+class CoverHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in image host: /cover/<name> succeeds, /flaky/<name> fails twice first,
+    /truncated/<name> drops the connection mid-body once first, anything else is a 404.
+    """
+
+    failures = {}
+    lock = threading.Lock()
+
+    def do_GET(self):
+        if self.path.startswith('/flaky/'):
+            with self.lock:
+                self.failures[self.path] = self.failures.get(self.path, 0) + 1
+                attempt = self.failures[self.path]
+            if attempt <= 2:
+                self.send_response(503)
+                self.end_headers()
+                return
+        if self.path.startswith('/truncated/'):
+            with self.lock:
+                self.failures[self.path] = self.failures.get(self.path, 0) + 1
+                attempt = self.failures[self.path]
+            if attempt == 1:
+                self.send_response(200)
+                self.send_header('Content-Length', '1000')
+                self.end_headers()
+                self.wfile.write(b'partial')
+                self.close_connection = True
+                return
+        if self.path.startswith(('/cover/', '/flaky/', '/truncated/')):
+            body = self.path.encode() * 100
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestDownloadCovers(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CoverHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.image_dir = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.image_dir, 'manifest.jsonl')
+        CoverHandler.failures = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.image_dir, ignore_errors=True)
+
+    def job(self, url_path, name):
+        return f"{self.base_url}{url_path}", os.path.join(self.image_dir, name)
+
+    def test_downloads_retries_and_failures(self):
+        jobs = [self.job(f'/cover/{i}', f'cover_{i}.jpg') for i in range(20)]
+        jobs.append(self.job('/flaky/a', 'flaky.jpg'))
+        jobs.append(self.job('/missing/b', 'missing.jpg'))
+
+        stats = download_covers(jobs, self.manifest_path, max_workers=8, backoff=0.01)
+
+        self.assertEqual(stats['downloaded'], 21)
+        self.assertEqual(stats['failed'], 1)
+        with open(os.path.join(self.image_dir, 'cover_3.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'/cover/3' * 100)
+
+        manifest = load_manifest(self.manifest_path)
+        self.assertEqual(len(manifest), 22)
+        self.assertEqual(manifest[jobs[20][1]]['attempts'], 3)
+        self.assertEqual(manifest[jobs[21][1]]['status'], 'failed')
+        self.assertEqual(manifest[jobs[21][1]]['attempts'], 1)
+        self.assertFalse(os.path.exists(jobs[21][1]))
+        self.assertFalse([name for name in os.listdir(self.image_dir) if name.endswith('.part')])
+
+    def test_gives_up_after_retries(self):
+        jobs = [self.job('/flaky/b', 'flaky.jpg')]
+        stats = download_covers(jobs, self.manifest_path, retries=1, backoff=0.01)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(load_manifest(self.manifest_path)[jobs[0][1]]['error'], 'HTTP 503')
+
+    def test_existing_files_are_not_downloaded(self):
+        jobs = [self.job('/cover/1', 'cover_1.jpg'), self.job('/cover/2', 'cover_2.jpg')]
+        download_covers(jobs, self.manifest_path)
+        stats = download_covers(jobs, self.manifest_path)
+
+        self.assertEqual(stats['exists'], 2)
+        self.assertEqual(stats['downloaded'], 0)
+        with open(self.manifest_path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual(load_manifest(self.manifest_path)[jobs[0][1]]['status'], 'downloaded')
+
+    def test_body_read_errors_are_retried(self):
+        jobs = [self.job('/truncated/a', 'truncated.jpg')]
+        stats = download_covers(jobs, self.manifest_path, backoff=0.01)
+
+        self.assertEqual(stats['downloaded'], 1)
+        self.assertEqual(load_manifest(self.manifest_path)[jobs[0][1]]['attempts'], 2)
+        with open(jobs[0][1], 'rb') as f:
+            self.assertEqual(f.read(), b'/truncated/a' * 100)
+
+    def test_write_errors_fail_only_their_job(self):
+        jobs = [self.job('/cover/1', os.path.join('missing_dir', 'cover_1.jpg')), self.job('/cover/2', 'cover_2.jpg')]
+        stats = download_covers(jobs, self.manifest_path)
+
+        self.assertEqual((stats['downloaded'], stats['failed']), (1, 1))
+        record = load_manifest(self.manifest_path)[jobs[0][1]]
+        self.assertEqual(record['attempts'], 1)
+        self.assertTrue(record['error'].startswith('FileNotFoundError'))
+
+
+class TestHostRateLimiter(unittest.TestCase):
+
+    def test_spaces_requests_per_host(self):
+        limiter = HostRateLimiter(requests_per_second=50)
+        start_time = time.monotonic()
+        for _ in range(6):
+            limiter.wait('http://a.example/cover')
+        limiter.wait('http://b.example/cover')
+        # Five intervals on host a; host b is not delayed by host a
+        self.assertGreaterEqual(time.monotonic() - start_time, 5 / 50 * 0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+import unittest
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+import cv2
+import numpy as np
+
+# Add the project root to the Python path
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+import addBasicImagefeatures
+from addBasicImagefeatures import (DETECTORS, YOLO_MODEL, append_feature_checkpoint, dominant_color_fast,
+                                   extract_image_features, feature_checkpoint_path, find_most_vibrant_color, main,
+                                   object_detection, object_detection_batch)
+from album_downloader import cover_path
+import pandas as pd
+import shutil
+from image_context import ImageContext
+from benchmarks._reference import SAMPLE_COVERS, legacy_find_most_vibrant_color
+
+
+def sample_images():
+    """Sample covers (downscaled to keep the reference loop quick) plus synthetic edge cases."""
+    images = {}
+    for path in SAMPLE_COVERS:
+        image = cv2.imread(os.path.join(PROJECT_ROOT, path))
+        if image is not None:
+            images[path] = cv2.resize(image, (128, 128), interpolation=cv2.INTER_AREA)
+
+    rng = np.random.default_rng(0)
+    images['noise'] = rng.integers(0, 256, size=(64, 64, 3), dtype=np.uint8)
+    images['constant'] = np.full((32, 32, 3), (40, 200, 120), dtype=np.uint8)
+    images['dark'] = np.full((32, 32, 3), 20, dtype=np.uint8)
+    images['gradient'] = np.dstack([np.tile(np.arange(0, 256, 4, dtype=np.uint8), (64, 1))] * 3)
+
+    # Several pixels share the highest saturation; the first in row-major order wins
+    ties = np.full((16, 16, 3), 200, dtype=np.uint8)
+    ties[3, 9] = (255, 0, 0)
+    ties[3, 2] = (0, 0, 255)
+    ties[12, 0] = (0, 255, 0)
+    images['ties'] = ties
+    return images
+
+
+class TestFindMostVibrantColor(unittest.TestCase):
+
+    def test_matches_legacy_implementation(self):
+        for name, image in sample_images().items():
+            for brightness_threshold in [0.0, 0.5, 0.9]:
+                with self.subTest(image=name, brightness_threshold=brightness_threshold):
+                    self.assertEqual(find_most_vibrant_color(image, brightness_threshold),
+                                     legacy_find_most_vibrant_color(image, brightness_threshold))
+
+    def test_ties_pick_first_pixel(self):
+        self.assertEqual(find_most_vibrant_color(sample_images()['ties']), (0, 0, 255))
+
+    def test_no_bright_pixels(self):
+        self.assertEqual(find_most_vibrant_color(sample_images()['dark']), (0, 0, 0))
+
+
+
+class TestDominantColorFast(unittest.TestCase):
+
+    def setUp(self):
+        # Three flat color blocks of different sizes
+        self.colors = [(200, 30, 30), (20, 180, 60), (40, 40, 220)]
+        self.image = np.zeros((120, 100, 3), dtype=np.uint8)
+        self.image[:60] = self.colors[0]
+        self.image[60:100] = self.colors[1]
+        self.image[100:] = self.colors[2]
+
+    def test_recovers_block_colors(self):
+        for method in ['minibatch', 'histogram']:
+            with self.subTest(method=method):
+                dominant_colors = dominant_color_fast(self.image, k=3, method=method)
+                self.assertEqual(len(dominant_colors), 3)
+                for color in self.colors:
+                    distances = np.linalg.norm(np.array(dominant_colors) - color, axis=1)
+                    self.assertLess(distances.min(), 2)
+
+    def test_fewer_colors_than_k(self):
+        image = np.full((16, 16, 3), (10, 20, 30), dtype=np.uint8)
+        self.assertEqual(dominant_color_fast(image, k=3, method='histogram'), [(10, 20, 30)] * 3)
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            dominant_color_fast(self.image, method='invalid')
+
+
+class TestImageContext(unittest.TestCase):
+
+    # Every feature except object detection, which needs ultralytics and model weights
+    FEATURES = ["dominant_color_fast", "color_temperature", "color_brightness", "overall_lightness",
+                "color_histograms", "resize_to_single_pixel", "luminosity_weighted_average",
+                "find_most_vibrant_color", "edge_detection", "texture_analysis"]
+
+    def setUp(self):
+        self.image = cv2.resize(cv2.imread(os.path.join(PROJECT_ROOT, 'album_cover.jpg')), (96, 96))
+
+    def test_conversions_are_cached(self):
+        context = ImageContext(self.image)
+        self.assertIs(context.hsv, context.hsv)
+        self.assertIs(context.resized((8, 8)).gray, context.resized((8, 8)).gray)
+        np.testing.assert_array_equal(context.rgb, self.image[..., ::-1])
+        self.assertEqual(context.conversions, {'hsv': 1, 'resized': 1, 'rgb': 1})
+
+    def test_features_match_array_input(self):
+        context = ImageContext(self.image)
+        for name in ["color_brightness", "resize_to_single_pixel", "find_most_vibrant_color", "texture_analysis"]:
+            with self.subTest(feature=name):
+                function = getattr(addBasicImagefeatures, name)
+                np.testing.assert_array_equal(function(context), function(self.image))
+
+    def test_each_conversion_runs_once_per_image(self):
+        conversions = []
+        original_init = ImageContext.__init__
+
+        def recording_init(context, bgr):
+            original_init(context, bgr)
+            conversions.append(context.conversions)
+
+        timings = {}
+        with tempfile.TemporaryDirectory() as image_dir:
+            image_path = os.path.join(image_dir, 'cover.png')
+            cv2.imwrite(image_path, self.image)
+            with mock.patch.object(ImageContext, '__init__', recording_init):
+                features = extract_image_features(image_path, self.FEATURES, timings)
+
+        self.assertIsNotNone(features)
+        self.assertEqual(conversions[0], {'hsv': 1, 'gray': 1, 'resized': 1})
+        self.assertEqual(set(timings), {'decode', *self.FEATURES})
+
+
+class FakeDetector:
+    """Offline stand-in for a YOLO model: finds one 'bright' box in every image with a mean above 127."""
+
+    names = {0: 'dark', 1: 'bright'}
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, imgsz=640, verbose=True):
+        self.calls.append((len(images), imgsz))
+        return [SimpleNamespace(boxes=[SimpleNamespace(cls=[int(image.mean() > 127)])]) for image in images]
+
+
+class TestObjectDetection(unittest.TestCase):
+
+    def setUp(self):
+        self.images = [np.full((8, 8, 3), value, dtype=np.uint8) for value in [0, 255, 200, 10, 255]]
+
+    def tearDown(self):
+        DETECTORS.pop(YOLO_MODEL, None)
+
+    def test_batches_images(self):
+        detector = FakeDetector()
+        detected = object_detection_batch(self.images, batch_size=2, imgsz=320, model=detector)
+
+        self.assertEqual(detected, [['dark'], ['bright'], ['bright'], ['dark'], ['bright']])
+        self.assertEqual(detector.calls, [(2, 320), (2, 320), (1, 320)])
+
+    def test_uses_cached_detector(self):
+        detector = DETECTORS[YOLO_MODEL] = FakeDetector()
+        self.assertEqual(object_detection(ImageContext(self.images[1])), ['bright'])
+        self.assertEqual(object_detection(self.images[0]), ['dark'])
+        self.assertEqual(len(detector.calls), 2)
+
+
+class TestMain(unittest.TestCase):
+
+    FEATURES = ["color_temperature", "overall_lightness", "resize_to_single_pixel", "find_most_vibrant_color"]
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+        self.image_dir = os.path.join(self.data_folder, 'covers')
+        os.makedirs(self.image_dir)
+        self.spotify_data_path = os.path.join(self.data_folder, 'spotify_data.csv')
+
+        # Covers are already on disk, so no download is attempted
+        rng = np.random.default_rng(0)
+        song_ids = [f"song{i}" for i in range(6)]
+        for song_id in song_ids[:5]:
+            cv2.imwrite(cover_path(self.image_dir, song_id), rng.integers(0, 256, size=(32, 32, 3), dtype=np.uint8))
+        pd.DataFrame({'id': song_ids, 'img': ['http://127.0.0.1:9/cover.jpg'] * 5 + [None]}).to_csv(
+            self.spotify_data_path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder, ignore_errors=True)
+
+    def run_main(self, name, features=None, **kwargs):
+        output_csv_path = os.path.join(self.data_folder, name)
+        main(self.spotify_data_path, output_csv_path, self.image_dir, features or self.FEATURES, **kwargs)
+        return pd.read_csv(output_csv_path)
+
+    def test_parallel_matches_sequential(self):
+        sequential = self.run_main('sequential.csv', workers=1)
+        parallel = self.run_main('parallel.csv', workers=2, checkpoint_interval=2)
+
+        pd.testing.assert_frame_equal(sequential, parallel)
+        self.assertEqual(sequential['color_temperature'].notna().sum(), 5)
+        self.assertTrue(np.isnan(sequential['most_vibrant_color_r'].iloc[5]))
+        self.assertFalse(os.path.exists(feature_checkpoint_path(os.path.join(self.data_folder, 'parallel.csv'))))
+
+    def test_batched_object_detection(self):
+        detector = DETECTORS[YOLO_MODEL] = FakeDetector()
+        try:
+            output = self.run_main('detected.csv', features=self.FEATURES + ['object_detection'],
+                                   detection_batch_size=2, detection_imgsz=320)
+        finally:
+            DETECTORS.pop(YOLO_MODEL, None)
+
+        self.assertEqual(output['detected_objects'].notna().sum(), 5)
+        self.assertEqual(detector.calls, [(2, 320), (2, 320), (1, 320)])
+
+    def test_resumes_from_checkpoint(self):
+        output_csv_path = os.path.join(self.data_folder, 'resumed.csv')
+        append_feature_checkpoint(feature_checkpoint_path(output_csv_path),
+                                  [(0, {'color_temperature': 'Checkpointed', 'single_pixel_color': (1, 2, 3)})])
+
+        resumed = self.run_main('resumed.csv')
+
+        self.assertEqual(resumed['color_temperature'].iloc[0], 'Checkpointed')
+        self.assertEqual(resumed['single_pixel_color_g'].iloc[0], 2)
+        self.assertIn(resumed['color_temperature'].iloc[1], ['Cool', 'Warm'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from extract_cnn.checkpoint import CheckpointLog
+
+
+class TestCheckpointLog(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_dir = os.path.join(self.temp_dir.name, 'checkpoints')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_replay_restores_non_contiguous_progress(self):
+        log = CheckpointLog(self.checkpoint_dir)
+        log.append([(0, np.ones(4)), (1, np.array([])), (2, np.full(4, 2.0))])
+        log.append([(5, np.full(4, 5.0)), (3, np.array([]))])
+
+        features_dict, failed = CheckpointLog(self.checkpoint_dir).replay()
+
+        self.assertEqual(sorted(features_dict), [0, 2, 5])
+        self.assertEqual(failed, {1, 3})
+        np.testing.assert_array_equal(features_dict[5], np.full(4, 5.0))
+
+    def test_retried_index_is_no_longer_failed(self):
+        log = CheckpointLog(self.checkpoint_dir)
+        log.append([(1, np.array([]))])
+        log.append([(1, np.ones(4))])
+
+        features_dict, failed = log.replay()
+
+        self.assertIn(1, features_dict)
+        self.assertEqual(failed, set())
+
+    def test_compact_keeps_progress_in_one_shard(self):
+        log = CheckpointLog(self.checkpoint_dir)
+        for idx in range(3):
+            log.append([(idx, np.full(4, float(idx))), (idx + 10, np.array([]))])
+        before = log.replay()
+
+        log.compact()
+        log.append([(20, np.ones(4))])
+        features_dict, failed = CheckpointLog(self.checkpoint_dir).replay()
+
+        self.assertEqual(len([f for f in os.listdir(self.checkpoint_dir) if f.endswith('.npz')]), 2)
+        self.assertEqual(sorted(features_dict), sorted(list(before[0]) + [20]))
+        self.assertEqual(failed, before[1])
+
+    def test_torn_manifest_record_is_ignored(self):
+        log = CheckpointLog(self.checkpoint_dir)
+        log.append([(0, np.ones(4))])
+        with open(log.manifest_path, 'a') as f:
+            f.write('{"shard": "shard_0000')
+
+        log = CheckpointLog(self.checkpoint_dir)
+        log.append([(1, np.ones(4))])
+
+        features_dict, _ = log.replay()
+        self.assertEqual(sorted(features_dict), [0, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,8 +8,12 @@ import numpy as np
 # Add the project root to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from extract_cnn import extract_deep_features, extract_traditional_features, extract_features, process_images_with_features
+from extract_cnn import (extract_deep_features, extract_deep_features_batch, extract_traditional_features,
+                         extract_features, process_images_with_features)
+from extract_cnn.extract_cnn import MODELS
+from unittest import mock
 import shutil
+import torch
 
 class TestFeatureExtraction(unittest.TestCase):
 
@@ -63,6 +67,11 @@ class TestFeatureExtraction(unittest.TestCase):
         self.assertEqual(len(features), 1280)
         self.assertEqual(index, 0)
 
+    def test_extract_traditional_features_from_context(self):
+        from image_context import ImageContext
+        np.testing.assert_array_equal(extract_traditional_features(ImageContext.from_path(self.test_image)),
+                                      extract_traditional_features(self.test_image))
+
     def test_extract_features_traditional(self):
         index, features = extract_features((self.test_image, 0, 'traditional', 'efficientnet_v2'))
         self.assertGreater(len(features), 0)
@@ -114,5 +123,59 @@ class TestFeatureExtraction(unittest.TestCase):
         with self.assertRaises(ValueError):
             extract_deep_features(self.test_image, model_name='invalid_model')
 
+    def test_extract_features_timings(self):
+        timings = {}
+        index, features = extract_features((self.test_image, 0, 'both', 'efficientnet_v2'), timings)
+        self.assertGreater(len(features), 1280)
+        for stage in ['decode', 'forward', 'traditional']:
+            self.assertGreaterEqual(timings[stage], 0)
+
+    def test_process_images_with_features_invalid_model_name(self):
+        with self.assertRaises(ValueError):
+            process_images_with_features(self.test_csv, method='deep', model_name='invalid_model',
+                                         output_csv_path=os.path.join(self.test_output_dir, 'output.csv'),
+                                         features_pickle_path=os.path.join(self.test_output_dir, 'features.pkl'))
+
+    def test_extract_deep_features_batch(self):
+        batches = list(extract_deep_features_batch(
+            [self.test_image, 'invalid_image.jpg', self.test_image], [0, 1, 2], batch_size=2))
+
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        results = dict(result for batch in batches for result in batch)
+        self.assertEqual(len(results[1]), 0)
+        single_features, _ = extract_deep_features(self.test_image)
+        np.testing.assert_allclose(results[0], single_features, rtol=1e-4, atol=1e-5)
+        np.testing.assert_allclose(results[2], single_features, rtol=1e-4, atol=1e-5)
+
+    def test_extract_deep_features_batch_flattens_model_output(self):
+        # Like convnext without its classifier, the stand-in model returns (n, channels, 1, 1)
+        with mock.patch.dict(MODELS, {'convnext': torch.nn.AdaptiveAvgPool2d(1)}):
+            deep = dict(next(extract_deep_features_batch([self.test_image], [0], model_name='convnext')))
+            both = dict(next(extract_deep_features_batch([self.test_image], [0], model_name='convnext',
+                                                         method='both')))
+
+        self.assertEqual(deep[0].shape, (3,))
+        self.assertGreater(len(both[0]), 3)
+        np.testing.assert_array_equal(both[0][:3], deep[0])
+
+    def test_process_images_with_features_batched(self):
+        output_csv_path = os.path.join(self.test_output_dir, 'batched_output.csv')
+        features_pickle_path = os.path.join(self.test_output_dir, 'batched_features.pkl')
+
+        df, features_dict = process_images_with_features(
+            self.test_csv,
+            method='both',
+            model_name='efficientnet_v2',
+            output_csv_path=output_csv_path,
+            features_pickle_path=features_pickle_path,
+            num_workers=0,
+            batch_size=32
+        )
+
+        self.assertEqual(len(features_dict), 1)
+        self.assertGreater(len(features_dict[0]), 1280)
+        self.assertEqual(df['both_efficientnet_v2_extracted'].iloc[0], True)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from profiling.stats import calculate_statistics, is_numeric_column
+from profiling.render import RENDER_MANIFEST_FILE, render_columns, visualization_path
+from profiling.streaming import HyperLogLog, KLLSketch, StreamingProfiler, TopKCounter, profile_csv
+
+
+def legacy_calculate_statistics(df):
+    """The per-column implementation calculate_statistics replaced, kept as the reference."""
+    stats = {}
+    for col in df.columns:
+        col_stats = {}
+        series = df[col]
+
+        col_stats["Valid"] = int(series.count())
+        col_stats["Missing"] = int(series.isnull().sum())
+        col_stats["Mismatched"] = 0
+
+        try:
+            numeric_series = pd.to_numeric(series, errors='raise')
+            is_numeric = True
+        except Exception:
+            is_numeric = False
+
+        if is_numeric:
+            try:
+                col_stats["Unique"] = int(numeric_series.nunique())
+                col_stats["Mean"] = float(numeric_series.mean()) if not pd.isna(numeric_series.mean()) else None
+                col_stats["Std. Deviation"] = float(numeric_series.std()) if not pd.isna(numeric_series.std()) else None
+                col_stats["Min"] = float(numeric_series.min()) if not pd.isna(numeric_series.min()) else None
+                col_stats["25%"] = float(numeric_series.quantile(0.25)) if not pd.isna(numeric_series.quantile(0.25)) else None
+                col_stats["50%"] = float(numeric_series.quantile(0.50)) if not pd.isna(numeric_series.quantile(0.50)) else None
+                col_stats["75%"] = float(numeric_series.quantile(0.75)) if not pd.isna(numeric_series.quantile(0.75)) else None
+                col_stats["Max"] = float(numeric_series.max()) if not pd.isna(numeric_series.max()) else None
+
+                try:
+                    bins = pd.cut(numeric_series.dropna(), bins=10)
+                    bin_counts = bins.value_counts().sort_index()
+
+                    col_stats["Label Distribution"] = {
+                        str(interval): int(count)
+                        for interval, count in zip(bin_counts.index, bin_counts.values)
+                    }
+                except Exception as e:
+                    col_stats["Label Distribution"] = f"Binning failed: {str(e)}"
+            except Exception as generalFailure:
+                print(f"General failure in a numeric section{str(generalFailure)}")
+
+        else:
+            col_stats["Unique"] = int(series.nunique())
+            most_common = series.mode()
+            if not most_common.empty:
+                col_stats["Most Common"] = str(most_common.iloc[0])
+            else:
+                col_stats["Most Common"] = None
+
+            if pd.api.types.is_string_dtype(series) or series.dtype == 'object':
+                value_counts = series.value_counts(dropna=False)
+                if not value_counts.empty:
+                    if len(value_counts) > 10:
+                        top_values = value_counts.head(3)
+                        other_count = value_counts[3:].sum()
+
+                        col_stats["Value Counts"] = {
+                            str(val): int(count) for val, count in top_values.items()
+                        }
+                        col_stats["Value Counts"][f"Other ({len(value_counts) - 3})"] = int(other_count)
+                    else:
+                        col_stats["Value Counts"] = {
+                            str(val): int(count) for val, count in value_counts.items()
+                        }
+
+        stats[col] = col_stats
+    return stats
+
+
+def mixed_frame(num_rows=500, seed=0):
+    """A DataFrame with every kind of column the profiler distinguishes."""
+    rng = np.random.default_rng(seed)
+    floats = rng.normal(size=num_rows)
+    floats[rng.random(num_rows) < 0.1] = np.nan
+    with_inf = rng.normal(size=num_rows)
+    with_inf[3] = np.inf
+    genres = np.array(['pop', 'rock', 'jazz', 'hip hop'], dtype=object)[rng.integers(0, 4, num_rows)]
+    genres[::17] = None
+    return pd.DataFrame({
+        'danceability': floats,
+        'popularity': rng.integers(0, 100, num_rows),
+        'rounded': np.round(rng.random(num_rows), 1),
+        'nullable_int': pd.array(np.where(rng.random(num_rows) < 0.2, None, rng.integers(0, 5, num_rows)), dtype='Int64'),
+        'constant': np.full(num_rows, 3.5),
+        'negative_constant': np.full(num_rows, -2.0),
+        'single_value': np.r_[7.0, np.full(num_rows - 1, np.nan)],
+        'empty': np.full(num_rows, np.nan),
+        'explicit': rng.random(num_rows) < 0.3,
+        'with_inf': with_inf,
+        'object_numbers': pd.Series(rng.integers(0, 10, num_rows).astype(object)),
+        'genre': genres,
+        'artist': [f"artist_{i}" for i in rng.integers(0, 40, num_rows)],
+    })
+
+
+class TestCalculateStatistics(unittest.TestCase):
+
+    def assertStatsEqual(self, stats, expected):
+        self.assertEqual(list(stats), list(expected))
+        for column in expected:
+            with self.subTest(column=column):
+                self.assertEqual(list(stats[column]), list(expected[column]))
+                for key, value in expected[column].items():
+                    if isinstance(value, float):
+                        self.assertAlmostEqual(stats[column][key], value, places=9)
+                    else:
+                        self.assertEqual(stats[column][key], value)
+
+    def test_matches_legacy_implementation(self):
+        df = mixed_frame()
+        self.assertStatsEqual(calculate_statistics(df), legacy_calculate_statistics(df))
+
+    def test_matches_legacy_across_column_blocks(self):
+        rng = np.random.default_rng(1)
+        df = pd.DataFrame(rng.normal(size=(50, 150)), columns=[f"f{i}" for i in range(150)])
+        df.iloc[::7, ::3] = np.nan
+        self.assertStatsEqual(calculate_statistics(df), legacy_calculate_statistics(df))
+
+    def test_bin_edges_are_right_closed(self):
+        df = pd.DataFrame({'value': np.arange(0, 11, dtype=float)})
+        distribution = calculate_statistics(df)['value']['Label Distribution']
+        self.assertEqual(sum(distribution.values()), 11)
+        self.assertEqual(distribution, legacy_calculate_statistics(df)['value']['Label Distribution'])
+
+    def test_numeric_detection(self):
+        self.assertTrue(is_numeric_column(pd.Series([1, 2, 3])))
+        self.assertTrue(is_numeric_column(pd.Series([1, None, 2.5], dtype=object)))
+        self.assertFalse(is_numeric_column(pd.Series([True, False])))
+        self.assertFalse(is_numeric_column(pd.Series(['a', 'b'])))
+        # Numeric strings are reported as categorical, unlike a pd.to_numeric attempt
+        self.assertFalse(is_numeric_column(pd.Series(['1', '2'])))
+
+
+class TestRenderColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.df = mixed_frame(num_rows=100)
+        self.column_stats = calculate_statistics(self.df)
+
+    def test_renders_every_column_and_skips_unchanged(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            first = render_columns(self.df, self.column_stats, output_dir, workers=1, chunk_size=4)
+            self.assertEqual(first['rendered'], len(self.df.columns))
+            for column in self.df.columns:
+                self.assertTrue(os.path.exists(visualization_path(output_dir, column)))
+            self.assertTrue(os.path.exists(os.path.join(output_dir, RENDER_MANIFEST_FILE)))
+
+            second = render_columns(self.df, self.column_stats, output_dir, workers=1)
+            self.assertEqual(second['rendered'], 0)
+            self.assertEqual(second['skipped'], len(self.df.columns))
+
+            # Changed values and a deleted image are rendered again
+            self.df.loc[0, 'popularity'] = 1000
+            os.remove(visualization_path(output_dir, 'genre'))
+            third = render_columns(self.df, calculate_statistics(self.df), output_dir, workers=1)
+            self.assertEqual(third['rendered'], 2)
+
+    def test_process_pool(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            render_stats = render_columns(self.df, self.column_stats, output_dir, workers=2, chunk_size=3,
+                                          skip_unchanged=False)
+            self.assertEqual(render_stats['rendered'], len(self.df.columns))
+            for column in self.df.columns:
+                self.assertTrue(os.path.exists(visualization_path(output_dir, column)))
+
+
+class TestStreamingProfiler(unittest.TestCase):
+
+    def setUp(self):
+        # Booleans are profiled as numbers in chunks; infinities are covered by the in-memory path
+        self.df = mixed_frame(num_rows=600).drop(columns=['explicit', 'with_inf', 'nullable_int'])
+
+    def test_matches_in_memory_statistics_while_sketches_are_exact(self):
+        with tempfile.TemporaryDirectory() as data_folder:
+            csv_path = os.path.join(data_folder, 'data.csv')
+            self.df.to_csv(csv_path, index=False)
+            expected = calculate_statistics(pd.read_csv(csv_path))
+            stats = profile_csv(csv_path, chunksize=128, kll_k=1000)
+        TestCalculateStatistics.assertStatsEqual(self, stats, expected)
+
+    def test_merge_matches_single_pass(self):
+        single = StreamingProfiler(kll_k=1000)
+        single.update(self.df)
+        merged = StreamingProfiler(kll_k=1000)
+        for part in (self.df.iloc[:250], self.df.iloc[250:]):
+            profiler = StreamingProfiler(kll_k=1000)
+            profiler.update(part)
+            merged.merge(profiler)
+        TestCalculateStatistics.assertStatsEqual(self, merged.statistics(), single.statistics())
+
+    def test_mismatched_values(self):
+        profiler = StreamingProfiler()
+        profiler.update(pd.DataFrame({'tempo': [120.0, 95.5, None]}))
+        profiler.update(pd.DataFrame({'tempo': ['88', 'unknown', None]}))
+        stats = profiler.statistics()['tempo']
+        self.assertEqual((stats['Valid'], stats['Missing'], stats['Mismatched']), (4, 2, 1))
+        self.assertAlmostEqual(stats['Mean'], np.mean([120.0, 95.5, 88.0]))
+
+
+class TestSketches(unittest.TestCase):
+
+    def test_kll_quantiles_and_ranks(self):
+        values = np.random.default_rng(0).normal(size=200_000)
+        sketch = KLLSketch()
+        for chunk in np.array_split(values, 20):
+            sketch.update(chunk)
+        self.assertLess(sum(len(level) for level in sketch.levels), 2000)
+        expected = np.quantile(values, [0.25, 0.5, 0.75])
+        ranks = np.searchsorted(np.sort(values), sketch.quantiles([0.25, 0.5, 0.75])) / len(values)
+        np.testing.assert_allclose(ranks, [0.25, 0.5, 0.75], atol=0.02)
+        self.assertAlmostEqual(sketch.rank([expected[1]])[0] / len(values), 0.5, delta=0.02)
+
+    def test_hyperloglog(self):
+        hashes = pd.util.hash_array(np.arange(100_000, dtype=np.float64))
+        counter = HyperLogLog()
+        counter.update(hashes[:60_000])
+        other = HyperLogLog()
+        other.update(hashes[40_000:])
+        counter.merge(other)
+        self.assertAlmostEqual(counter.count() / 100_000, 1.0, delta=0.03)
+
+        small = HyperLogLog()
+        small.update(hashes[:100])
+        small.update(hashes[50:150])
+        self.assertEqual(small.count(), 150)
+
+    def test_top_k_keeps_heavy_hitters(self):
+        rng = np.random.default_rng(0)
+        values = np.concatenate([np.repeat(['a', 'b'], [5000, 3000]), rng.integers(0, 20_000, 20_000).astype(str)])
+        rng.shuffle(values)
+        counter = TopKCounter(capacity=100)
+        for chunk in np.array_split(values, 10):
+            counter.update(pd.Series(chunk).value_counts())
+        self.assertLessEqual(len(counter.counts), 100)
+        self.assertEqual([value for value, _ in counter.most_common(2)], ['a', 'b'])
+        self.assertGreaterEqual(counter.most_common(1)[0][1], 5000 - len(values) / 101)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,640 @@
+import unittest
+import os
+import sys
+import shutil
+import pickle
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from recommender.engine import RecommendationEngine, _exclude_query_rows, _import_voyager
+from recommender.id_index import SongIdIndex
+from recommender.ingest import ingest_tracks
+from recommender.feature_store import FeatureStore, convert_pickle_to_feature_store, save_feature_store
+from recommender.build import build_annoy_index, build_indexes, build_voyager_index
+from recommender.evaluation import recall_at_k
+from recommender.exact import ExactIndex, build_exact_index
+from recommender.features import AUDIO_COLUMNS, BASIC_IMAGE_COLUMNS, assemble_features, impute_non_finite
+from recommender.precision import calibrate_scale, clip_to_storage, quantize
+from recommender.reduction import _covariance_spectrum, fit_projection, reduce_transform
+from recommender.transforms import FeatureTransform, load_transform, transform_path
+
+try:
+    voyager = _import_voyager()
+except ImportError:
+    voyager = None
+
+
+class TestSongIdIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.song_ids = ['a', 'b', 'c', 'b', 'd', 'a']
+        self.index = SongIdIndex(self.song_ids)
+
+    def test_resolve(self):
+        self.assertEqual(self.index.resolve('c'), 2)
+        self.assertEqual(self.index.resolve('d'), 4)
+        self.assertIsNone(self.index.resolve('missing'))
+        self.assertIn('a', self.index)
+        self.assertNotIn('missing', self.index)
+
+    def test_duplicates_resolve_to_first_row(self):
+        self.assertEqual(self.index.resolve('a'), 0)
+        self.assertEqual(self.index.resolve('b'), 1)
+        self.assertEqual(sorted(self.index.duplicates), ['a', 'b'])
+        np.testing.assert_array_equal(self.index.duplicates['a'], [0, 5])
+
+    def test_resolve_many(self):
+        positions = self.index.resolve_many(['d', 'missing', 'a', 'b'])
+        np.testing.assert_array_equal(positions, [4, -1, 0, 1])
+
+    def test_deleted_rows_do_not_resolve(self):
+        index = SongIdIndex(['a', 'b', 'c', 'a'], deleted_rows=[0, 2])
+        self.assertEqual(index.resolve('a'), 3)
+        self.assertIsNone(index.resolve('c'))
+        self.assertNotIn('c', index)
+        np.testing.assert_array_equal(index.resolve_many(['a', 'b', 'c']), [3, 1, -1])
+
+        with tempfile.TemporaryDirectory() as data_folder:
+            index.save_to_folder(data_folder)
+            loaded = SongIdIndex.load_from_folder(data_folder)
+        np.testing.assert_array_equal(loaded.deleted_rows, [0, 2])
+        self.assertIsNone(loaded.resolve('c'))
+
+    def test_num_live(self):
+        index = SongIdIndex(['a', 'b', 'c', 'd', 'e'], deleted_rows=[1, 4])
+        self.assertEqual(index.num_live(), 3)
+        self.assertEqual(index.num_live(4), 3)
+        self.assertEqual(index.num_live(2), 1)
+        self.assertEqual(self.index.num_live(), 6)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as data_folder:
+            path = os.path.join(data_folder, 'song_ids.npy')
+            self.index.save(path)
+            loaded = SongIdIndex.load(path)
+        self.assertEqual(len(loaded), len(self.song_ids))
+        np.testing.assert_array_equal(loaded.resolve_many(self.song_ids), self.index.resolve_many(self.song_ids))
+
+
+class TestFeatureStore(unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder, ignore_errors=True)
+
+    def test_convert_pickle(self):
+        rng = np.random.default_rng(0)
+        features_dict = {row_id: rng.normal(size=16) for row_id in [7, 2, 11, 5]}
+        features_dict[9] = rng.normal(size=8)  # Shape mismatch, skipped
+        pickle_path = os.path.join(self.data_folder, 'features.pkl')
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(features_dict, f)
+
+        store_path = convert_pickle_to_feature_store(pickle_path)
+        store = FeatureStore.open(store_path)
+
+        self.assertEqual(store_path, os.path.join(self.data_folder, 'features.features'))
+        self.assertIsInstance(store.features, np.memmap)
+        self.assertEqual(store.features.dtype, np.float32)
+        np.testing.assert_array_equal(store.row_ids, [2, 5, 7, 11])
+        np.testing.assert_allclose(store.get([11, 2]), np.stack([features_dict[11], features_dict[2]]), rtol=1e-6)
+
+    def test_positions_and_missing_rows(self):
+        store_path = os.path.join(self.data_folder, 'store.features')
+        save_feature_store(store_path, np.arange(12, dtype=np.float64).reshape(4, 3), row_ids=[30, 10, 40, 20])
+        store = FeatureStore.open(store_path)
+
+        np.testing.assert_array_equal(store.positions([10, 25, 40, 99]), [0, -1, 3, -1])
+        np.testing.assert_array_equal(store.get([30]), [[0, 1, 2]])
+        with self.assertRaises(KeyError):
+            store.get([10, 25])
+
+
+class TestFeatureAssembly(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        columns = AUDIO_COLUMNS + BASIC_IMAGE_COLUMNS
+        self.df = pd.DataFrame(rng.normal(size=(300, len(columns))), columns=columns)
+        self.df.loc[[3, 10], 'tempo'] = np.nan
+        self.df.loc[5, 'single_pixel_color_g'] = np.inf
+        self.df['most_vibrant_color_b'] = pd.array([None] * 300, dtype='Int64')
+
+    def test_matches_column_means_imputation(self):
+        matrix, blocks = assemble_features(self.df, {'audio': AUDIO_COLUMNS, 'basic_image': BASIC_IMAGE_COLUMNS})
+
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertTrue(matrix.flags['C_CONTIGUOUS'])
+        self.assertTrue(np.shares_memory(blocks['audio'], matrix))
+        np.testing.assert_array_equal(np.concatenate([blocks['audio'], blocks['basic_image']], axis=1), matrix)
+
+        expected = self.df[BASIC_IMAGE_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = np.isfinite(expected)
+        column_means = np.nanmean(np.where(finite, expected, np.nan), axis=0)
+        expected = np.where(finite, expected, np.nan_to_num(column_means))
+        np.testing.assert_allclose(blocks['basic_image'], expected, rtol=1e-6)
+        self.assertAlmostEqual(float(blocks['audio'][3, -1]), np.nanmean(self.df['tempo']), places=5)
+
+    def test_impute_with_given_fill_values(self):
+        block = np.array([[1.0, np.nan], [np.inf, 4.0]], dtype=np.float32)
+        fill_values = impute_non_finite(block, fill_values=np.array([7.0, 8.0]))
+        np.testing.assert_array_equal(block, [[1.0, 8.0], [7.0, 4.0]])
+        np.testing.assert_array_equal(fill_values, [7.0, 8.0])
+
+
+class TestFeatureTransform(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.block = rng.normal(loc=3.0, scale=2.0, size=(200, 4))
+        self.block[7, 1] = np.nan
+        self.columns = ['energy', 'tempo', 'valence', 'loudness']
+        self.transform = FeatureTransform.fit(self.block, self.columns)
+
+    def test_matches_imputation_and_standard_scaler(self):
+        from sklearn.preprocessing import StandardScaler
+
+        cleaned = self.block.copy()
+        impute_non_finite(cleaned)
+        expected = StandardScaler().fit_transform(cleaned)
+        np.testing.assert_allclose(self.transform.transform(self.block), expected, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(self.transform.transform(self.block[7]), expected[7], rtol=1e-5, atol=1e-6)
+
+    def test_record_with_missing_features(self):
+        record = {'tempo': 120.0, 'energy': 0.5, 'valence': np.inf}
+        vector = self.transform.transform_record(record)
+        fill = self.transform.fill_values
+        expected = (np.array([0.5, 120.0, fill[2], fill[3]]) - self.transform.mean) / self.transform.scale
+        np.testing.assert_allclose(vector, expected, rtol=1e-6)
+
+    def test_save_load_and_concat(self):
+        combined = FeatureTransform.concat([self.transform, FeatureTransform.fit(self.block[:, :2], ['a', 'b'])])
+        self.assertEqual(len(combined), 6)
+        with tempfile.TemporaryDirectory() as data_folder:
+            index_path = os.path.join(data_folder, 'audio_features.voy')
+            self.assertIsNone(load_transform(index_path))
+            combined.save(transform_path(index_path))
+            loaded = load_transform(index_path)
+        self.assertEqual(loaded.columns, combined.columns)
+        rows = np.hstack([self.block[:3], self.block[:3, :2]])
+        np.testing.assert_array_equal(loaded.transform(rows), combined.transform(rows))
+
+
+def brute_force_neighbours(features, queries, k):
+    """Reference k-NN: full squared Euclidean distance matrix and a stable sort."""
+    distances = ((queries[:, None, :].astype(np.float64) - features[None, :, :]) ** 2).sum(axis=2)
+    ids = np.argsort(distances, axis=1, kind='stable')[:, :k]
+    return ids, np.take_along_axis(distances, ids, axis=1)
+
+
+class TestExactIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.features = rng.normal(size=(300, 9)).astype(np.float32)
+        self.queries = rng.normal(size=(40, 9)).astype(np.float32)
+        self.index = build_exact_index(self.features)
+
+    def test_matches_brute_force(self):
+        expected_ids, expected_distances = brute_force_neighbours(self.features, self.queries, k=7)
+        ids, distances = self.index.query(self.queries, k=7)
+        np.testing.assert_array_equal(ids, expected_ids)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-4, atol=1e-4)
+        self.assertEqual(distances.dtype, np.float32)
+
+        single_ids, single_distances = self.index.query(self.queries[3], k=7)
+        np.testing.assert_array_equal(single_ids, expected_ids[3])
+
+    def test_small_query_blocks(self):
+        import recommender.exact as exact
+
+        expected_ids, _ = self.index.query(self.queries, k=5)
+        original = exact.DISTANCE_BLOCK_ELEMENTS
+        exact.DISTANCE_BLOCK_ELEMENTS = 300 * 7
+        try:
+            ids, _ = self.index.query(self.queries, k=5, num_threads=3)
+        finally:
+            exact.DISTANCE_BLOCK_ELEMENTS = original
+        np.testing.assert_array_equal(ids, expected_ids)
+
+    def test_cosine_space(self):
+        index = build_exact_index(self.features, space='cosine')
+        normalized = self.features / np.linalg.norm(self.features, axis=1, keepdims=True)
+        query = self.queries[0] / np.linalg.norm(self.queries[0])
+        expected = np.argsort(1 - normalized @ query, kind='stable')[:5]
+        ids, distances = index.query(self.queries[0] * 3, k=5)
+        np.testing.assert_array_equal(ids, expected)
+        np.testing.assert_allclose(distances, (1 - normalized @ query)[expected], atol=1e-5)
+
+    def test_deleted_items_and_add(self):
+        ids, _ = self.index.query(self.features[42], k=1)
+        self.assertEqual(ids[0], 42)
+        self.index.mark_deleted(42)
+        with self.assertRaises(RuntimeError):
+            self.index.mark_deleted(42)
+        ids, _ = self.index.query(self.features[42], k=3)
+        self.assertNotIn(42, ids)
+
+        self.index.add_items(self.features[42:43] + 1e-3, ids=[500])
+        self.assertIn(500, self.index)
+        self.assertEqual(len(self.index), 301)
+        ids, _ = self.index.query(self.features[42], k=1)
+        self.assertEqual(ids[0], 500)
+        with self.assertRaises(ValueError):
+            self.index.add_items(self.features[:1], ids=[500])
+
+    def test_save_and_load(self):
+        self.index.mark_deleted(7)
+        with tempfile.TemporaryDirectory() as data_folder:
+            path = os.path.join(data_folder, 'audio_features.npz')
+            self.index.save(path)
+            loaded = ExactIndex.load(path)
+        np.testing.assert_array_equal(loaded.get_vectors([3, 9]), self.features[[3, 9]])
+        np.testing.assert_array_equal(loaded.query(self.queries, k=4)[0], self.index.query(self.queries, k=4)[0])
+        with self.assertRaises(KeyError):
+            loaded.get_vector(1000)
+
+    def test_recall_at_k(self):
+        exact_ids = np.array([[1, 2, 3, 4], [5, 6, 7, 8]])
+        self.assertEqual(recall_at_k(exact_ids, exact_ids), 1.0)
+        self.assertEqual(recall_at_k(np.array([[4, 3, 9, 9], [5, 0, 0, 0]]), exact_ids), 0.375)
+        self.assertEqual(recall_at_k(np.array([[2, 1, 9, 9], [0, 5, 0, 0]]), exact_ids, k=2), 0.75)
+
+    def test_build_indexes_selects_exact_for_small_spaces(self):
+        with tempfile.TemporaryDirectory() as data_folder:
+            stale_path = os.path.join(data_folder, 'audio_features.voy')
+            open(stale_path, 'wb').close()
+            stats = build_indexes({'audio': self.features}, data_folder)['audio']
+            self.assertEqual(stats['index_type'], 'exact')
+            self.assertTrue(stats['path'].endswith('audio_features.npz'))
+            self.assertFalse(os.path.exists(stale_path))
+
+
+class TestReduction(unittest.TestCase):
+
+    def setUp(self):
+        # 500 points near a 6-dimensional subspace of a 40-dimensional space
+        rng = np.random.default_rng(0)
+        latent = rng.normal(size=(500, 6)) * np.array([5, 4, 3, 2, 1.5, 1])
+        self.block = latent @ np.linalg.qr(rng.normal(size=(40, 6)))[0].T + 0.01 * rng.normal(size=(500, 40))
+
+    def test_pca_keeps_target_variance_and_distances(self):
+        components, center, report = fit_projection(self.block, target_variance=0.999)
+        self.assertEqual(report['num_components'], 6)
+        self.assertGreaterEqual(report['explained_variance'], 0.999)
+        reduced = (self.block - center) @ components.T
+        full_distances = ((self.block[:20, None] - self.block[None, :20]) ** 2).sum(axis=2)
+        reduced_distances = ((reduced[:20, None] - reduced[None, :20]) ** 2).sum(axis=2)
+        np.testing.assert_allclose(reduced_distances, full_distances, rtol=0.01, atol=0.05)
+
+    def test_covariance_is_accumulated_over_row_chunks(self):
+        mean, eigenvalues, _ = _covariance_spectrum(self.block.astype(np.float32), chunk_rows=64)
+        np.testing.assert_allclose(mean, self.block.mean(axis=0), atol=1e-5)
+        expected = np.sort(np.linalg.eigvalsh(np.cov(self.block, rowvar=False)))[::-1]
+        np.testing.assert_allclose(eigenvalues, np.clip(expected, 0, None), rtol=1e-4, atol=1e-5)
+
+    def test_random_projection_and_validation(self):
+        components, _, report = fit_projection(self.block, num_components=12, method='random')
+        self.assertEqual(components.shape, (12, 40))
+        self.assertIsNone(report['explained_variance'])
+        with self.assertRaises(ValueError):
+            fit_projection(self.block, method='svd')
+        with self.assertRaises(ValueError):
+            fit_projection(self.block, target_variance=0)
+
+    def test_reduced_transform_is_saved_with_the_index(self):
+        columns = [f"f{i}" for i in range(40)]
+        transform = FeatureTransform.fit(self.block, columns)
+        reduced, report = reduce_transform(transform, transform.transform(self.block), num_components=5)
+        self.assertEqual((len(reduced), reduced.num_dimensions), (40, 5))
+        self.assertEqual(reduced.transform(self.block).shape, (500, 5))
+
+        audio = FeatureTransform(AUDIO_COLUMNS, np.zeros(9), np.zeros(9), np.ones(9))
+        combined = FeatureTransform.concat([audio, reduced])
+        self.assertEqual(combined.num_dimensions, 14)
+        values = np.hstack([np.ones((3, 9)), self.block[:3]])
+        np.testing.assert_allclose(combined.transform(values),
+                                   np.hstack([np.ones((3, 9)), reduced.transform(self.block[:3])]), rtol=1e-5)
+
+        with tempfile.TemporaryDirectory() as data_folder:
+            features = combined.transform(np.hstack([np.zeros((500, 9)), self.block]))
+            stats = build_indexes({'audio_deep': features}, data_folder, transforms={'audio_deep': combined})
+            engine = RecommendationEngine(data_folder, verbose=False)
+            loaded = load_transform(stats['audio_deep']['path'])
+        np.testing.assert_allclose(loaded.transform(values), combined.transform(values), rtol=1e-6)
+        record = dict(zip(AUDIO_COLUMNS + columns, np.concatenate([np.zeros(9), self.block[42]])))
+        ids, _ = engine.recommend_for_features(record, k=1)['audio_deep']
+        self.assertEqual(ids[0], 42)
+
+
+class TestStoragePrecision(unittest.TestCase):
+
+    def test_quantize(self):
+        values = np.array([1.0, 0.3, -0.3, 500.0, 0.001, 0.0])
+        np.testing.assert_array_equal(quantize(values, 'e4m3'), [1.0, 0.3125, -0.3125, 448.0, 2.0 ** -9, 0.0])
+        np.testing.assert_allclose(quantize(np.array([0.5, -3.0, 3.0, 0.003]), 'float8'),
+                                   [64 / 127, -1.0, 1.0, 0.0])
+        np.testing.assert_array_equal(quantize(values, 'float32'), values.astype(np.float32))
+        with self.assertRaises(ValueError):
+            quantize(values, 'int8')
+
+    def test_calibrate_scale(self):
+        features = np.random.default_rng(0).normal(size=(2000, 8))
+        self.assertEqual(calibrate_scale(features, 'float32'), 1.0)
+        self.assertAlmostEqual(calibrate_scale(features, 'e4m3') * np.abs(features).max(), 448.0, places=2)
+        scaled = features * calibrate_scale(features, 'float8')
+        self.assertAlmostEqual(float(np.mean(np.abs(scaled) > 1)), 0.001, places=3)
+
+    def test_clip_to_storage(self):
+        values = np.array([-2.0, -1.0, 0.5, 2.0, 500.0])
+        np.testing.assert_allclose(clip_to_storage(values, 'float8'), [-1.0, -1.0, 0.5, 1.0, 1.0])
+        np.testing.assert_array_equal(clip_to_storage(values, 'e4m3'), [-2.0, -1.0, 0.5, 2.0, 448.0])
+        np.testing.assert_array_equal(clip_to_storage(values, 'float32'), values)
+
+    def test_output_scale_is_saved_with_the_transform(self):
+        transform = FeatureTransform(AUDIO_COLUMNS, np.zeros(9), np.zeros(9), np.ones(9)).with_output_scale(0.25)
+        np.testing.assert_allclose(transform.transform(np.ones(9)), np.full(9, 0.25))
+        with tempfile.TemporaryDirectory() as data_folder:
+            path = transform_path(os.path.join(data_folder, 'audio_features.voy'))
+            transform.save(path)
+            self.assertEqual(FeatureTransform.load(path).output_scale, 0.25)
+        with self.assertRaises(ValueError):
+            FeatureTransform.concat([transform, transform])
+
+    def test_scaled_vectors_are_clipped_to_the_storage_precision(self):
+        transform = FeatureTransform(AUDIO_COLUMNS, np.zeros(9), np.zeros(9), np.ones(9))
+        transform = transform.with_output_scale(0.5, 'float8')
+        values = np.array([4.0, -4.0, 1.0, 0, 0, 0, 0, 0, 0])
+        np.testing.assert_allclose(transform.transform(values), [1.0, -1.0, 0.5, 0, 0, 0, 0, 0, 0])
+        with tempfile.TemporaryDirectory() as data_folder:
+            path = transform_path(os.path.join(data_folder, 'audio_features.voy'))
+            transform.save(path)
+            loaded = FeatureTransform.load(path)
+        self.assertEqual(loaded.storage_precision, 'float8')
+        np.testing.assert_array_equal(loaded.transform(values), transform.transform(values))
+
+    def test_build_indexes_validates_precision(self):
+        features = np.random.default_rng(0).normal(size=(50, 9))
+        transform = FeatureTransform.fit(features, AUDIO_COLUMNS)
+        with tempfile.TemporaryDirectory() as data_folder:
+            with self.assertRaises(ValueError):
+                build_indexes({'audio': features}, data_folder, precision='float8')
+            with self.assertRaises(ValueError):
+                build_indexes({'audio': features}, data_folder, precision={'audio': 'int8'},
+                              transforms={'audio': transform})
+            with self.assertRaises(ValueError):
+                build_indexes({'audio': features}, data_folder, precision='e4m3', exact=True,
+                              transforms={'audio': transform})
+
+    @unittest.skipIf(voyager is None, "voyager is not installed")
+    def test_quantized_voyager_index(self):
+        raw_features = np.random.default_rng(0).normal(size=(200, 9))
+        transform = FeatureTransform.fit(raw_features, AUDIO_COLUMNS)
+        with tempfile.TemporaryDirectory() as data_folder:
+            stats = build_indexes({'audio': transform.transform(raw_features)}, data_folder,
+                                  transforms={'audio': transform}, precision={'audio': 'float8'})['audio']
+            self.assertEqual((stats['index_type'], stats['precision']), ('voyager', 'float8'))
+            engine = RecommendationEngine(data_folder, verbose=False)
+        self.assertEqual(engine.transforms['audio'].output_scale, stats['storage_scale'])
+        self.assertEqual(engine.transforms['audio'].storage_precision, 'float8')
+        ids, _ = engine.recommend_for_features(dict(zip(AUDIO_COLUMNS, raw_features[42])), k=1)['audio']
+        self.assertEqual(ids[0], 42)
+
+    @unittest.skipIf(voyager is None, "voyager is not installed")
+    def test_float8_index_accepts_values_at_the_clip_bounds(self):
+        # Heavy tails put values beyond the calibration quantile on both sides, so they are clipped to +/-1
+        raw_features = np.random.default_rng(0).standard_t(df=2, size=(500, 9))
+        transform = FeatureTransform.fit(raw_features, AUDIO_COLUMNS)
+        features = transform.transform(raw_features)
+        scaled = features * calibrate_scale(features, 'float8')
+        self.assertTrue((scaled > 1).any() and (scaled < -1).any())
+        with tempfile.TemporaryDirectory() as data_folder:
+            stats = build_indexes({'audio': features}, data_folder,
+                                  transforms={'audio': transform}, precision={'audio': 'float8'})['audio']
+            engine = RecommendationEngine(data_folder, verbose=False)
+        self.assertEqual(stats['num_vectors'], 500)
+        query = engine.transforms['audio'].transform(raw_features[np.argmin(scaled.min(axis=1))])
+        self.assertEqual(query.min(), -1.0)
+
+
+class TestExcludeQueryRows(unittest.TestCase):
+
+    def test_removes_query_row_wherever_it_appears(self):
+        closest_indices = np.array([[3, 7, 8], [1, 4, 9], [2, 5, 6]])
+        distances = np.array([[0.0, 0.1, 0.2], [0.3, 0.0, 0.4], [0.5, 0.6, 0.7]])
+        rows = np.array([3, 4, 9])
+
+        indices, dists = _exclude_query_rows(closest_indices, distances, rows, k=2)
+
+        np.testing.assert_array_equal(indices, [[7, 8], [1, 9], [2, 5]])
+        np.testing.assert_array_equal(dists, [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+
+
+class TestBuildAnnoyIndex(unittest.TestCase):
+
+    def test_items_use_row_positions(self):
+        features = np.random.default_rng(0).normal(size=(100, 9))
+        index = build_annoy_index(features, n_trees=5)
+        self.assertEqual(index.get_n_items(), 100)
+        np.testing.assert_allclose(index.get_item_vector(42), features[42].astype(np.float32), rtol=1e-6)
+        self.assertEqual(index.get_nns_by_item(42, 1)[0], 42)
+
+
+class TestLateFusion(unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.features = {
+            'audio': rng.normal(size=(300, 9)).astype(np.float32),
+            'basic_image': rng.normal(size=(300, 9)).astype(np.float32),
+            'deep': rng.normal(size=(300, 64)).astype(np.float32),
+        }
+        build_indexes(self.features, self.data_folder)
+        self.engine = RecommendationEngine(self.data_folder, verbose=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder, ignore_errors=True)
+
+    def brute_force_fusion(self, row, weights, k):
+        fused = sum(weight * ((self.features[modality] - self.features[modality][row]) ** 2).sum(axis=1)
+                    / self.features[modality].shape[1] for modality, weight in weights.items())
+        fused[row] = np.inf
+        return np.argsort(fused, kind='stable')[:k]
+
+    def test_matches_weighted_brute_force(self):
+        weights = {'audio': 0.7, 'basic_image': 0.1, 'deep': 0.2}
+        ids, distances = self.engine.recommend_fused(12, weights=weights, k=5, overfetch=60)
+        np.testing.assert_array_equal(ids, self.brute_force_fusion(12, weights, 5))
+        self.assertNotIn(12, ids)
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_single_modality_matches_its_index(self):
+        ids, _ = self.engine.recommend_fused(12, weights={'audio': 1.0, 'deep': 0.0}, k=5)
+        expected, _ = self.engine.recommend(12, num_recommendations=5, models=['audio'])['audio']
+        np.testing.assert_array_equal(ids, expected)
+
+    def test_invalid_weights(self):
+        with self.assertRaises(KeyError):
+            self.engine.recommend_fused(12, weights={'all': 1.0})
+        with self.assertRaises(ValueError):
+            self.engine.recommend_fused(12, weights={'audio': 0.0})
+        with self.assertRaises(ValueError):
+            self.engine.recommend_fused(12, weights={'audio': -1.0})
+
+
+@unittest.skipIf(voyager is None, "voyager is not installed")
+class TestBuildVoyagerIndexes(unittest.TestCase):
+
+    def test_build_indexes_saves_every_space(self):
+        rng = np.random.default_rng(0)
+        feature_sets = {'audio': rng.normal(size=(150, 9)), 'basic_image': rng.normal(size=(150, 9))}
+        with tempfile.TemporaryDirectory() as data_folder:
+            build_stats = build_indexes(feature_sets, data_folder, exact=False)
+            for model_name, stats in build_stats.items():
+                self.assertTrue(os.path.exists(stats['path']))
+                self.assertTrue(stats['path'].endswith('.voy'))
+                self.assertEqual(stats['num_vectors'], 150)
+                self.assertGreater(stats['vectors_per_second'], 0)
+
+    def test_build_indexes_saves_transforms(self):
+        features = np.random.default_rng(0).normal(size=(50, 9))
+        transform = FeatureTransform.fit(features, AUDIO_COLUMNS)
+        with tempfile.TemporaryDirectory() as data_folder:
+            stats = build_indexes({'audio': transform.transform(features)}, data_folder,
+                                  transforms={'audio': transform}, exact=False)['audio']
+            self.assertEqual(load_transform(stats['path']).columns, AUDIO_COLUMNS)
+            with self.assertRaises(ValueError):
+                build_indexes({'audio': features[:, :5]}, data_folder, transforms={'audio': transform})
+
+    def test_items_use_row_positions(self):
+        features = np.random.default_rng(0).normal(size=(100, 9))
+        index = build_voyager_index(features)
+        self.assertEqual(len(index), 100)
+        np.testing.assert_allclose(index.get_vector(42), features[42].astype(np.float32), rtol=1e-6)
+
+
+class TestRecommendationEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.features = {
+            'audio': rng.normal(size=(200, 9)).astype(np.float32),
+            'basic_image': rng.normal(size=(200, 9)).astype(np.float32),
+        }
+        build_indexes(self.features, self.data_folder)
+        SongIdIndex([f"song_{i}" for i in range(200)]).save(os.path.join(self.data_folder, 'song_ids.npy'))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder, ignore_errors=True)
+
+    def test_loads_available_indexes_once(self):
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        self.assertEqual(sorted(engine.models), ['audio', 'basic_image'])
+        for stats in engine.load_stats.values():
+            self.assertEqual(stats['num_elements'], 200)
+            self.assertGreaterEqual(stats['load_seconds'], 0)
+            self.assertGreater(stats['file_bytes'], 0)
+
+    def test_recommend_excludes_query_song(self):
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        recommendations = engine.recommend(5, num_recommendations=4)
+        for model_name, (ids, distances) in recommendations.items():
+            self.assertEqual(len(ids), 4)
+            self.assertNotIn(5, ids)
+            self.assertTrue(np.all(np.diff(distances) >= 0))
+
+    def test_resolve_uses_persisted_id_index(self):
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        self.assertEqual(engine.resolve('song_42'), 42)
+        self.assertIsNone(engine.resolve('missing'))
+
+    def test_recommend_batch_matches_single_queries(self):
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        batch = engine.recommend_batch(['song_5', 'missing', 'song_17'], k=4)
+
+        np.testing.assert_array_equal(batch['rows'], [5, 17])
+        self.assertEqual(batch['missing'], ['missing'])
+        for model_name in engine.models:
+            self.assertEqual(batch['indices'][model_name].shape, (2, 4))
+            for row, indices in zip(batch['rows'], batch['indices'][model_name]):
+                single_indices, _ = engine.recommend(row, num_recommendations=4, models=[model_name])[model_name]
+                np.testing.assert_array_equal(indices, single_indices)
+
+    def test_recommend_for_features_of_new_track(self):
+        transform = FeatureTransform(AUDIO_COLUMNS, np.zeros(9), np.zeros(9), np.ones(9))
+        transform.save(transform_path(os.path.join(self.data_folder, 'audio_features.voy')))
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        self.assertEqual(list(engine.transforms), ['audio'])
+
+        record = dict(zip(AUDIO_COLUMNS, self.features['audio'][42]))
+        ids, distances = engine.recommend_for_features(record, k=3)['audio']
+        self.assertEqual(ids[0], 42)
+        self.assertAlmostEqual(float(distances[0]), 0.0, places=5)
+
+    def test_invalid_model_name(self):
+        with self.assertRaises(ValueError):
+            RecommendationEngine(self.data_folder, models=['invalid_model'], verbose=False)
+
+
+class TestIngestTracks(unittest.TestCase):
+
+    def setUp(self):
+        self.data_folder = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.raw_features = rng.normal(size=(100, 9))
+        self.transform = FeatureTransform.fit(self.raw_features, AUDIO_COLUMNS)
+        build_indexes({'audio': self.transform.transform(self.raw_features)}, self.data_folder,
+                      transforms={'audio': self.transform})
+        SongIdIndex([f"song_{i}" for i in range(100)]).save(os.path.join(self.data_folder, 'song_ids.npy'))
+
+    def tearDown(self):
+        shutil.rmtree(self.data_folder, ignore_errors=True)
+
+    def test_adds_new_tracks_with_stable_ids_and_deletes(self):
+        new_features = np.random.default_rng(1).normal(size=(5, 9))
+        tracks = pd.DataFrame(new_features, columns=AUDIO_COLUMNS)
+        tracks.insert(0, 'id', ['song_3', 'new_0', 'new_1', 'new_2', 'new_1'])
+
+        stats = ingest_tracks(self.data_folder, tracks, deleted_song_ids=['song_7', 'missing'])
+        self.assertEqual((stats['added'], stats['skipped'], stats['deleted']), (3, 2, 1))
+
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        self.assertEqual(engine.resolve('song_3'), 3)
+        self.assertEqual(engine.resolve('new_0'), 100)
+        self.assertEqual(engine.resolve('new_2'), 102)
+        self.assertIsNone(engine.resolve('song_7'))
+        np.testing.assert_allclose(engine.indexes['audio'].get_vector(101),
+                                   self.transform.transform(new_features[2]), rtol=1e-5)
+
+        ids, _ = engine.query('audio', self.transform.transform(self.raw_features[7]), k=5)
+        self.assertNotIn(7, ids)
+        ids, _ = engine.recommend_for_features(dict(zip(AUDIO_COLUMNS, new_features[1])), k=1)['audio']
+        self.assertEqual(ids[0], 100)
+
+    def test_recommend_batch_after_deletes_caps_k_at_live_tracks(self):
+        ingest_tracks(self.data_folder, pd.DataFrame(columns=['id'] + AUDIO_COLUMNS),
+                      deleted_song_ids=[f"song_{i}" for i in range(90)])
+        engine = RecommendationEngine(self.data_folder, verbose=False)
+        self.assertEqual(engine.num_live('audio'), 10)
+
+        batch = engine.recommend_batch(['song_95', 'song_3'], k=10)
+        self.assertEqual(batch['missing'], ['song_3'])
+        self.assertEqual(sorted(batch['indices']['audio'][0].tolist()), [90, 91, 92, 93, 94, 96, 97, 98, 99])
+
+    def test_missing_features_fail_before_writing(self):
+        tracks = pd.DataFrame({'id': ['new_0'], 'tempo': [120.0]})
+        with self.assertRaises(ValueError):
+            ingest_tracks(self.data_folder, tracks)
+        self.assertEqual(len(SongIdIndex.load_from_folder(self.data_folder)), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
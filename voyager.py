@@ -78,344 +78,11 @@ df.head()
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.gridspec import GridSpec
 import os
 import json
 
-def calculate_statistics(df):
-    """
-    Calculates statistics for each column of a pandas DataFrame.
-
-    Args:
-        df (pd.DataFrame): The input DataFrame.
-
-    Returns:
-        dict: A dictionary where keys are column names and values
-              are dictionaries containing the calculated statistics.
-    """
-    stats = {}
-    for col in df.columns:
-        col_stats = {}
-        series = df[col]
-
-        # Basic statistics applicable to all columns
-        col_stats["Valid"] = int(series.count())
-        col_stats["Missing"] = int(series.isnull().sum())
-        col_stats["Mismatched"] = 0  # Initialize, may be updated later
-
-        # Try converting to numeric if its object, numeric already numeric series remain as numeric
-
-        try:
-          numeric_series = pd.to_numeric(series, errors='raise')
-          is_numeric = True
-        except:
-          is_numeric = False
-
-        if is_numeric:
-            # Statistics applicable if succesfully converted
-            try:
-                col_stats["Unique"] = int(numeric_series.nunique())
-                col_stats["Mean"] = float(numeric_series.mean()) if not pd.isna(numeric_series.mean()) else None
-                col_stats["Std. Deviation"] = float(numeric_series.std()) if not pd.isna(numeric_series.std()) else None
-                col_stats["Min"] = float(numeric_series.min()) if not pd.isna(numeric_series.min()) else None
-                col_stats["25%"] = float(numeric_series.quantile(0.25)) if not pd.isna(numeric_series.quantile(0.25)) else None
-                col_stats["50%"] = float(numeric_series.quantile(0.50)) if not pd.isna(numeric_series.quantile(0.50)) else None
-                col_stats["75%"] = float(numeric_series.quantile(0.75)) if not pd.isna(numeric_series.quantile(0.75)) else None
-                col_stats["Max"] = float(numeric_series.max()) if not pd.isna(numeric_series.max()) else None
-
-                try:
-                    bins = pd.cut(numeric_series.dropna(), bins=10)
-                    bin_counts = bins.value_counts().sort_index()
-
-                    col_stats["Label Distribution"] = {
-                        str(interval): int(count)
-                        for interval, count in zip(bin_counts.index, bin_counts.values)
-                    }
-                except Exception as e:
-                    col_stats["Label Distribution"] = f"Binning failed: {str(e)}"
-            except Exception as generalFailure:
-                print(f"General failure in a numeric section{str(generalFailure)}")
-
-        else:  # Non-numeric columns
-            col_stats["Unique"] = int(series.nunique())
-            most_common = series.mode()
-            if not most_common.empty:  # Handle cases where mode is empty
-                col_stats["Most Common"] = str(most_common.iloc[0])  # Take the first if multiple
-            else:
-                col_stats["Most Common"] = None
-
-            # Example for string columns to identify values from non values
-            if pd.api.types.is_string_dtype(series) or series.dtype == 'object':
-                value_counts = series.value_counts(dropna=False)
-                if not value_counts.empty:
-                    # Convert to a more readable format
-                    if len(value_counts) > 10:
-                        # Show top 3 and group the rest
-                        top_values = value_counts.head(3)
-                        other_count = value_counts[3:].sum()
-
-                        col_stats["Value Counts"] = {
-                            str(val): int(count) for val, count in top_values.items()
-                        }
-                        col_stats["Value Counts"][f"Other ({len(value_counts) - 3})"] = int(other_count)
-                    else:
-                        col_stats["Value Counts"] = {
-                            str(val): int(count) for val, count in value_counts.items()
-                        }
-
-        stats[col] = col_stats
-    return stats
-
-
-def create_column_visualization(df, column_name, stats, output_dir='column_visualizations'):
-    """
-    Creates a visualization for a specific column based on its data type.
-
-    Args:
-        df: pandas DataFrame
-        column_name: name of the column to visualize
-        stats: statistics dictionary for this column
-        output_dir: directory to save the visualizations
-    """
-    # Create output directory if it doesn't exist
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Get the series
-    series = df[column_name]
-
-    # Get statistics from the stats dictionary
-    valid_count = stats["Valid"]
-    total_count = len(series)
-    valid_percent = (valid_count / total_count) * 100 if total_count > 0 else 0
-    missing_count = stats["Missing"]
-    missing_percent = (missing_count / total_count) * 100 if total_count > 0 else 0
-    mismatched_count = stats["Mismatched"]
-    mismatched_percent = (mismatched_count / total_count) * 100 if total_count > 0 else 0
-
-    # Create figure
-    fig = plt.figure(figsize=(10, 6))
-    gs = GridSpec(1, 2, width_ratios=[1, 1])
-
-    # Try converting to numeric before visualisation (this handles mixed objects for the plot to show as numerical.)
-    try:
-          numeric_series = pd.to_numeric(series, errors='raise')
-          is_numeric = True
-    except:
-          is_numeric = False
-    # Determine if column is numeric
-    #is_numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
-
-    if is_numeric:
-        # For numeric columns
-        ax1 = fig.add_subplot(gs[0])
-
-        # Create histogram
-        if not series.dropna().empty:
-            sns.histplot(numeric_series.dropna(), ax=ax1, color='#0072B2')
-
-            # Add min and max labels
-            min_val = stats.get("Min", "N/A")
-            max_val = stats.get("Max", "N/A")
-            if min_val is not None and min_val!= "N/A":
-                ax1.text(min_val, 0, f"{min_val:.2f}" if isinstance(min_val, float) else str(min_val),
-                        ha='left', va='bottom')
-            if max_val is not None and max_val != "N/A":
-                ax1.text(max_val, 0, f"{max_val:.2f}" if isinstance(max_val, float) else str(max_val),
-                        ha='right', va='bottom')
-        else:
-            ax1.text(0.5, 0.5, "No data to display", ha='center', va='center', transform=ax1.transAxes)
-            ax1.set_xticks([])
-            ax1.set_yticks([])
-
-        # Stats panel
-        ax2 = fig.add_subplot(gs[1])
-        ax2.axis('off')
-
-        # Get statistics
-        mean = stats.get("Mean", "N/A")
-        std = stats.get("Std. Deviation", "N/A")
-        min_val = stats.get("Min", "N/A")
-        q25 = stats.get("25%", "N/A")
-        q50 = stats.get("50%", "N/A")
-        q75 = stats.get("75%", "N/A")
-        max_val = stats.get("Max", "N/A")
-
-
-        # Format numeric values
-        mean_str = f"{mean:.2f}" if isinstance(mean, (int, float)) else str(mean)
-        std_str = f"{std:.2f}" if isinstance(std, (int, float)) else str(std)
-        min_str = f"{min_val:.2f}" if isinstance(min_val, (int, float)) else str(min_val)
-        q25_str = f"{q25:.2f}" if isinstance(q25, (int, float)) else str(q25)
-        q50_str = f"{q50:.2f}" if isinstance(q50, (int, float)) else str(q50)
-        q75_str = f"{q75:.2f}" if isinstance(q75, (int, float)) else str(q75)
-        max_str = f"{max_val:.2f}" if isinstance(max_val, (int, float)) else str(max_val)
-
-        # Create stats table
-        stats_text = [
-            f"Valid █", f"{valid_count:,}", f"{valid_percent:.0f}%",
-            f"Mismatched █", f"{mismatched_count:,}", f"{mismatched_percent:.0f}%",
-            f"Missing █", f"{missing_count:,}", f"{missing_percent:.0f}%",
-            "",
-            f"Mean", mean_str,
-            f"Std. Deviation", std_str,
-            "",
-            f"Quantiles",
-            min_str, f"Min",
-            q25_str, f"25%",
-            q50_str, f"50%",
-            q75_str, f"75%",
-            max_str, f"Max"
-        ]
-
-        # Position the text
-        y_pos = 0.95
-        for i in range(0, len(stats_text), 3):
-            if i+2 < len(stats_text):
-                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
-                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
-                ax2.text(0.95, y_pos, stats_text[i+2], ha='right', color='#666666')
-            elif i+1 < len(stats_text):
-                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
-                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
-            else:
-                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
-            y_pos -= 0.05
-
-        # Add a green bar at the top
-        ax2.axhspan(0.97, 1.0, facecolor='green', alpha=0.3)
-
-    else:
-        # For string/categorical columns
-        ax1 = fig.add_subplot(gs[0])
-
-        # Get value counts if available
-        if "Value Counts" in stats:
-            value_counts = pd.Series(stats["Value Counts"])
-
-            # Plot as text
-            ax1.axis('off')
-            y_pos = 0.9
-            for value, count in value_counts.items():
-                percentage = (count / total_count) * 100 if total_count > 0 else 0
-                ax1.text(0.1, y_pos, str(value)[:100], ha='left') # Truncate string values
-                ax1.text(0.9, y_pos, f"{percentage:.0f}%", ha='right')
-                y_pos -= 0.2
-        else:
-            # If no value counts available
-            ax1.axis('off')
-            ax1.text(0.5, 0.5, "No categorical data to display", ha='center', va='center', transform=ax1.transAxes)
-
-        # Stats panel
-        ax2 = fig.add_subplot(gs[1])
-        ax2.axis('off')
-
-        # Get unique count and most common
-        unique_count = stats.get("Unique", "N/A")
-        most_common = stats.get("Most Common", "None")
-
-        # Calculate percentage of most common value
-        most_common_percent = 0
-        if "Value Counts" in stats and most_common in stats["Value Counts"]:
-            most_common_count = stats["Value Counts"][most_common]
-            most_common_percent = (most_common_count / total_count) * 100 if total_count > 0 else 0
-
-        # Create stats table
-        stats_text = [
-            f"Valid █", f"{valid_count:,}", f"{valid_percent:.0f}%",
-            f"Mismatched █", f"{mismatched_count:,}", f"{mismatched_percent:.0f}%",
-            f"Missing █", f"{missing_count:,}", f"{missing_percent:.0f}%",
-            "",
-            f"Unique", f"{unique_count:,}",
-            f"Most Common", str(most_common)[:100], f"{most_common_percent:.0f}%" # Truncate most common as well
-        ]
-
-        # Position the text
-        y_pos = 0.95
-        for i in range(0, len(stats_text), 3):
-            if i+2 < len(stats_text):
-                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
-                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
-                ax2.text(0.95, y_pos, stats_text[i+2], ha='right', color='#666666')
-            elif i+1 < len(stats_text):
-                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
-                ax2.text(0.7, y_pos, stats_text[i+1], ha='right')
-            else:
-                ax2.text(0.1, y_pos, stats_text[i], ha='left', fontweight='bold')
-            y_pos -= 0.05
-
-        # Add a green bar at the top
-        ax2.axhspan(0.97, 1.0, facecolor='green', alpha=0.3)
-
-    # Add title
-    column_name_truncated = column_name[:50] # Truncated to avoid long titles
-    if is_numeric:
-        plt.suptitle(f"# {column_name_truncated}", fontsize=14, fontweight='bold', ha='left', x=0.1)
-    else:
-        plt.suptitle(f"△ {column_name_truncated}", fontsize=14, fontweight='bold', ha='left', x=0.1)
-
-    # Save the figure
-    plt.tight_layout()
-    plt.savefig(f"{output_dir}/{column_name[:50]}_visualization.png", dpi=100, bbox_inches='tight')
-    plt.close()
-
-
-def process_csv_file(csv_file, data_folder, output_dir='column_visualizations', save_stats=True, sep=','):
-    """
-    Processes a CSV file: calculates statistics and creates visualizations.
-
-    Args:
-        csv_file: name of the CSV file
-        data_folder: path to the data directory
-        output_dir: directory to save the visualizations
-        save_stats: whether to save statistics to a JSON file
-        sep: The separator used in the CSV file. Defaults to comma (',').
-    """
-    try:
-        # Create full file path using os.path.join
-        csv_path = os.path.join(data_folder, csv_file)
-
-        # Load the CSV file with specified separator
-        df = pd.read_csv(csv_path, sep=sep, low_memory=False)
-        print(f"Successfully loaded CSV file: {csv_path}")
-        print(f"Shape: {df.shape} (rows, columns)")
-
-        # Calculate statistics
-        print("Calculating statistics...")
-        column_stats = calculate_statistics(df)
-
-        # Save statistics to JSON if requested
-        if save_stats:
-            stats_file = f"{output_dir}/column_statistics.json"
-            os.makedirs(output_dir, exist_ok=True)
-            with open(stats_file, 'w') as f:
-                json.dump(column_stats, f, indent=4)
-            print(f"Statistics saved to {stats_file}")
-
-        # Print statistics to console
-        for col, stats in column_stats.items():
-            print(f"Column: {col}")
-            for stat, value in stats.items():
-                print(f"  {stat}: {value}")
-            print("-" * 30)
-
-        # Create visualizations
-        print("Creating visualizations...")
-        for column in df.columns:
-            print(f"Processing column: {column}")
-            create_column_visualization(df, column, column_stats[column], output_dir)
-
-        print(f"Visualizations saved to {output_dir}/")
-
-    except FileNotFoundError:
-        print(f"Error: File not found: {csv_path}")  # Use constructed path for error message
-        exit()
-    except Exception as e:
-        print(f"Error processing CSV: {e}")
-        import traceback
-        traceback.print_exc()
-        exit()
+from profiling.stats import calculate_statistics
+from profiling.render import create_column_visualization, process_csv_file
 
 
 if __name__ == "__main__":
@@ -429,69 +96,39 @@ if __name__ == "__main__":
 
 """2. Feature Loading and Filtering"""
 
-# Load the deep learning features from pickle file
-print("Loading deep learning features from pickle file...")
+# Load the deep learning features from the memory-mapped feature store
+from recommender.feature_store import FeatureStore, convert_pickle_to_feature_store
+
+print("Loading deep learning features from feature store...")
 pickle_path = os.path.join(data_folder,"cleaned_data_both_efficientnet_v2_features.pkl")  # Update this path to your pickle file
+store_path = os.path.join(data_folder, "cleaned_data_both_efficientnet_v2_features.features")
 
-if os.path.exists(pickle_path):
-    with open(pickle_path, 'rb') as f:
-        features_dict = pickle.load(f)
-    print(f"Loaded features for {len(features_dict)} songs")
-else:
-    print(f"Warning: Pickle file {pickle_path} not found. Proceeding without deep learning features.")
-    features_dict = {}
-
-# Create a mapping from DataFrame index to original index
-df_index_to_original = {i: idx for i, idx in enumerate(df.index)}
-original_to_df_index = {idx: i for i, idx in df_index_to_original.items()}
-
-# Determine the expected feature shape BEFORE filtering
-if features_dict:
-    sample_feature = next(iter(features_dict.values()))
-    expected_feature_shape = sample_feature.shape
-    print(f"Expected feature shape: {expected_feature_shape}")
+# Convert the pickle once; later runs open the store directly
+if not os.path.exists(store_path) and os.path.exists(pickle_path):
+    convert_pickle_to_feature_store(pickle_path, store_path)
+
+if os.path.exists(store_path):
+    feature_store = FeatureStore.open(store_path)
+    print(f"Loaded features for {len(feature_store)} songs")
+    print(f"Expected feature shape: ({feature_store.num_dimensions},)")
 else:
-    expected_feature_shape = None
-    print("No features in features_dict to determine expected shape.")
+    print(f"Warning: Feature store {store_path} not found. Proceeding without deep learning features.")
+    feature_store = None
 
 # Filter to only include songs that have deep learning features
-if features_dict:
-    # Convert original indices in features_dict to new DataFrame indices
-    valid_indices = [original_to_df_index.get(idx) for idx in features_dict.keys()
-                     if idx in original_to_df_index]
-    valid_indices = [idx for idx in valid_indices if idx is not None]
-
-    # Filter DataFrame to only include rows with features
-    df = df.iloc[valid_indices].reset_index(drop=True)
+if feature_store is not None:
+    # Feature store row ids are DataFrame indices, look them up before resetting the index
+    df = df[feature_store.positions(df.index.to_numpy()) >= 0]
+    original_indices = df.index.to_numpy()
+    df = df.reset_index(drop=True)
     print(f"DataFrame filtered to songs with deep features. New shape: {df.shape}")
 
-    # Create a new mapping after filtering
-    df_index_to_original = {i: idx for i, idx in enumerate(df.index)}
-    original_to_df_index = {idx: i for i, idx in df_index_to_original.items()}
-
 """3. Feature Extraction"""
 
 # Extract deep learning features in the same order as DataFrame
-if features_dict:
-    deep_features = []
-    for i in range(len(df)):
-        original_idx = df_index_to_original[i]
-        if original_idx in features_dict:
-            feature = features_dict[original_idx]
-            # Check if the feature shape matches the expected shape
-            if feature.shape == expected_feature_shape:
-                deep_features.append(feature)
-            else:
-                print(f"Warning: Feature shape mismatch for index {i} (original index {original_idx}).")
-                print(f"  Expected shape: {expected_feature_shape}, Actual shape: {feature.shape}")
-                print("  Using zeros as placeholder.")
-                deep_features.append(np.zeros(expected_feature_shape))
-        else:
-            print(f"Warning: Missing features for index {i} (original index {original_idx})")
-            print("  Using zeros as placeholder.")
-            deep_features.append(np.zeros(expected_feature_shape))
-
-    deep_features = np.array(deep_features)
+if feature_store is not None:
+    # Only the rows of the filtered DataFrame are read from the memory map
+    deep_features = feature_store.get(original_indices)
     print(f"Deep learning features shape: {deep_features.shape}")
 
     # Check for NaN or inf in deep_features
@@ -503,56 +140,39 @@ else:
     deep_features = None
     print("No deep learning features available.")
 
-# Extract non-image features (e.g., danceability, energy, etc.)
-audio_features = ['danceability', 'energy', 'loudness', 'speechiness', 'acousticness',
-                 'instrumentalness', 'liveness', 'valence', 'tempo']
-non_image_features = df[audio_features].values
+# Extract non-image features (e.g., danceability, energy, etc.) and basic image features
+# as views into one float32 matrix; NaN/inf values are replaced with the column mean
+from recommender.features import AUDIO_COLUMNS, BASIC_IMAGE_COLUMNS, assemble_features
 
-# Check for NaN or inf in non_image_features
-if np.isnan(non_image_features).any() or np.isinf(non_image_features).any():
-    print("Warning: NaN or inf values found in non_image_features. Replacing with the mean.")
-    for col_idx in range(non_image_features.shape[1]):  # Iterate through columns
-        col = non_image_features[:, col_idx]
-        col_mean = np.nanmean(col)  # Calculate mean, ignoring NaNs
-        col[np.isnan(col)] = col_mean  # Replace NaNs with the mean
-    non_image_features = np.nan_to_num(non_image_features) # Replace any remaining NaN/inf with 0
+audio_features = AUDIO_COLUMNS
+_, feature_blocks = assemble_features(df, {'audio': AUDIO_COLUMNS, 'basic_image': BASIC_IMAGE_COLUMNS})
+non_image_features = feature_blocks['audio']
+basic_image_features = feature_blocks['basic_image']
 
 print(f"Non-image features shape: {non_image_features.shape}")
-
-# Extract basic image features
-basic_image_features = np.array([
-    np.concatenate([
-        np.array([df['single_pixel_color_r'][i], df['single_pixel_color_g'][i], df['single_pixel_color_b'][i]]),
-        np.array([df['weighted_average_color_r'][i], df['weighted_average_color_g'][i], df['weighted_average_color_b'][i]]),
-        np.array([df['most_vibrant_color_r'][i], df['most_vibrant_color_g'][i], df['most_vibrant_color_b'][i]])
-    ]) for i in range(len(df))
-])
-
-# Check for NaN or inf in basic_image_features
-if np.isnan(basic_image_features).any() or np.isinf(basic_image_features).any():
-    print("Warning: NaN or inf values found in basic_image_features. Replacing with the mean.")
-    for col_idx in range(basic_image_features.shape[1]):  # Iterate through columns
-        col = basic_image_features[:, col_idx]
-        col_mean = np.nanmean(col)  # Calculate mean, ignoring NaNs
-        col[np.isnan(col)] = col_mean  # Replace NaNs with the mean
-    basic_image_features = np.nan_to_num(basic_image_features) # Replace any remaining NaN/inf with 0
-
 print(f"Basic image features shape: {basic_image_features.shape}")
 
 """4. Feature Scaling"""
 
-# Standardize the features
+# Standardize the features. Each block gets its own fitted transform (imputation values, scaler
+# parameters and column order), which is saved next to the indices in section 6 so new tracks
+# can be embedded later without refitting on the catalogue
+from recommender.transforms import FeatureTransform, deep_feature_columns
+
 print("Standardizing features...")
-scaler = StandardScaler()
+audio_transform = FeatureTransform.fit(non_image_features, AUDIO_COLUMNS)
+basic_image_transform = FeatureTransform.fit(basic_image_features, BASIC_IMAGE_COLUMNS)
 
-non_image_features_scaled = scaler.fit_transform(non_image_features)
-basic_image_features_scaled = scaler.fit_transform(basic_image_features)
+non_image_features_scaled = audio_transform.transform(non_image_features)
+basic_image_features_scaled = basic_image_transform.transform(basic_image_features)
 
 # Standardize deep features if available
 if deep_features is not None:
-    deep_features_scaled = scaler.fit_transform(deep_features)
+    deep_transform = FeatureTransform.fit(deep_features, deep_feature_columns(deep_features.shape[1]))
+    deep_features_scaled = deep_transform.transform(deep_features)
     print(f"Deep features scaled. Shape: {deep_features_scaled.shape}")
 else:
+    deep_transform = None
     deep_features_scaled = None
 
 """5. Feature combinations"""
@@ -1018,105 +638,115 @@ data_folder = '/content/drive/MyDrive/complete_data_set_27_02_25'
 os.makedirs(data_folder, exist_ok=True)
 
 print("Building Voyager indices and saving to Google Drive...")
+from recommender.build import build_indexes
+
 # Parameters for Voyager index
 M = 12  # Number of connections between nodes (similar to Annoy's n_trees)
 ef_construction = 200  # Number of vectors to search during construction
 
-# Model 1: Audio features
-index_audio = Index(Space.Euclidean, num_dimensions=features_audio.shape[1],
-                    M=M, ef_construction=ef_construction)
-# Add items to the index
-for i in range(len(features_audio)):
-    index_audio.add_item(features_audio[i].astype(np.float32), i)
-audio_path = os.path.join(data_folder, 'audio_features.voy')
-index_audio.save(audio_path)
-print(f"Audio features index built and saved to: {audio_path}")
-
-# Model 2: Basic image features
-index_basic_image = Index(Space.Euclidean, num_dimensions=features_basic_image.shape[1],
-                          M=M, ef_construction=ef_construction)
-for i in range(len(features_basic_image)):
-    index_basic_image.add_item(features_basic_image[i].astype(np.float32), i)
-basic_image_path = os.path.join(data_folder, 'basic_image_features.voy')
-index_basic_image.save(basic_image_path)
-print(f"Basic image features index built and saved to: {basic_image_path}")
+feature_sets = {
+    'audio': features_audio,  # Model 1: Audio features
+    'basic_image': features_basic_image,  # Model 2: Basic image features
+    'audio_basic_image': features_audio_basic_image,  # Model 3: Audio + Basic image features
+}
+# The deep spaces are indexed in a PCA-reduced space that keeps this share of the deep features'
+# variance (see the cumulative variance curve above); None indexes the full 1280/2048 dimensions.
+# The projection is saved with the deep transforms, so new tracks are embedded into the same space
+deep_target_variance = 0.95
+deep_index_transform = deep_transform
+if deep_features_scaled is not None and deep_target_variance is not None:
+    from recommender.reduction import reduce_transform
+    deep_index_transform, reduction_report = reduce_transform(deep_transform, deep_features_scaled,
+                                                              target_variance=deep_target_variance)
+    deep_features_reduced = deep_index_transform.project(deep_features_scaled)
+    print(f"Deep features reduced from {reduction_report['input_dimensions']} to "
+          f"{reduction_report['num_components']} dimensions "
+          f"({reduction_report['explained_variance']:.1%} of the variance)")
+    features_deep = deep_features_reduced
+    features_audio_deep = np.hstack([features_audio, deep_features_reduced])
+    features_all = np.hstack([features_audio, features_basic_image, deep_features_reduced])
 
-# Model 3: Audio + Basic image features
-index_audio_basic_image = Index(Space.Euclidean, num_dimensions=features_audio_basic_image.shape[1],
-                                M=M, ef_construction=ef_construction)
-for i in range(len(features_audio_basic_image)):
-    index_audio_basic_image.add_item(features_audio_basic_image[i].astype(np.float32), i)
-audio_basic_image_path = os.path.join(data_folder, 'audio_basic_image_features.voy')
-index_audio_basic_image.save(audio_basic_image_path)
-print(f"Audio + Basic image features index built and saved to: {audio_basic_image_path}")
-
-# Model 4: Deep learning features (if available)
-if deep_features_scaled is not None:
-    index_deep = Index(Space.Euclidean, num_dimensions=features_deep.shape[1],
-                       M=M, ef_construction=ef_construction)
-    for i in range(len(features_deep)):
-        index_deep.add_item(features_deep[i].astype(np.float32), i)
-    deep_path = os.path.join(data_folder, 'deep_features.voy')
-    index_deep.save(deep_path)
-    print(f"Deep features index built and saved to: {deep_path}")
-
-# Model 5: All Image features
 if deep_features_scaled is not None:
     # Combine basic image features with deep features
-    features_all_image = np.hstack([features_basic_image, deep_features_scaled])
-
-    index_all_image = Index(Space.Euclidean, num_dimensions=features_all_image.shape[1],
-                           M=M, ef_construction=ef_construction)
-    for i in range(len(features_all_image)):
-        index_all_image.add_item(features_all_image[i].astype(np.float32), i)
-    all_image_path = os.path.join(data_folder, 'all_image_features.voy')
-    index_all_image.save(all_image_path)
-    print(f"All image features combined index built and saved to: {all_image_path}")
-else:
-    print("Deep features not available, skipping all image features model")
+    features_all_image = np.hstack([features_basic_image, features_deep])
 
-# Model 6: Audio + Deep features (if available)
-if deep_features_scaled is not None:
-    index_audio_deep = Index(Space.Euclidean, num_dimensions=features_audio_deep.shape[1],
-                             M=M, ef_construction=ef_construction)
-    for i in range(len(features_audio_deep)):
-        index_audio_deep.add_item(features_audio_deep[i].astype(np.float32), i)
-    audio_deep_path = os.path.join(data_folder, 'audio_deep_features.voy')
-    index_audio_deep.save(audio_deep_path)
-    print(f"Audio + Deep features index built and saved to: {audio_deep_path}")
-
-# Model 7: All features combined (if deep features available)
-if deep_features_scaled is not None:
-    index_all = Index(Space.Euclidean, num_dimensions=features_all.shape[1],
-                      M=M, ef_construction=ef_construction)
-    for i in range(len(features_all)):
-        index_all.add_item(features_all[i].astype(np.float32), i)
-    all_features_path = os.path.join(data_folder, 'all_features.voy')
-    index_all.save(all_features_path)
-    print(f"All features combined index built and saved to: {all_features_path}")
+    feature_sets['deep'] = features_deep  # Model 4: Deep learning features
+    feature_sets['all_image'] = features_all_image  # Model 5: All Image features
+    feature_sets['audio_deep'] = features_audio_deep  # Model 6: Audio + Deep features
+    feature_sets['all'] = features_all  # Model 7: All features combined
+else:
+    print("Deep features not available, skipping deep feature models")
+
+# Late fusion (see get_recommendations below) only needs the audio, basic image and deep indexes and
+# re-ranks their candidates with per-request modality weights; set this to False to skip building the
+# concatenated spaces and rely on fused recommendations instead
+from recommender.fusion import BASE_MODALITIES
+build_combined_indexes = True
+if not build_combined_indexes:
+    feature_sets = {model_name: features for model_name, features in feature_sets.items()
+                    if model_name in BASE_MODALITIES}
+
+# The transform of every space, in the same block order as its features
+from recommender.features import SPACE_BLOCKS
+block_transforms = {'audio': audio_transform, 'basic_image': basic_image_transform, 'deep': deep_index_transform}
+transforms = {model_name: FeatureTransform.concat([block_transforms[block] for block in SPACE_BLOCKS[model_name]])
+              for model_name in feature_sets}
+
+# Small spaces (e.g. audio, basic image) get exact indexes, the others are inserted with one
+# multi-threaded add_items call; the spaces are built concurrently
+# Storage precision per space: the deep spaces are stored as 8-bit values after scaling their features
+# into the Float8 range (the scale is saved in their transforms); benchmarks/storage_precision.py
+# compares the memory, latency and recall of float32, e4m3 and float8 on the catalogue
+storage_precision = {'deep': 'float8', 'all_image': 'float8', 'audio_deep': 'float8', 'all': 'float8'}
+
+build_stats = build_indexes(feature_sets, data_folder, M=M, ef_construction=ef_construction, transforms=transforms,
+                            precision=storage_precision)
+
+# Track id -> row position lookup, stored next to the indices
+from recommender import SongIdIndex, SONG_ID_INDEX_FILE
+song_id_index = SongIdIndex(df['id'])
+song_id_index.save(os.path.join(data_folder, SONG_ID_INDEX_FILE))
+if song_id_index.duplicates:
+    print(f"Warning: {len(song_id_index.duplicates)} track ids appear more than once; the first row is used for each.")
+print(f"Track id index saved to: {os.path.join(data_folder, SONG_ID_INDEX_FILE)}")
 
 print("\nAll Voyager indices have been built and saved to Google Drive.")
 
 """7. Recommendation Functions"""
 
+# Load every index once and keep it resident; queries below are answered from memory
+from recommender import RecommendationEngine, SongIdIndex
+
+models = ['audio', 'basic_image', 'audio_basic_image']
+if deep_features_scaled is not None:
+    models += ['deep', 'all_image', 'audio_deep', 'all']
+if not build_combined_indexes:
+    models = [model_name for model_name in models if model_name in BASE_MODALITIES]
+engine = RecommendationEngine(data_folder, models=models)
+if engine.id_index is None:
+    engine.id_index = SongIdIndex(df['id'])
+engine.report()
+
 # Function to get song recommendations
-def get_recommendations(song_id, num_recommendations=10):
+def get_recommendations(song_id, num_recommendations=10, fusion_weights=None):
     """
     Get song recommendations based on different feature sets
 
     Args:
         song_id (str): Spotify ID of the query song
         num_recommendations (int): Number of recommendations to return
+        fusion_weights (dict): Optional modality weights, e.g. {'audio': 0.7, 'deep': 0.3};
+            when given, an extra 'fused' recommendation is added.
 
     Returns:
         dict: Dictionary with recommendations from different models
     """
     # Find the song in the DataFrame
-    if song_id not in df['id'].values:
+    song_index = engine.resolve(song_id)
+    if song_index is None:
         print(f"Song ID {song_id} not found in the dataset.")
         return None
 
-    song_index = df[df['id'] == song_id].index[0]
     song_data = df.iloc[song_index]
 
     print("\n===== QUERY SONG =====")
@@ -1127,79 +757,35 @@ def get_recommendations(song_id, num_recommendations=10):
     print("======================\n")
 
     recommendations = {}
+    for model_name, (closest_indices, _) in engine.recommend(song_index, num_recommendations).items():
+        recommendations[model_name] = df.iloc[closest_indices]
 
-    # Model 1: Audio features
-    index_audio = Index.load(os.path.join(data_folder, 'audio_features.voy'))
-    # Get nearest neighbors
-    closest_indices_audio, distances_audio = index_audio.query(
-        features_audio[song_index].astype(np.float32), k=num_recommendations+1)
-    # Remove the query song itself (first result)
-    mask_audio = closest_indices_audio != song_index
-    closest_indices_audio = closest_indices_audio[mask_audio][:num_recommendations]
-    recommendations['audio'] = df.iloc[closest_indices_audio]
-
-    # Model 2: Basic image features
-    index_basic_image = Index.load(os.path.join(data_folder, 'basic_image_features.voy'))
-    closest_indices_basic_image, distances_basic_image = index_basic_image.query(
-        features_basic_image[song_index].astype(np.float32), k=num_recommendations+1)
-    mask_basic_image = closest_indices_basic_image != song_index
-    closest_indices_basic_image = closest_indices_basic_image[mask_basic_image][:num_recommendations]
-    recommendations['basic_image'] = df.iloc[closest_indices_basic_image]
-
-    # Model 3: Audio + Basic image features
-    index_audio_basic_image = Index.load(os.path.join(data_folder, 'audio_basic_image_features.voy'))
-    closest_indices_audio_basic_image, distances_audio_basic_image = index_audio_basic_image.query(
-        features_audio_basic_image[song_index].astype(np.float32), k=num_recommendations+1)
-    mask_audio_basic_image = closest_indices_audio_basic_image != song_index
-    closest_indices_audio_basic_image = closest_indices_audio_basic_image[mask_audio_basic_image][:num_recommendations]
-    recommendations['audio_basic_image'] = df.iloc[closest_indices_audio_basic_image]
-
-    # Model 4: Deep learning features (if available)
-    if deep_features_scaled is not None:
-        index_deep = Index.load(os.path.join(data_folder, 'deep_features.voy'))
-        closest_indices_deep, distances_deep = index_deep.query(
-            features_deep[song_index].astype(np.float32), k=num_recommendations+1)
-        mask_deep = closest_indices_deep != song_index
-        closest_indices_deep = closest_indices_deep[mask_deep][:num_recommendations]
-        recommendations['deep'] = df.iloc[closest_indices_deep]
-
-    # Model 5: All IMage Features
-    if deep_features_scaled is not None:
-        # Load the all image features index
-        index_all_image = Index.load(os.path.join(data_folder, 'all_image_features.voy'))
-        # Create the combined feature vector for the query song
-        features_all_image_query = np.hstack([
-            features_basic_image[song_index],
-            deep_features_scaled[song_index]
-        ]).astype(np.float32)
-        # Get recommendations
-        closest_indices_all_image, distances_all_image = index_all_image.query(
-            features_all_image_query, k=num_recommendations+1)
-        mask_all_image = closest_indices_all_image != song_index
-        closest_indices_all_image = closest_indices_all_image[mask_all_image][:num_recommendations]
-        recommendations['all_image'] = df.iloc[closest_indices_all_image]
-
-    # Model 6: Audio + Deep features (if available)
-    if deep_features_scaled is not None:
-        index_audio_deep = Index.load(os.path.join(data_folder, 'audio_deep_features.voy'))
-        closest_indices_audio_deep, distances_audio_deep = index_audio_deep.query(
-            features_audio_deep[song_index].astype(np.float32), k=num_recommendations+1)
-        mask_audio_deep = closest_indices_audio_deep != song_index
-        closest_indices_audio_deep = closest_indices_audio_deep[mask_audio_deep][:num_recommendations]
-        recommendations['audio_deep'] = df.iloc[closest_indices_audio_deep]
-
-    # Model 7: All features combined (if deep features available)
-    if deep_features_scaled is not None:
-        index_all = Index.load(os.path.join(data_folder, 'all_features.voy'))
-        closest_indices_all, distances_all = index_all.query(
-            features_all[song_index].astype(np.float32), k=num_recommendations+1)
-        mask_all = closest_indices_all != song_index
-        closest_indices_all = closest_indices_all[mask_all][:num_recommendations]
-        recommendations['all'] = df.iloc[closest_indices_all]
+    if fusion_weights is not None:
+        closest_indices, _ = engine.recommend_fused(song_index, weights=fusion_weights, k=num_recommendations)
+        recommendations['fused'] = df.iloc[closest_indices]
 
     return recommendations
 
-# Function to print recommendations
+# Function to get recommendations for many songs at once
+def get_recommendations_batch(song_ids, k=10, models=None, num_threads=-1):
+    """
+    Get recommendations for many songs with one batched query per feature set
+
+    Args:
+        song_ids (list): Spotify IDs of the query songs
+        k (int): Number of recommendations per song
+        models (list): Feature sets to query (default: all loaded)
+        num_threads (int): Threads used per query (-1 uses all cores)
+
+    Returns:
+        dict: Query rows plus per-model index and distance arrays of shape (songs, k)
+    """
+    batch = engine.recommend_batch(song_ids, k=k, models=models, num_threads=num_threads)
+    if batch['missing']:
+        print(f"{len(batch['missing'])} of {len(song_ids)} song IDs not found in the dataset.")
+    return batch
+
+
 def print_recommendations(recommendations):
     """Print recommendations from different models"""
     if recommendations is None:
@@ -1250,6 +836,15 @@ if __name__ == "__main__":
     # Print recommendations
     print_recommendations(recommendations)
 
+# Example usage: seed recommendations for a whole playlist in one call
+if __name__ == "__main__":
+    with open('80s-playlist.json') as f:
+        playlist_ids = json.load(f)['songs']
+
+    batch = get_recommendations_batch(playlist_ids, k=5)
+    for model_name, indices in batch['indices'].items():
+        print(f"{model_name}: {indices.shape[0]} seeds x {indices.shape[1]} recommendations")
+
 """9. Setup for visualization"""
 
 import pandas as pd
@@ -1278,15 +873,15 @@ elif feature_type == 'audio_basic_image':
     title = 'Spotify Songs - Combined Audio and Visual Features'
     voyager_index_file = 'audio_basic_image_features.voy'
 elif feature_type == 'deep' and deep_features_scaled is not None:
-    features = deep_features_scaled
+    features = features_deep  # In the index space, i.e. reduced if section 6 reduced it
     title = 'Spotify Songs - Deep Learning Features'
     voyager_index_file = 'deep_features.voy'
 elif feature_type == 'audio_deep' and deep_features_scaled is not None:
-    features = np.concatenate([non_image_features_scaled, deep_features_scaled], axis=1)
+    features = features_audio_deep
     title = 'Spotify Songs - Combined Audio and Deep Learning Features'
     voyager_index_file = 'audio_deep_features.voy'
 elif feature_type == 'all' and deep_features_scaled is not None:
-    features = np.concatenate([non_image_features_scaled, basic_image_features_scaled, deep_features_scaled], axis=1)
+    features = features_all
     title = 'Spotify Songs - All Features Combined'
     voyager_index_file = 'all_features.voy'
 else:
@@ -1300,19 +895,20 @@ pca = PCA(n_components=2)
 features_2d = pca.fit_transform(features)
 print(f"Explained variance ratio: {pca.explained_variance_ratio_}")
 
-# Load Voyager Index
+# Load the saved index (an exact .npz index for small spaces, otherwise Voyager)
+from recommender.engine import load_index
 voyager_index_path = os.path.join(data_folder, voyager_index_file)
-if os.path.exists(voyager_index_path):
+exact_index_path = os.path.splitext(voyager_index_path)[0] + '.npz'
+if os.path.exists(exact_index_path):
+    index = load_index(exact_index_path)
+    print(f"Loaded exact index from {exact_index_path}")
+elif os.path.exists(voyager_index_path):
     index = Index.load(voyager_index_path)
     print(f"Loaded Voyager index from {voyager_index_path}")
 else:
     print(f"Voyager index file not found at {voyager_index_path}. Creating new index...")
-    index = Index(Space.Euclidean, num_dimensions=features.shape[1],
-                  M=12, ef_construction=200)
-
-    # Add items to the index
-    for i in range(len(features)):
-        index.add_item(features[i].astype(np.float32), i)
+    from recommender.build import build_voyager_index
+    index = build_voyager_index(features, M=12, ef_construction=200)
 
     # Save the index
     index.save(voyager_index_path)